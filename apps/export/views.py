@@ -8,29 +8,28 @@ from rest_framework import views, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from apps.schedule.cache import ScheduleCache
 from apps.schedule.models import Schedule, ScheduleDay
+from apps.schedule.permissions import IsScheduleMember
+from apps.schedule.serializers import ScheduleDaySerializer
 
 import weasyprint
 from io import BytesIO
 
+class CanExportSchedule(IsScheduleMember):
+    message = "You don't have permission to export this schedule"
+
 class ExportScheduleView(views.APIView):
     """
     API endpoint for exporting a schedule as PDF
     """
     # Fix: Change from class to list
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, CanExportSchedule]
     
     def get(self, request, schedule_id):
-        # Get the schedule
+        # Get the schedule, only its owner and participants may export it
         schedule = get_object_or_404(Schedule, id=schedule_id)
-        
-        # Check if user is owner or participant
-        if not (schedule.owner == request.user or 
-                schedule.participants.filter(user=request.user).exists()):
-            return Response(
-                {"detail": "You don't have permission to export this schedule"}, 
-                status=status.HTTP_403_FORBIDDEN
-            )
+        self.check_object_permissions(request, schedule)
         
         # Check if schedule is complete
         if not schedule.is_complete:
@@ -39,17 +38,37 @@ class ExportScheduleView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # The PDF is rendered for the requesting user, cache it per user
+        pdf = ScheduleCache.get_or_build(
+            schedule.id, schedule.version, f"export:pdf:{request.user.id}",
+            lambda: self.render_pdf(schedule, request.user)
+        )
+        
+        # Generate filename
+        filename = f"schedule_{schedule.name}_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
+        filename = filename.replace(' ', '_')
+        
+        # Create the HTTP response with PDF
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        
+        return response
+    
+    def render_pdf(self, schedule, user):
+        """Render the schedule PDF and return its bytes"""
         # Get all days and timeslots for this schedule
-        schedule_days = ScheduleDay.objects.filter(
-            schedule=schedule
-        ).order_by('date')
+        schedule_days = ScheduleDaySerializer.setup_eager_loading(
+            ScheduleDay.objects.filter(schedule=schedule).order_by('date')
+        )
         
         # Prepare context for template
         context = {
             'schedule': schedule,
             'schedule_days': schedule_days,
-            'generated_at': timezone.now(),
-            'user': request.user
+            # The PDF is cached until the schedule changes, so this dates
+            # the version it shows rather than the download
+            'version_as_of': timezone.now(),
+            'user': user
         }
         
         # Render HTML content using a template
@@ -58,14 +77,4 @@ class ExportScheduleView(views.APIView):
         # Generate PDF
         pdf_file = BytesIO()
         weasyprint.HTML(string=html_string).write_pdf(pdf_file)
-        pdf_file.seek(0)
-        
-        # Generate filename
-        filename = f"schedule_{schedule.name}_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
-        filename = filename.replace(' ', '_')
-        
-        # Create the HTTP response with PDF
-        response = HttpResponse(pdf_file, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
\ No newline at end of file
+        return pdf_file.getvalue()
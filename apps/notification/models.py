@@ -21,6 +21,8 @@ class Notification(models.Model):
             models.Index(fields=['type']),
             models.Index(fields=['is_read']),
             models.Index(fields=['created_at']),
+            # Keyset pagination of a user's notifications
+            models.Index(fields=['user', '-created_at', '-id']),
         ]
         ordering = ['-created_at']
         
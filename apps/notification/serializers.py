@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from apps.notification.models import Notification, ScheduledAlarm
+from apps.schedule.fieldsets import SparseFieldsMixin
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'type', 'title', 'message', 'is_read', 'created_at', 'actions', 'delieved']
@@ -1,5 +1,27 @@
 # apps/notification/services.py
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
 from apps.notification.models import Notification, NotificationTypes
+from apps.notification.serializers import NotificationSerializer
+
+def push_notifications(notifications):
+    """
+    Send notifications to their users' WebSocket groups
+    """
+    channel_layer = get_channel_layer()
+    group_send = async_to_sync(channel_layer.group_send)
+    
+    serialized = NotificationSerializer(notifications, many=True).data
+    for notification, data in zip(notifications, serialized):
+        group_send(
+            f"notifications_{notification.user_id}",
+            {
+                "type": "notification_message",
+                "notification": data
+            }
+        )
 
 class NotificationService:
     """
@@ -11,6 +33,29 @@ class NotificationService:
         """
         Send a schedule invitation notification
         """
+        notification = NotificationService.build_schedule_invitation(user, schedule, inviter, role)
+        notification.save()
+        return notification
+    
+    @staticmethod
+    def send_schedule_invitations(users, schedule, inviter, role):
+        """
+        Send schedule invitation notifications to many users with one insert
+        """
+        notifications = Notification.objects.bulk_create([
+            NotificationService.build_schedule_invitation(user, schedule, inviter, role)
+            for user in users
+        ])
+        
+        # bulk_create skips post_save, so push them to the WebSocket here
+        transaction.on_commit(lambda: push_notifications(notifications))
+        return notifications
+    
+    @staticmethod
+    def build_schedule_invitation(user, schedule, inviter, role):
+        """
+        Build an unsaved schedule invitation notification
+        """
         title = f"Invitation to join {schedule.name}"
         message = f"{inviter.username} has invited you to join the schedule '{schedule.name}' as {role.name}"
         
@@ -26,7 +71,7 @@ class NotificationService:
             }
         }
         
-        return Notification.objects.create(
+        return Notification(
             user=user,
             type=NotificationTypes.SCHEDULE_INVITATION,
             title=title,
@@ -89,6 +134,31 @@ class NotificationService:
         """
         Send a permutation response notification
         """
+        notification = NotificationService.build_permutation_response(user, permutation_request, accepted)
+        notification.save()
+        return notification
+    
+    @staticmethod
+    def send_permutation_responses(permutation_requests, accepted=True):
+        """
+        Notify the requesters of many permutation requests with one insert
+        """
+        notifications = Notification.objects.bulk_create([
+            NotificationService.build_permutation_response(
+                permutation_request.requester.user, permutation_request, accepted
+            )
+            for permutation_request in permutation_requests
+        ])
+        
+        # bulk_create skips post_save, so push them to the WebSocket here
+        transaction.on_commit(lambda: push_notifications(notifications))
+        return notifications
+    
+    @staticmethod
+    def build_permutation_response(user, permutation_request, accepted=True):
+        """
+        Build an unsaved permutation response notification
+        """
         recipient = permutation_request.recipient.user
         schedule = permutation_request.requester_slot.schedule_day.schedule
         
@@ -116,7 +186,7 @@ class NotificationService:
             }
         }
         
-        return Notification.objects.create(
+        return Notification(
             user=user,
             type=NotificationTypes.PERMUTATION_RESPONSE,
             title=title,
@@ -6,7 +6,7 @@ from asgiref.sync import async_to_sync
 import json
 
 from apps.notification.models import Notification
-from apps.notification.serializers import NotificationSerializer
+from apps.notification.services import push_notifications
 from apps.schedule.models import PermutationRequest
 from apps.schedule.serializers import PermutationRequestSerializer
 
@@ -17,20 +17,7 @@ def notification_created(sender, instance, created, **kwargs):
     Sends the notification to the user via WebSocket.
     """
     if created:
-        channel_layer = get_channel_layer()
-        user_id = str(instance.user.id)
-        
-        # Serialize notification
-        serializer = NotificationSerializer(instance)
-        
-        # Send to user's notification group
-        async_to_sync(channel_layer.group_send)(
-            f"notifications_{user_id}",
-            {
-                "type": "notification_message",
-                "notification": serializer.data
-            }
-        )
+        push_notifications([instance])
 
 @receiver(post_save, sender=PermutationRequest)
 def permutation_updated(sender, instance, **kwargs):
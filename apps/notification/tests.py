@@ -1,3 +1,70 @@
+import base64
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.notification.enums import NotificationTypes
+from apps.notification.models import Notification
+from apps.schedule.pagination import KeysetPagination
+
+User = get_user_model()
 
-# Create your tests here.
+class NotificationPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='reader', email='reader@example.com')
+        now = timezone.now()
+        # Pairs of notifications share a timestamp to exercise the id tie-breaker
+        self.notifications = Notification.objects.bulk_create([
+            Notification(
+                user=self.user, type=NotificationTypes.SYSTEM,
+                title=f"Notification {i}", message='',
+                created_at=now - datetime.timedelta(seconds=i // 2)
+            )
+            for i in range(40)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def walk(self, url):
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 1)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+    
+    def test_cursor_walk_returns_every_notification_once_in_order(self):
+        seen = self.walk(reverse('notifications-list') + '?page_size=7')
+        
+        expected = [
+            str(notification.id) for notification in sorted(
+                self.notifications, key=lambda n: (n.created_at, n.id), reverse=True
+            )
+        ]
+        self.assertEqual(seen, expected)
+    
+    def test_previous_link_returns_the_previous_page(self):
+        first = self.client.get(reverse('notifications-list'), {'page_size': 5})
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+        
+        self.assertEqual(previous.data['results'], first.data['results'])
+    
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in (
+            'not-a-cursor',
+            KeysetPagination.make_cursor(['x', 'y']),
+            base64.urlsafe_b64encode(b'{"v":[["x"],{"y":1}]}').decode(),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('notifications-list'), {'cursor': cursor})
+                
+                self.assertEqual(response.status_code, 404)
@@ -2,17 +2,19 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 
 from apps.notification.models import Notification
 from apps.notification.serializers import NotificationSerializer
+from apps.schedule.fieldsets import ValuesListMixin
+from apps.schedule.pagination import KeysetPagination
+from apps.schedule.renderers import NEGOTIATED_PARSERS, NEGOTIATED_RENDERERS
 
-class NotificationPagination(PageNumberPagination):
+class NotificationPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
     page_size = 15
-    page_size_query_param = 'page_size'
     max_page_size = 50
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for notifications
     """
@@ -20,6 +22,8 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     # Fix: Change from class to list
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = NotificationPagination
+    renderer_classes = NEGOTIATED_RENDERERS
+    parser_classes = NEGOTIATED_PARSERS
     
     def get_queryset(self):
         """Filter notifications to only show the current user's"""
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ScheduleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.schedule'
+    
+    def ready(self):
+        # Import signals
+        import apps.schedule.signals
@@ -0,0 +1,700 @@
+"""
+Synthetic benchmarks for the schedule services
+
+Run them through the management command, for example:
+    python manage.py benchmark solver --option slots=10000 --option participants=500
+"""
+import datetime
+import random
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Register a benchmark function under the given name"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+class Timer:
+    """Context manager measuring elapsed wall time in milliseconds"""
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+def seed_schedule(days, slots_per_day, participants, per_slot=1, name='Benchmark'):
+    """
+    Create a synthetic schedule with its days, slots, participants and
+    assignments using bulk inserts. Returns (schedule, users).
+    """
+    from django.contrib.auth import get_user_model
+    from apps.schedule.models import Schedule, Role, Participant, TimeSlot
+    from apps.schedule.services import ScheduleCounterService, ScheduleMaterializationService
+    
+    User = get_user_model()
+    tag = random.getrandbits(32)
+    users = User.objects.bulk_create([
+        User(username=f"bench{tag}_{i}", email=f"bench{tag}_{i}@example.com")
+        for i in range(participants + 1)
+    ])
+    owner = users[0]
+    
+    hours = 24 // max(slots_per_day, 1)
+    schedule = Schedule.objects.create(
+        name=name, owner=owner, duration=days,
+        available_days={
+            str(weekday): [
+                {'start_time': f"{i * hours:02d}:00", 'end_time': f"{min(i * hours + hours, 23):02d}:00"}
+                for i in range(slots_per_day)
+            ]
+            for weekday in range(7)
+        }
+    )
+    role = Role.objects.create(schedule=schedule, name='Member')
+    members = Participant.objects.bulk_create([
+        Participant(schedule=schedule, user=user, role=role) for user in users[1:]
+    ])
+    ScheduleCounterService.adjust(schedule, participants=len(members))
+    ScheduleMaterializationService.materialize(schedule, start_date=datetime.date(2025, 1, 1))
+    
+    through = TimeSlot.participants.through
+    slot_ids = TimeSlot.objects.filter(schedule_day__schedule=schedule).values_list('id', flat=True)
+    through.objects.bulk_create(
+        [
+            through(timeslot_id=slot_id, participant_id=members[(i + k) % len(members)].id)
+            for i, slot_id in enumerate(slot_ids)
+            for k in range(min(per_slot, len(members)))
+        ],
+        batch_size=1000
+    )
+    return schedule, users
+
+def measure(view, user, path, params=None):
+    """Call a DRF view once, returning (response, query_count, elapsed_ms)"""
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    
+    request = APIRequestFactory().get(path, params or {})
+    force_authenticate(request, user=user)
+    # Paginators build absolute links from the factory's host
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+            response = view(request)
+            response.render()
+    return response, len(queries), timer.elapsed_ms
+
+@benchmark('solver')
+def solver_benchmark(write, slots=10000, participants=500, days=365, min_days=10, slot_capacity=1, time_budget=30.0, seed=0):
+    """Assignment time of ScheduleSolverService.solve on a synthetic grid"""
+    from apps.schedule.services import ScheduleSolverService
+    
+    rng = random.Random(seed)
+    slot_days = sorted(rng.randrange(days) for _ in range(slots))
+    requirements = [min_days] * participants
+    
+    with Timer() as timer:
+        assignments, days_held, complete = ScheduleSolverService.solve(
+            slot_days, days, requirements,
+            slot_capacity=slot_capacity,
+            time_budget=time_budget
+        )
+    
+    unmet = sum(1 for held, required in zip(days_held, requirements) if held < required)
+    write(f"slots={slots} participants={participants} days={days} slot_capacity={slot_capacity}")
+    write(f"assigned={len(assignments)} unmet={unmet} complete={complete}")
+    write(f"elapsed_ms={timer.elapsed_ms:.1f}")
+
+@benchmark('read_path')
+def read_path_benchmark(write, sizes='30,90,365', slots_per_day=6, participants=50, per_slot=2):
+    """Query count and latency of the nested ScheduleDay listing"""
+    from apps.schedule.views import ScheduleDayViewSet
+    
+    view = ScheduleDayViewSet.as_view({'get': 'list'})
+    for days in (int(size) for size in sizes.split(',')):
+        with rolled_back():
+            schedule, users = seed_schedule(days, slots_per_day, participants, per_slot)
+            response, queries, elapsed_ms = measure(
+                view, users[1], '/api/schedule-days/', {'schedule_id': str(schedule.id)}
+            )
+        write(f"days={days} rows={len(response.data)} queries={queries} elapsed_ms={elapsed_ms:.1f}")
+
+@benchmark('grid')
+def grid_benchmark(write, days=365, slots_per_day=6, participants=200, per_slot=2):
+    """Payload size and latency of the grid endpoint against the nested ScheduleDay listing"""
+    from apps.schedule.views import ScheduleDayViewSet, ScheduleViewSet
+    
+    with rolled_back():
+        schedule, users = seed_schedule(days, slots_per_day, participants, per_slot)
+        user = users[1]
+        
+        nested, _, nested_ms = measure(
+            ScheduleDayViewSet.as_view({'get': 'list'}), user,
+            '/api/schedule-days/', {'schedule_id': str(schedule.id)}
+        )
+        grid_view = ScheduleViewSet.as_view({'get': 'grid'}, **ScheduleViewSet.grid.kwargs)
+        path = f"/api/schedules/{schedule.id}/grid/"
+        grid_json, _, json_ms = measure(
+            lambda request: grid_view(request, pk=schedule.id), user, path, {'format': 'json'}
+        )
+        grid_msgpack, _, msgpack_ms = measure(
+            lambda request: grid_view(request, pk=schedule.id), user, path, {'format': 'msgpack'}
+        )
+    
+    write(f"days={days} slots_per_day={slots_per_day} participants={participants} per_slot={per_slot}")
+    write(f"schedule-days json: bytes={len(nested.content)} elapsed_ms={nested_ms:.1f}")
+    write(f"grid json:          bytes={len(grid_json.content)} elapsed_ms={json_ms:.1f}")
+    write(f"grid msgpack:       bytes={len(grid_msgpack.content)} elapsed_ms={msgpack_ms:.1f}")
+
+@benchmark('pagination')
+def pagination_benchmark(write, notifications=50000, page_size=10, pages='1,10,100,1000,5000'):
+    """Per-page latency of keyset against page-number pagination for notifications"""
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from rest_framework.pagination import PageNumberPagination
+    from apps.notification.enums import NotificationTypes
+    from apps.notification.models import Notification
+    from apps.notification.views import NotificationPagination, NotificationViewSet
+    
+    class OffsetPagination(PageNumberPagination):
+        page_size_query_param = 'page_size'
+        max_page_size = page_size
+    
+    User = get_user_model()
+    keyset_view = NotificationViewSet.as_view({'get': 'list'})
+    offset_view = NotificationViewSet.as_view({'get': 'list'}, pagination_class=OffsetPagination)
+    
+    with rolled_back():
+        user = User.objects.create(username=f"bench{random.getrandbits(32)}", email='bench@example.com')
+        now = timezone.now()
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    user=user, type=NotificationTypes.SYSTEM, title='Benchmark', message='',
+                    created_at=now - datetime.timedelta(seconds=i)
+                )
+                for i in range(notifications)
+            ],
+            batch_size=5000
+        )
+        ordered = Notification.objects.filter(user=user).order_by('-created_at', '-id')
+        
+        for page in (int(page) for page in pages.split(',')):
+            params = {'page_size': page_size}
+            if page > 1:
+                created_at, pk = ordered.values_list('created_at', 'id')[(page - 1) * page_size - 1]
+                params['cursor'] = NotificationPagination.make_cursor([created_at, pk])
+            _, _, keyset_ms = measure(keyset_view, user, '/api/notifications/', params)
+            _, _, offset_ms = measure(offset_view, user, '/api/notifications/', {'page_size': page_size, 'page': page})
+            write(f"page={page} keyset_ms={keyset_ms:.1f} page_number_ms={offset_ms:.1f}")
+
+@benchmark('swap_cycles')
+def swap_cycles_benchmark(write, requests=10000, days=365, slots_per_day=4, participants=500, max_length=6, seed=0):
+    """Latency of swap cycle matching over the pending permutation requests of a schedule"""
+    from apps.schedule.models import PermutationRequest, TimeSlot
+    from apps.schedule.services import SwapCycleService
+    
+    rng = random.Random(seed)
+    with rolled_back():
+        schedule, _ = seed_schedule(days, slots_per_day, participants)
+        positions = list(
+            TimeSlot.participants.through.objects
+            .filter(timeslot__schedule_day__schedule=schedule)
+            .values_list('participant_id', 'timeslot_id')
+        )
+        pending = []
+        for _ in range(requests):
+            (requester_id, requester_slot_id), (recipient_id, recipient_slot_id) = rng.sample(positions, 2)
+            pending.append(PermutationRequest(
+                requester_id=requester_id, requester_slot_id=requester_slot_id,
+                recipient_id=recipient_id, recipient_slot_id=recipient_slot_id
+            ))
+        PermutationRequest.objects.bulk_create(pending, batch_size=1000)
+        
+        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+            result = SwapCycleService.find(schedule, max_length=max_length)
+    
+    lengths = [cycle['length'] for cycle in result['cycles']]
+    write(f"pending={result['pending']} positions={len(positions)} max_length={max_length}")
+    write(f"cycles={len(lengths)} moves={sum(lengths)} longest={max(lengths, default=0)}")
+    write(f"queries={len(queries)} elapsed_ms={timer.elapsed_ms:.1f}")
+
+@benchmark('completion')
+def completion_benchmark(write, participants=500, days=365, slots_per_day=6, per_slot=2):
+    """Queries and latency of the schedule completion checks"""
+    from apps.schedule.services import ScheduleValidationService
+    
+    with rolled_back():
+        schedule, _ = seed_schedule(days, slots_per_day, participants, per_slot)
+        ScheduleValidationService.refresh(schedule_id=schedule.id)
+        
+        with CaptureQueriesContext(connection) as aggregate, Timer() as aggregate_timer:
+            is_valid, unmet = ScheduleValidationService.validate(schedule)
+        with CaptureQueriesContext(connection) as counters, Timer() as counters_timer:
+            ScheduleValidationService.is_complete(schedule)
+    
+    write(f"participants={participants} days={days} slots_per_day={slots_per_day} valid={is_valid} unmet={len(unmet)}")
+    write(f"aggregate: queries={len(aggregate)} elapsed_ms={aggregate_timer.elapsed_ms:.1f}")
+    write(f"counters:  queries={len(counters)} elapsed_ms={counters_timer.elapsed_ms:.1f}")
+
+@benchmark('validation')
+def validation_benchmark(write, participants=1000, days=365, slots_per_day=6, per_slot=3):
+    """Query counts of validating a whole roster against the per-participant checks"""
+    from apps.schedule.models import Participant, Schedule
+    from apps.schedule.services import ScheduleValidationService
+    
+    with rolled_back():
+        seeded, _ = seed_schedule(days, slots_per_day, participants, per_slot)
+        schedule = Schedule.objects.get(pk=seeded.pk)
+        roster = list(Participant.objects.filter(schedule=schedule))
+        
+        with CaptureQueriesContext(connection) as min_days, Timer() as min_days_timer:
+            for participant in roster:
+                schedule.get_min_days_for_user(participant.user_id)
+        with CaptureQueriesContext(connection) as per_participant, Timer() as per_participant_timer:
+            for participant in roster:
+                ScheduleValidationService.validate_participant_selections(schedule, participant)
+        with CaptureQueriesContext(connection) as aggregate, Timer() as aggregate_timer:
+            ScheduleValidationService.validate(schedule)
+    
+    write(f"participants={participants} participant_count={schedule.participant_count}")
+    write(f"min days for roster:      queries={len(min_days)} elapsed_ms={min_days_timer.elapsed_ms:.1f}")
+    write(f"per-participant checks:   queries={len(per_participant)} elapsed_ms={per_participant_timer.elapsed_ms:.1f}")
+    write(f"aggregate validation:     queries={len(aggregate)} elapsed_ms={aggregate_timer.elapsed_ms:.1f}")
+
+@benchmark('heatmap')
+def heatmap_benchmark(write, days=365, slots_per_day=24, participants=500, per_slot=1):
+    """Build time and payload of the heatmap endpoint, uncached then cached"""
+    from apps.schedule.services import ScheduleHeatmapService
+    from apps.schedule.views import ScheduleViewSet
+    
+    view = ScheduleViewSet.as_view({'get': 'heatmap'}, **ScheduleViewSet.heatmap.kwargs)
+    with rolled_back():
+        schedule, users = seed_schedule(days, slots_per_day, participants, per_slot)
+        path = f"/api/schedules/{schedule.id}/heatmap/"
+        
+        with CaptureQueriesContext(connection) as build, Timer() as build_timer:
+            ScheduleHeatmapService.build(schedule)
+        cold, cold_queries, cold_ms = measure(lambda request: view(request, pk=schedule.id), users[0], path)
+        warm, warm_queries, warm_ms = measure(lambda request: view(request, pk=schedule.id), users[0], path)
+    
+    totals = cold.data['totals']
+    write(f"days={days} slots_per_day={slots_per_day} participants={participants} per_slot={per_slot}")
+    write(f"slots={totals['slots']} assignments={totals['assignments']} uncovered={totals['uncovered']}")
+    write(f"build:          queries={len(build)} elapsed_ms={build_timer.elapsed_ms:.1f}")
+    write(f"endpoint cold:  queries={cold_queries} bytes={len(cold.content)} elapsed_ms={cold_ms:.1f}")
+    write(f"endpoint warm:  queries={warm_queries} elapsed_ms={warm_ms:.1f}")
+
+@benchmark('clone')
+def clone_benchmark(write, days=365, slots_per_day=24, participants=500, per_slot=1):
+    """Queries and elapsed time of cloning a schedule with its assignments"""
+    from apps.schedule.services import ScheduleCloneService
+    
+    with rolled_back():
+        schedule, users = seed_schedule(days, slots_per_day, participants, per_slot)
+        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+            result = ScheduleCloneService.clone(schedule, users[0], date_offset=days, include_assignments=True)
+    
+    write(f"days={days} slots_per_day={slots_per_day} participants={participants} per_slot={per_slot}")
+    write(f"copied={result['copied']}")
+    write(f"queries={len(queries)} rows={sum(result['copied'].values())} elapsed_ms={timer.elapsed_ms:.1f}")
+
+@benchmark('membership')
+def membership_benchmark(write, participants=1000000, schedules=50000, per_user=20, days_per_schedule=3, repeat=20):
+    """Latency of one user's listings, OR + DISTINCT joins against the membership subquery"""
+    import statistics
+    import uuid
+    from django.contrib.auth import get_user_model
+    from django.db.models import Q
+    from apps.schedule.membership import ScheduleMembership
+    from apps.schedule.models import Participant, Role, Schedule, ScheduleDay
+    
+    User = get_user_model()
+    user_count = participants // per_user
+    
+    def batches(rows, size=5000):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def timed(queryset):
+        samples = []
+        for _ in range(repeat):
+            with Timer() as timer:
+                list(queryset.all())
+            samples.append(timer.elapsed_ms)
+        return statistics.median(samples)
+    
+    with rolled_back():
+        tag = uuid.uuid4().hex[:8]
+        users = []
+        for batch in batches(User(username=f"m{tag}_{i}", email=f"m{tag}_{i}@example.com") for i in range(user_count)):
+            users.extend(User.objects.bulk_create(batch))
+        owners = users[:schedules]
+        rows = []
+        for batch in batches(Schedule(name=f"Schedule {i}", owner=owners[i % len(owners)]) for i in range(schedules)):
+            rows.extend(Schedule.objects.bulk_create(batch))
+        roles = Role.objects.bulk_create([Role(schedule=schedule, name='Member') for schedule in rows], batch_size=5000)
+        for batch in batches(
+            ScheduleDay(schedule=schedule, date=datetime.date(2025, 1, 1) + datetime.timedelta(days=day))
+            for schedule in rows for day in range(days_per_schedule)
+        ):
+            ScheduleDay.objects.bulk_create(batch)
+        stride = max(1, schedules // per_user)
+        for batch in batches(
+            Participant(schedule=rows[(i + k * stride) % schedules], role=roles[(i + k * stride) % schedules], user=user)
+            for i, user in enumerate(users) for k in range(per_user)
+        ):
+            Participant.objects.bulk_create(batch)
+        
+        user = users[len(users) // 2]
+        joined = Schedule.objects.filter(Q(owner=user) | Q(participants__user=user)).distinct()
+        subquery = Schedule.objects.filter(pk__in=ScheduleMembership.schedule_ids(user))
+        days_joined = ScheduleDay.objects.filter(schedule__participants__user=user).distinct()
+        days_subquery = ScheduleDay.objects.filter(schedule_id__in=ScheduleMembership.schedule_ids(user))
+        
+        results = [
+            ("schedules OR + DISTINCT", timed(joined), len(joined)),
+            ("schedules membership   ", timed(subquery), len(subquery)),
+            ("days join + DISTINCT   ", timed(days_joined), len(days_joined)),
+            ("days membership        ", timed(days_subquery), len(days_subquery)),
+        ]
+        participant_rows = Participant.objects.count()
+    
+    write(f"participants={participant_rows} users={user_count} schedules={schedules} per_user={per_user}")
+    for label, elapsed_ms, rows_returned in results:
+        write(f"{label}: rows={rows_returned} median_ms={elapsed_ms:.2f}")
+
+@benchmark('serializers')
+def serializers_benchmark(write, days=365, slots_per_day=24, participants=500, per_slot=2, repeat=3):
+    """TimeSlot rows per second, ModelSerializer instances against values() rows"""
+    from apps.schedule.fieldsets import ValuesSerializer
+    from apps.schedule.models import TimeSlot
+    from apps.schedule.serializers import TimeSlotSerializer
+    
+    def best(render):
+        samples = []
+        for _ in range(repeat):
+            with Timer() as timer:
+                rendered = render()
+            samples.append(timer.elapsed_ms)
+        return min(samples), len(rendered)
+    
+    with rolled_back():
+        schedule, _ = seed_schedule(days, slots_per_day, participants, per_slot)
+        queryset = TimeSlot.objects.filter(schedule_day__schedule=schedule)
+        renderer = ValuesSerializer(TimeSlotSerializer())
+        results = [
+            ("TimeSlotSerializer", best(
+                lambda: TimeSlotSerializer(TimeSlotSerializer.setup_eager_loading(queryset.all()), many=True).data
+            )),
+            ("ValuesSerializer  ", best(lambda: renderer.render(renderer.values(queryset.all())))),
+        ]
+    
+    for label, (elapsed_ms, rows) in results:
+        write(f"{label}: rows={rows} ms={elapsed_ms:.1f} rows_per_sec={rows / elapsed_ms * 1000:,.0f}")
+
+@benchmark('renderers')
+def renderers_benchmark(write, days=365, slots_per_day=24, participants=500, per_slot=2, notifications=20000, repeat=5):
+    """Encode time and payload size of the listings in each negotiated format"""
+    from rest_framework.renderers import JSONRenderer
+    from apps.notification.enums import NotificationTypes
+    from apps.notification.models import Notification
+    from apps.notification.serializers import NotificationSerializer
+    from apps.schedule.fieldsets import ValuesSerializer
+    from apps.schedule.models import ScheduleDay, TimeSlot
+    from apps.schedule.renderers import FastJSONRenderer, MessagePackRenderer
+    from apps.schedule.serializers import ScheduleDaySerializer, TimeSlotSerializer
+    
+    formats = [("json", JSONRenderer()), ("orjson", FastJSONRenderer()), ("msgpack", MessagePackRenderer())]
+    
+    def listing(serializer, queryset):
+        renderer = ValuesSerializer(serializer)
+        return renderer.render(renderer.values(queryset))
+    
+    with rolled_back():
+        schedule, users = seed_schedule(days, slots_per_day, participants, per_slot)
+        Notification.objects.bulk_create([
+            Notification(
+                user=users[i % len(users)], type=NotificationTypes.ALARM,
+                title=f"Notification {i}", message="Shift reminder " * 4
+            )
+            for i in range(notifications)
+        ], batch_size=1000)
+        payloads = {
+            "time slots": listing(TimeSlotSerializer(), TimeSlot.objects.filter(schedule_day__schedule=schedule)),
+            "schedule days": listing(ScheduleDaySerializer(), ScheduleDay.objects.filter(schedule=schedule)),
+            "notifications": listing(NotificationSerializer(), Notification.objects.all()),
+        }
+    
+    for name, data in payloads.items():
+        for label, renderer in formats:
+            samples = []
+            for _ in range(repeat):
+                with Timer() as timer:
+                    body = renderer.render(data)
+                samples.append(timer.elapsed_ms)
+            write(f"{name:<14} {label:<8} rows={len(data)} encode_ms={min(samples):.1f} bytes={len(body):,}")
+
+@benchmark('streaming')
+def streaming_benchmark(write, rows=1000000, slots_per_day=1000, buffered_rows=100000, samples=10):
+    """Resident memory while streaming a time slot listing, against the buffered response"""
+    import resource
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from apps.schedule.models import ScheduleDay, TimeSlot
+    from apps.schedule.streaming import chunk_size, chunked
+    from apps.schedule.views import TimeSlotViewSet
+    
+    def rss_mb():
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    
+    def seed(schedule, count, first_date):
+        days = ScheduleDay.objects.bulk_create([
+            ScheduleDay(schedule=schedule, date=first_date + datetime.timedelta(days=i))
+            for i in range(-(-count // slots_per_day))
+        ])
+        slots = (
+            TimeSlot(
+                schedule_day=days[i // slots_per_day],
+                start_time=datetime.time(i % 24), end_time=datetime.time(i % 24, 30)
+            )
+            for i in range(count)
+        )
+        for batch in chunked(slots, 10000):
+            TimeSlot.objects.bulk_create(batch)
+    
+    def get(user, params):
+        request = APIRequestFactory().get('/api/time-slots/', params)
+        force_authenticate(request, user=user)
+        return TimeSlotViewSet.as_view({'get': 'list'})(request)
+    
+    # DEBUG would keep every query of the stream in memory
+    with override_settings(DEBUG=False), rolled_back():
+        schedule, users = seed_schedule(0, 1, 1, 0)
+        seed(schedule, rows, datetime.date(2000, 1, 1))
+        
+        response = get(users[0], {'stream': '1'})
+        baseline = rss_mb()
+        sampled = []
+        streamed = 0
+        # Every part after the opening bracket holds one chunk of rows
+        every = max(1, rows // samples // chunk_size())
+        with Timer() as timer:
+            for index, part in enumerate(response.streaming_content):
+                streamed += len(part)
+                if index % every == 0:
+                    sampled.append(rss_mb())
+        write(f"streamed rows={rows} bytes={streamed:,} ms={timer.elapsed_ms:.0f} rss_before_mb={baseline:.1f}")
+        write("rss_mb during stream: " + " ".join(f"{value:.1f}" for value in sampled))
+        
+        TimeSlot.objects.filter(schedule_day__schedule=schedule).delete()
+        ScheduleDay.objects.filter(schedule=schedule).delete()
+        seed(schedule, buffered_rows, datetime.date(2000, 1, 1))
+        baseline = rss_mb()
+        with Timer() as timer:
+            response = get(users[0], {})
+            response.render()
+        write(
+            f"buffered rows={buffered_rows} bytes={len(response.content):,} ms={timer.elapsed_ms:.0f} "
+            f"rss_growth_mb={rss_mb() - baseline:.1f}"
+        )
+
+@benchmark('changelog')
+def changelog_benchmark(write, rows=10000000, schedules=100000, per_user=20, limit=1000, repeat=20, seed=0):
+    """Delta reads of one user's schedules from a change log of many rows, and log write cost"""
+    import statistics
+    import uuid
+    from apps.schedule.changelog import ChangeLog
+    from apps.schedule.enums import ChangeKinds
+    from apps.schedule.models import ChangeSequence, ScheduleChange
+    from apps.schedule.streaming import chunked
+    
+    rng = random.Random(seed)
+    schedule_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(schedules)]
+    mine = rng.sample(schedule_ids, per_user)
+    table = ScheduleChange._meta.db_table
+    uuid_field = ScheduleChange._meta.get_field('object_id')
+    prepared = [uuid_field.get_db_prep_value(schedule_id, connection) for schedule_id in schedule_ids]
+    created_at = ScheduleChange._meta.get_field('created_at').get_db_prep_value(
+        datetime.datetime.now(datetime.timezone.utc), connection
+    )
+    kinds = ChangeKinds.values
+    
+    def timed(func):
+        samples = []
+        for _ in range(repeat):
+            with Timer() as timer:
+                result = func()
+            samples.append(timer.elapsed_ms)
+        return statistics.median(samples), result
+    
+    with override_settings(DEBUG=False), rolled_back():
+        with Timer() as timer, connection.cursor() as cursor:
+            entries = (
+                (
+                    seq, prepared[rng.randrange(schedules)], kinds[seq % len(kinds)],
+                    uuid_field.get_db_prep_value(uuid.UUID(int=rng.getrandbits(128), version=4), connection),
+                    seq % 10 == 0, created_at
+                )
+                for seq in range(1, rows + 1)
+            )
+            for batch in chunked(entries, 50000):
+                cursor.executemany(
+                    f"INSERT INTO {table} (seq, schedule_id, kind, object_id, deleted, created_at) "
+                    f"VALUES (%s, %s, %s, %s, %s, %s)",
+                    batch
+                )
+            ChangeSequence.objects.update_or_create(pk=1, defaults={'value': rows})
+        write(f"seeded rows={rows} schedules={schedules} ms={timer.elapsed_ms:.0f}")
+        
+        for behind in (100, 10000, 1000000, rows):
+            elapsed_ms, delta = timed(lambda: ChangeLog.delta(mine, max(0, rows - behind), limit))
+            served = sum(len(ids) for ids in delta['changed'].values()) + sum(len(ids) for ids in delta['deleted'].values())
+            write(f"delta behind={behind} rows_served={served} has_more={delta['has_more']} median_ms={elapsed_ms:.2f}")
+        
+        queryset = ScheduleChange.objects.filter(schedule_id__in=mine, seq__gt=rows - 10000).order_by('seq')[:limit]
+        write("plan: " + queryset.explain().replace('\n', ' | '))
+        
+        object_ids = [uuid.uuid4() for _ in range(1000)]
+        for count in (1, 1000):
+            elapsed_ms, _ = timed(lambda: ChangeLog.write(
+                [(ChangeKinds.TIME_SLOT, object_id, False) for object_id in object_ids[:count]], schedule_id=mine[0]
+            ))
+            write(f"write entries={count} median_ms={elapsed_ms:.2f}")
+
+@benchmark('sync_upload')
+def sync_upload_benchmark(write, days=417, slots_per_day=24, participants=50, sizes='100,1000,10000'):
+    """Offline edits uploaded in one batch, against saving each slot on its own"""
+    from django.utils import timezone
+    from apps.schedule.models import TimeSlot
+    from apps.users.services import SyncService
+    
+    with override_settings(DEBUG=False), rolled_back():
+        schedule, users = seed_schedule(days, slots_per_day, participants)
+        slot_ids = [str(pk) for pk in TimeSlot.objects.filter(schedule_day__schedule=schedule).values_list('id', flat=True)]
+        write(f"seeded slots={len(slot_ids)}")
+        
+        modified = timezone.now().isoformat()
+        shapes = {
+            # The same change to many slots, as when marking days unavailable
+            'uniform': lambda i: {"is_available": False, "has_alarm": True, "alarm_times": ['07:30']},
+            # Each slot a different alarm, every row its own CASE branch
+            'varied': lambda i: {"has_alarm": True, "alarm_times": [f"{i // 60 % 24:02d}:{i % 60:02d}", str(i)]},
+        }
+        for size in [int(size) for size in str(sizes).split(',')]:
+            for shape, values in shapes.items():
+                edits = [
+                    {"id": slot_id, "last_modified": modified, **values(i)} for i, slot_id in enumerate(slot_ids[:size])
+                ]
+                with rolled_back(), CaptureQueriesContext(connection) as queries, Timer() as timer:
+                    # The owner may edit every slot
+                    result = SyncService.sync_time_slots(users[0], edits)
+                write(
+                    f"{shape} slots={size} updated={len(result['updated'])} errors={len(result['errors'])} "
+                    f"queries={len(queries)} ms={timer.elapsed_ms:.0f} slots_per_s={size / timer.elapsed_ms * 1000:.0f}"
+                )
+            
+            with rolled_back(), CaptureQueriesContext(connection) as queries, Timer() as timer:
+                for slot in TimeSlot.objects.filter(pk__in=slot_ids[:size]):
+                    slot.is_available, slot.has_alarm, slot.alarm_times = False, True, ['07:30']
+                    slot.sync_status = 'synced'
+                    slot.save()
+            write(
+                f"per-row slots={size} queries={len(queries)} ms={timer.elapsed_ms:.0f} "
+                f"slots_per_s={size / timer.elapsed_ms * 1000:.0f}"
+            )
+
+@benchmark('initial_sync')
+def initial_sync_benchmark(write, days=365, slots_per_day=24, participants=50, per_slot=2, chunk_size=500):
+    """Chunked initial sync of a large account, latency of chunks early and late in the walk"""
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from apps.sync.views import SyncTimeSlotView
+    
+    view = SyncTimeSlotView.as_view()
+    with override_settings(DEBUG=False, SYNC_CHUNK_SIZE=chunk_size), rolled_back():
+        schedule, users = seed_schedule(days, slots_per_day, participants, per_slot)
+        params = {'chunked': '1'}
+        samples = []
+        rows = 0
+        with Timer() as total:
+            while True:
+                response, queries, elapsed_ms = measure(view, users[1], '/api/sync/time-slots/', params)
+                rows += len(response.data['time_slots'])
+                samples.append((elapsed_ms, queries, len(response.content)))
+                if response.data['continuation'] is None:
+                    break
+                params = {'continuation': response.data['continuation']}
+        write(f"rows={rows} chunks={len(samples)} chunk_size={chunk_size} total_ms={total.elapsed_ms:.0f}")
+        for index in sorted({0, len(samples) // 2, len(samples) - 1}):
+            elapsed_ms, queries, size = samples[index]
+            write(f"chunk={index} queries={queries} ms={elapsed_ms:.1f} bytes={size:,} token_bytes={len(params.get('continuation', ''))}")
+        
+        request = APIRequestFactory().get('/api/sync/time-slots/', {'stream': '1'})
+        force_authenticate(request, user=users[1])
+        with Timer() as timer:
+            body = b''.join(view(request).streaming_content)
+        write(f"single streamed response ms={timer.elapsed_ms:.0f} bytes={len(body):,}")
+
+@benchmark('reconcile')
+def reconcile_benchmark(write, schedules=5, days=365, slots_per_day=24, participants=20):
+    """Hash reconciliation of a user in several large schedules, against downloading every slot"""
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from apps.schedule.models import Participant, Role, TimeSlot
+    from apps.sync.views import SyncReconcileView, SyncTimeSlotView
+    
+    view = SyncReconcileView.as_view()
+    path = '/api/sync/reconcile/'
+    with override_settings(DEBUG=False), rolled_back():
+        seeded = [seed_schedule(days, slots_per_day, participants, name=f"Reconcile {i}") for i in range(schedules)]
+        user = seeded[0][1][1]
+        for schedule, _ in seeded[1:]:
+            Participant.objects.create(schedule=schedule, user=user, role=Role.objects.filter(schedule=schedule).first())
+        schedule = seeded[0][0]
+        write(f"seeded schedules={schedules} slots={TimeSlot.objects.count()}")
+        
+        for label in ('cold', 'warm'):
+            response, queries, elapsed_ms = measure(view, user, path)
+            write(f"root {label} queries={queries} ms={elapsed_ms:.1f} bytes={len(response.content):,}")
+        
+        slot = TimeSlot.objects.filter(schedule_day__schedule=schedule).order_by('schedule_day__date').last()
+        slot.has_alarm = True
+        slot.save()
+        date = slot.schedule_day.date
+        walk = [
+            ('root', {}),
+            ('schedule', {'schedule': schedule.id}),
+            ('month', {'schedule': schedule.id, 'month': date.strftime('%Y-%m')}),
+            ('day', {'schedule': schedule.id, 'date': date.isoformat()}),
+        ]
+        total_bytes = 0
+        for label, params in walk:
+            response, queries, elapsed_ms = measure(view, user, path, params)
+            total_bytes += len(response.content)
+            write(f"after one edit {label} queries={queries} ms={elapsed_ms:.1f} bytes={len(response.content):,}")
+        
+        request = APIRequestFactory().get('/api/sync/time-slots/', {'full': '1', 'stream': '1'})
+        force_authenticate(request, user=user)
+        full = sum(len(chunk) for chunk in SyncTimeSlotView.as_view()(request).streaming_content)
+        write(f"walk bytes={total_bytes:,}, full download bytes={full:,}")
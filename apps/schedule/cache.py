@@ -0,0 +1,95 @@
+"""
+Versioned read cache for serialized schedule representations.
+
+Entries are keyed by (schedule_id, version, name). Schedule.version is bumped
+whenever the schedule or one of its rows changes, so stale entries simply
+become unreachable and are left for the backend's LRU eviction.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+from apps.schedule.models import Schedule
+
+CACHE_ALIAS = 'schedules'
+HITS_KEY = 'schedule-cache:hits'
+MISSES_KEY = 'schedule-cache:misses'
+
+_missing = object()
+
+class ScheduleCache:
+    """
+    Helpers for reading and invalidating the schedule read cache
+    """
+    
+    @staticmethod
+    def backend():
+        """Dedicated cache alias when configured, the default cache otherwise"""
+        return caches[CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else 'default']
+    
+    @staticmethod
+    def key(schedule_id, version, name):
+        return f"schedule:{schedule_id}:v{version}:{name}"
+    
+    @staticmethod
+    def get_version(schedule_id):
+        """Current version of a schedule, None if it does not exist"""
+        return Schedule.objects.filter(pk=schedule_id).values_list('version', flat=True).first()
+    
+    @staticmethod
+    def get_or_build(schedule_id, version, name, build):
+        """
+        Return the cached value for (schedule_id, version, name), calling
+        build() and caching its result on a miss
+        """
+        cache = ScheduleCache.backend()
+        key = ScheduleCache.key(schedule_id, version, name)
+        
+        value = cache.get(key, _missing)
+        if value is not _missing:
+            ScheduleCache._count(cache, HITS_KEY)
+            return value
+        
+        ScheduleCache._count(cache, MISSES_KEY)
+        value = build()
+        cache.set(key, value)
+        return value
+    
+    @staticmethod
+    def bump_version(schedule_id=None, schedule_day_id=None):
+        """
+        Invalidate every cached representation of a schedule, identified
+        directly or through one of its days
+        """
+        if schedule_id is not None:
+            schedules = Schedule.objects.filter(pk=schedule_id)
+        else:
+            schedules = Schedule.objects.filter(days__id=schedule_day_id)
+        schedules.update(version=F('version') + 1)
+    
+    @staticmethod
+    def stats():
+        """
+        Hit and miss counters of the cache backend, shared by every process
+        with Redis but kept per process by the LocMem fallback
+        """
+        cache = ScheduleCache.backend()
+        hits = cache.get(HITS_KEY, 0)
+        misses = cache.get(MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None
+        }
+    
+    @staticmethod
+    def reset_stats():
+        ScheduleCache.backend().delete_many([HITS_KEY, MISSES_KEY])
+    
+    @staticmethod
+    def _count(cache, key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
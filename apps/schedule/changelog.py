@@ -0,0 +1,170 @@
+"""
+Append-only change log of schedules, time slots, days and participants.
+
+Every committed change of one of those rows appends an entry (schedule_id,
+kind, object_id, deleted) with a sequence number, deletions as tombstones.
+A client that synced up to seq N asks for the entries after N of its
+schedules, an index range scan on (schedule_id, seq), and reads the
+current state of the rows they name.
+
+Entries are first written as PendingChange rows in the transaction of the
+change, so they commit or roll back with it. Once it commits they are
+published: moved to the log in a short transaction holding the lock of the
+ChangeSequence row. Sequence numbers are therefore handed out in the order
+the entries become visible and a reader never skips an entry that commits
+later with a lower number, which timestamps and auto-increment keys cannot
+promise, while writers of schedules do not queue on that lock for the
+length of their own transactions.
+
+Publishing is robust, a failure leaves the entries pending. Entries still
+pending after CHANGE_LOG_REPAIR_SECONDS, such as those of a process that
+died between the two commits, are published by the next delta read or by
+the publish_change_log command, with a later sequence number than any a
+reader already holds. The tombstone of a schedule or a day also stands for
+the rows deleted along with it.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.schedule.enums import ChangeKinds
+from apps.schedule.models import ChangeSequence, PendingChange, ScheduleChange, ScheduleDay
+
+class ChangeLog:
+    """
+    Helpers for writing and reading the schedule change log
+    """
+    BATCH_SIZE = 5000
+    
+    @staticmethod
+    def record(kind, object_ids, schedule_id=None, schedule_day_id=None, deleted=False):
+        """
+        Log rows of a schedule, identified directly or through one of its
+        days, as changed or deleted. The entries are written with the
+        current transaction and numbered once it commits.
+        """
+        batch = uuid.uuid4()
+        pending = [
+            PendingChange(
+                batch=batch, schedule_id=schedule_id, schedule_day_id=schedule_day_id,
+                kind=kind, object_id=object_id, deleted=deleted
+            )
+            for object_id in object_ids
+        ]
+        if pending:
+            PendingChange.objects.bulk_create(pending, batch_size=ChangeLog.BATCH_SIZE)
+            transaction.on_commit(lambda: ChangeLog.publish([batch]), robust=True)
+    
+    @staticmethod
+    def publish(batches):
+        """
+        Move the pending entries of some batches to the log, skipping those
+        another caller already moved. Returns the number of entries moved.
+        """
+        with transaction.atomic():
+            rows = list(
+                PendingChange.objects.select_for_update().filter(batch__in=batches).order_by('pk')
+                .values_list('pk', 'schedule_id', 'schedule_day_id', 'kind', 'object_id', 'deleted')
+            )
+            if not rows:
+                return 0
+            
+            day_ids = {schedule_day_id for _, schedule_id, schedule_day_id, _, _, _ in rows if schedule_id is None}
+            days = dict(
+                ScheduleDay.objects.filter(pk__in=day_ids).values_list('id', 'schedule_id')
+            ) if day_ids else {}
+            by_schedule = {}
+            for _, schedule_id, schedule_day_id, kind, object_id, deleted in rows:
+                schedule_id = schedule_id or days.get(schedule_day_id)
+                # A row whose day is gone as well is covered by the day's tombstone
+                if schedule_id is not None:
+                    by_schedule.setdefault(schedule_id, []).append((kind, object_id, deleted))
+            for schedule_id, entries in by_schedule.items():
+                ChangeLog.write(entries, schedule_id)
+            PendingChange.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        return len(rows)
+    
+    @staticmethod
+    def repair(seconds=None):
+        """
+        Publish the entries pending for longer than seconds,
+        CHANGE_LOG_REPAIR_SECONDS by default. Returns the number moved.
+        """
+        if seconds is None:
+            seconds = getattr(settings, 'CHANGE_LOG_REPAIR_SECONDS', 60)
+        stale = PendingChange.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=seconds))
+        moved = 0
+        while batches := list(stale.values_list('batch', flat=True).distinct()[:ChangeLog.BATCH_SIZE]):
+            moved += ChangeLog.publish(batches)
+        return moved
+    
+    @staticmethod
+    def write(entries, schedule_id=None, schedule_day_id=None):
+        """Append entries to the log, the last entry of a row wins"""
+        if schedule_id is None:
+            schedule_id = ScheduleDay.objects.filter(pk=schedule_day_id).values_list('schedule_id', flat=True).first()
+            if schedule_id is None:
+                # The day is gone as well, its tombstone covers the rows
+                return
+        latest = {(kind, object_id): deleted for kind, object_id, deleted in entries}
+        
+        with transaction.atomic():
+            first = ChangeLog.allocate(len(latest))
+            ScheduleChange.objects.bulk_create([
+                ScheduleChange(
+                    seq=first + i, schedule_id=schedule_id, kind=kind, object_id=object_id, deleted=deleted
+                )
+                for i, ((kind, object_id), deleted) in enumerate(latest.items())
+            ], batch_size=ChangeLog.BATCH_SIZE)
+    
+    @staticmethod
+    def allocate(count):
+        """
+        Reserve count sequence numbers and return the first one. The
+        counter row stays locked until the calling transaction commits.
+        """
+        counter = ChangeSequence.objects.filter(pk=1)
+        if not counter.update(value=F('value') + count):
+            ChangeSequence.objects.get_or_create(pk=1)
+            counter.update(value=F('value') + count)
+        return counter.values_list('value', flat=True).get() - count + 1
+    
+    @staticmethod
+    def last_seq():
+        """Sequence number of the last committed entry"""
+        return ChangeSequence.objects.filter(pk=1).values_list('value', flat=True).first() or 0
+    
+    @staticmethod
+    def delta(schedule_ids, after, limit=1000):
+        """
+        Rows of some schedules changed after sequence number `after`, at most
+        limit entries at a time
+        
+        Returns:
+            dict: {"changed": {kind: [ids]}, "deleted": {kind: [ids]},
+            "seq": sequence number to continue from, "has_more": bool}
+        """
+        ChangeLog.repair()
+        entries = list(
+            ScheduleChange.objects.filter(schedule_id__in=schedule_ids, seq__gt=after)
+            .order_by('seq').values_list('seq', 'kind', 'object_id', 'deleted')[:limit + 1]
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        
+        latest = {(kind, object_id): deleted for _, kind, object_id, deleted in entries}
+        changed = {kind: [] for kind in ChangeKinds.values}
+        deleted = {kind: [] for kind in ChangeKinds.values}
+        for (kind, object_id), is_deleted in latest.items():
+            (deleted if is_deleted else changed)[kind].append(object_id)
+        
+        return {
+            "changed": changed,
+            "deleted": deleted,
+            "seq": entries[-1][0] if entries else after,
+            "has_more": has_more,
+        }
@@ -5,4 +5,10 @@ class StatusChoices(models.TextChoices):
     PENDING = 'Pending'
     ACCEPTED = 'Accepted'
     REJECTED = 'Rejected'
-    CANCELLED = 'Cancelled'
\ No newline at end of file
+    CANCELLED = 'Cancelled'
+
+class ChangeKinds(models.TextChoices):
+    SCHEDULE = 'schedule'
+    SCHEDULE_DAY = 'schedule_day'
+    TIME_SLOT = 'time_slot'
+    PARTICIPANT = 'participant'
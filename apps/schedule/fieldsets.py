@@ -0,0 +1,200 @@
+"""
+Sparse fieldsets and values()-based rendering for list endpoints.
+
+?fields=id,start_time limits a response to the listed top-level fields.
+Nested objects named in ?fields= are rendered as primary keys unless they
+are also named in ?expand=. Without ?fields= every field is rendered in
+full, as before.
+
+List endpoints render their rows from values() through the to_representation
+of the serializer's own fields, so the output is identical to the
+ModelSerializer one without instantiating a model per row. Serializers with
+fields that do not map to a column or a plain relation (properties, method
+fields, nested lists below a nested object) keep the ModelSerializer path.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.response import Response
+
+def parse_names(value):
+    """Set of names of a comma separated query parameter"""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin applying the ?fields= and ?expand= parameters of the
+    request in its context to its top-level fields
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        params = getattr(request, 'query_params', None)
+        if params is None:
+            return
+        
+        fields = parse_names(params.get('fields'))
+        if not fields:
+            return
+        expand = parse_names(params.get('expand'))
+        for name, field in list(self.fields.items()):
+            if name not in fields:
+                self.fields.pop(name)
+            elif name not in expand:
+                nested = field.child if isinstance(field, serializers.ListSerializer) else field
+                if isinstance(nested, serializers.BaseSerializer):
+                    source = {} if field.source == name else {'source': field.source}
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(
+                        read_only=True, many=nested is not field, **source
+                    )
+
+class Unsupported(Exception):
+    """A serializer field that values() rows cannot render"""
+
+class ValuesSerializer:
+    """
+    Read-only rendering of values() rows with the fields of a
+    ModelSerializer instance. Nested objects behind a foreign key are read
+    in the same query, nested lists with one more query per relation.
+    """
+    
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.columns = [self.pk]
+        self.lists = []
+        try:
+            self.entries = self.plan(serializer, '')
+        except (Unsupported, FieldDoesNotExist):
+            self.entries = None
+    
+    @property
+    def supported(self):
+        return self.entries is not None
+    
+    def plan(self, serializer, prefix):
+        """
+        (name, kind, info) rendering steps of a serializer, kind being
+        column, nested, list or pks
+        """
+        model = serializer.Meta.model
+        # Ordering of nested lists, by field name
+        orderings = getattr(serializer, 'values_orderings', {})
+        entries = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if isinstance(field, (serializers.ListSerializer, ManyRelatedField)):
+                if prefix:
+                    raise Unsupported(name)
+                child = field.child if isinstance(field, serializers.ListSerializer) else None
+                nested = NestedList(model._meta.get_field(source), child, orderings.get(name, ()))
+                self.lists.append((name, nested))
+                entries.append((name, 'list', nested))
+            elif isinstance(field, serializers.ModelSerializer):
+                relation = model._meta.get_field(source)
+                if not (relation.many_to_one or relation.one_to_one) or relation.auto_created:
+                    raise Unsupported(name)
+                column = f"{prefix}{source}"
+                self.columns.append(column)
+                entries.append((name, 'nested', (column, self.plan(field, f"{column}__"))))
+            elif isinstance(field, RelatedField):
+                column = f"{prefix}{source}"
+                self.columns.append(column)
+                entries.append((name, 'pk', column))
+            else:
+                model_field = model._meta.get_field(source)
+                if not model_field.concrete or model_field.is_relation:
+                    raise Unsupported(name)
+                column = f"{prefix}{source}"
+                self.columns.append(column)
+                entries.append((name, 'column', (column, field)))
+        return entries
+    
+    def values(self, queryset, **expressions):
+        """The queryset as the values() rows render() expects"""
+        return queryset.prefetch_related(None).values(*dict.fromkeys(self.columns), **expressions)
+    
+    def render(self, rows):
+        """Representations of values() rows, in order"""
+        rows = list(rows)
+        loaded = {}
+        if self.lists:
+            ids = [row[self.pk] for row in rows]
+            loaded = {name: nested.load(ids) for name, nested in self.lists}
+        return [self.render_row(row, self.entries, loaded) for row in rows]
+    
+    def render_row(self, row, entries, loaded):
+        data = {}
+        for name, kind, info in entries:
+            if kind == 'column':
+                column, field = info
+                value = row[column]
+                data[name] = None if value is None else field.to_representation(value)
+            elif kind == 'pk':
+                data[name] = row[info]
+            elif kind == 'nested':
+                column, nested = info
+                data[name] = None if row[column] is None else self.render_row(row, nested, loaded)
+            else:
+                data[name] = loaded[name].get(row[self.pk], [])
+        return data
+
+class NestedList:
+    """
+    A nested list of a ValuesSerializer, loaded for many parents at once
+    """
+    PARENT = 'values_parent'
+    
+    def __init__(self, relation, serializer, ordering=()):
+        self.model = relation.related_model
+        if relation.many_to_many and not relation.auto_created:
+            # Forward many-to-many, filtered through its reverse query name
+            self.link = relation.related_query_name()
+        elif relation.one_to_many or relation.many_to_many:
+            self.link = relation.field.name
+        else:
+            raise Unsupported(relation.name)
+        self.ordering = ordering
+        self.serializer = None
+        if serializer is not None:
+            self.serializer = ValuesSerializer(serializer)
+            if not self.serializer.supported:
+                raise Unsupported(relation.name)
+    
+    def load(self, parent_ids):
+        """{parent_id: [representation or primary key, ...]}"""
+        queryset = self.model.objects.filter(**{f"{self.link}__in": parent_ids})
+        if self.ordering:
+            queryset = queryset.order_by(*self.ordering)
+        
+        grouped = {}
+        if self.serializer is None:
+            for parent_id, pk in queryset.values_list(self.link, 'pk'):
+                grouped.setdefault(parent_id, []).append(pk)
+            return grouped
+        
+        rows = list(self.serializer.values(queryset, **{self.PARENT: F(self.link)}))
+        for row, data in zip(rows, self.serializer.render(rows)):
+            grouped.setdefault(row[self.PARENT], []).append(data)
+        return grouped
+
+class ValuesListMixin:
+    """
+    ViewSet mixin serving list requests from values() rows whenever the
+    serializer, after ?fields= and ?expand=, supports it
+    """
+    
+    def list(self, request, *args, **kwargs):
+        renderer = ValuesSerializer(self.get_serializer(many=True).child)
+        if not renderer.supported:
+            return super().list(request, *args, **kwargs)
+        
+        rows = renderer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(renderer.render(page))
+        return Response(renderer.render(rows))
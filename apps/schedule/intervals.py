@@ -0,0 +1,236 @@
+"""
+Interval indexes over time slot assignments, used to detect overlapping
+assignments of a user across all of their schedules.
+
+An IntervalIndex keeps, per date, the start and end minutes of its slots in
+arrays sorted by start together with the running maximum of the ends, so
+checking a new interval against a date is a bisection. UserIntervals keeps
+one such index per user in this process, built lazily and stamped with the
+versions of the user's schedules. Membership changes made by this process
+are applied incrementally on commit, anything else makes the stamp differ
+and the index is rebuilt on the next read.
+"""
+import bisect
+import threading
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.models import Participant, ScheduleDay, TimeSlot
+
+MINUTES_PER_DAY = 24 * 60
+
+_indexes = OrderedDict()
+_lock = threading.RLock()
+
+def span(start_time, end_time):
+    """(start, end) minutes of a slot, a slot ending at or before its start runs until midnight"""
+    start = start_time.hour * 60 + start_time.minute
+    end = end_time.hour * 60 + end_time.minute
+    return start, end if end > start else MINUTES_PER_DAY
+
+class IntervalIndex:
+    """
+    Intervals grouped by date, each identified by a key
+    """
+    def __init__(self):
+        # date -> (starts, ends, max_ends, keys), sorted by start
+        self.dates = {}
+        # key -> (date, start_time, end_time, extra)
+        self.intervals = {}
+    
+    def __len__(self):
+        return len(self.intervals)
+    
+    def add(self, key, date, start_time, end_time, extra=None):
+        if key in self.intervals:
+            self.remove(key)
+        start, end = span(start_time, end_time)
+        starts, ends, max_ends, keys = self.dates.setdefault(
+            date, (array('H'), array('H'), array('H'), [])
+        )
+        position = bisect.bisect_right(starts, start)
+        starts.insert(position, start)
+        ends.insert(position, end)
+        max_ends.insert(position, 0)
+        keys.insert(position, key)
+        self._update_max_ends(date, position)
+        self.intervals[key] = (date, start_time, end_time, extra)
+    
+    def remove(self, key):
+        interval = self.intervals.pop(key, None)
+        if interval is None:
+            return
+        date = interval[0]
+        starts, ends, max_ends, keys = self.dates[date]
+        position = keys.index(key)
+        for values in (starts, ends, max_ends, keys):
+            del values[position]
+        if keys:
+            self._update_max_ends(date, position)
+        else:
+            del self.dates[date]
+    
+    def _update_max_ends(self, date, position):
+        _, ends, max_ends, _ = self.dates[date]
+        running = max_ends[position - 1] if position else 0
+        for i in range(position, len(ends)):
+            running = max(running, ends[i])
+            max_ends[i] = running
+    
+    def overlapping(self, date, start_time, end_time, exclude=()):
+        """
+        Keys of the intervals overlapping [start_time, end_time) on date.
+        Answering that there are none takes one bisection.
+        """
+        entry = self.dates.get(date)
+        if entry is None:
+            return []
+        starts, ends, max_ends, keys = entry
+        start, end = span(start_time, end_time)
+        # Intervals starting before the end, any of them may overlap
+        position = bisect.bisect_left(starts, end)
+        if not position or max_ends[position - 1] <= start:
+            return []
+        return [
+            keys[i] for i in range(position)
+            if ends[i] > start and keys[i] not in exclude
+        ]
+    
+    def conflicts(self):
+        """Every pair of overlapping intervals, as (key, key, date), by date"""
+        pairs = []
+        for date in sorted(self.dates):
+            starts, ends, _, keys = self.dates[date]
+            active = []
+            for i in range(len(keys)):
+                active = [j for j in active if ends[j] > starts[i]]
+                pairs.extend((keys[j], keys[i], date) for j in active)
+                active.append(i)
+        return pairs
+
+class UserIntervalIndex(IntervalIndex):
+    """
+    Assignments of one user across every schedule they participate in
+    """
+    def __init__(self, user_id, versions, participant_ids):
+        super().__init__()
+        self.user_id = user_id
+        # schedule_id -> version the index reflects
+        self.versions = versions
+        self.participant_ids = participant_ids
+
+class UserIntervals:
+    """
+    Registry of the per-user interval indexes kept by this process
+    """
+    
+    @staticmethod
+    def get(user_id):
+        """
+        Interval index of a user, checked against the versions of their
+        schedules with one query and rebuilt with a second one when stale
+        """
+        return UserIntervals.get_many([user_id])[user_id]
+    
+    @staticmethod
+    def get_many(user_ids):
+        """
+        Interval indexes of many users, checked with one query and the
+        stale ones rebuilt together with a second one
+        
+        Returns:
+            dict: {user_id: UserIntervalIndex}
+        """
+        versions = {user_id: {} for user_id in user_ids}
+        participant_ids = {user_id: set() for user_id in user_ids}
+        for user_id, participant_id, schedule_id, version in Participant.objects.filter(
+            user_id__in=versions
+        ).values_list('user_id', 'id', 'schedule_id', 'schedule__version'):
+            versions[user_id][schedule_id] = version
+            participant_ids[user_id].add(participant_id)
+        
+        indexes = {}
+        with _lock:
+            for user_id, stamp in versions.items():
+                index = _indexes.get(user_id)
+                if index is not None and index.versions == stamp:
+                    _indexes.move_to_end(user_id)
+                    indexes[user_id] = index
+        stale = {
+            user_id: UserIntervalIndex(user_id, versions[user_id], participant_ids[user_id])
+            for user_id in versions if user_id not in indexes
+        }
+        if not stale:
+            return indexes
+        
+        rows = TimeSlot.objects.filter(participants__user_id__in=stale).values_list(
+            'participants__user_id', 'id', 'schedule_day__date', 'start_time', 'end_time', 'schedule_day__schedule_id'
+        )
+        for user_id, slot_id, date, start_time, end_time, schedule_id in rows:
+            stale[user_id].add(slot_id, date, start_time, end_time, schedule_id)
+        
+        with _lock:
+            for user_id, index in stale.items():
+                _indexes[user_id] = index
+                _indexes.move_to_end(user_id)
+            while len(_indexes) > getattr(settings, 'USER_INTERVAL_MAX_INDEXES', 1000):
+                _indexes.popitem(last=False)
+        indexes.update(stale)
+        return indexes
+    
+    @staticmethod
+    def membership_changed(added, slot_ids, participant_ids, schedule_id=None, schedule_day_id=None):
+        """
+        Record a TimeSlot membership change made by this process, right after
+        the version bump of the schedule. slot_ids or participant_ids may be
+        None for "every slot of the schedule" and "every holder" of a clear.
+        """
+        with _lock:
+            if not _indexes:
+                return
+        if schedule_id is None:
+            schedule_id = ScheduleDay.objects.filter(pk=schedule_day_id).values_list('schedule_id', flat=True).first()
+        with _lock:
+            stamped = [index for index in _indexes.values() if schedule_id in index.versions]
+        if not stamped:
+            return
+        
+        version = ScheduleCache.get_version(schedule_id)
+        participant_ids = set(participant_ids) if participant_ids is not None else None
+        slots = {}
+        if added and any(index.participant_ids & participant_ids for index in stamped):
+            slots = {
+                slot_id: (date, start_time, end_time)
+                for slot_id, date, start_time, end_time in TimeSlot.objects.filter(pk__in=slot_ids)
+                .values_list('id', 'schedule_day__date', 'start_time', 'end_time')
+            }
+        
+        def apply():
+            with _lock:
+                for index in stamped:
+                    if _indexes.get(index.user_id) is not index:
+                        continue
+                    if version is None or index.versions.get(schedule_id) != version - 1:
+                        del _indexes[index.user_id]
+                        continue
+                    if participant_ids is None or index.participant_ids & participant_ids:
+                        if added:
+                            for slot_id, (date, start_time, end_time) in slots.items():
+                                index.add(slot_id, date, start_time, end_time, schedule_id)
+                        else:
+                            for slot_id in list(slot_ids if slot_ids is not None else index.intervals):
+                                interval = index.intervals.get(slot_id)
+                                if interval is not None and interval[3] == schedule_id:
+                                    index.remove(slot_id)
+                    index.versions[schedule_id] = version
+        
+        transaction.on_commit(apply)
+    
+    @staticmethod
+    def clear():
+        with _lock:
+            _indexes.clear()
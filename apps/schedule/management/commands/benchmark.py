@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.schedule.benchmarks import BENCHMARKS
+
+class Command(BaseCommand):
+    help = 'Run a synthetic performance benchmark'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS), help='Benchmark to run')
+        parser.add_argument(
+            '--option', action='append', default=[], metavar='KEY=VALUE',
+            help='Override a benchmark parameter, e.g. --option slots=10000'
+        )
+    
+    def handle(self, *args, **options):
+        func = BENCHMARKS[options['name']]
+        defaults = func.__kwdefaults__ or {}
+        if func.__defaults__:
+            names = func.__code__.co_varnames[1:func.__code__.co_argcount]
+            defaults = dict(zip(names[-len(func.__defaults__):], func.__defaults__))
+        
+        params = {}
+        for option in options['option']:
+            key, sep, value = option.partition('=')
+            if not sep or key not in defaults:
+                raise CommandError(f"Unknown option '{option}', expected one of: {', '.join(defaults)}")
+            if isinstance(defaults[key], bool):
+                params[key] = value.lower() in ('1', 'true', 'yes')
+            else:
+                params[key] = type(defaults[key])(value)
+        
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Benchmark: {options['name']}"))
+        func(self.stdout.write, **params)
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.schedule.changelog import ChangeLog
+
+class Command(BaseCommand):
+    help = 'Publish change log entries left pending after their change committed, meant to run periodically'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds', type=int, default=getattr(settings, 'CHANGE_LOG_REPAIR_SECONDS', 60),
+            help='Seconds an entry has been pending, CHANGE_LOG_REPAIR_SECONDS by default'
+        )
+    
+    def handle(self, *args, **options):
+        published = ChangeLog.repair(options['seconds'])
+        self.stdout.write(self.style.SUCCESS(f"Published {published} pending change(s)"))
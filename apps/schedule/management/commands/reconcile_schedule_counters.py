@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.schedule.services import ScheduleCounterService, ScheduleValidationService
+
+class Command(BaseCommand):
+    help = 'Repair drifted participant counters of schedules, meant to run periodically'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('schedule_ids', nargs='*', help='Schedules to check, all of them by default')
+    
+    def handle(self, *args, **options):
+        repaired = ScheduleCounterService.reconcile(options['schedule_ids'] or None)
+        for schedule_id, stored, actual in repaired:
+            self.stdout.write(
+                f"{schedule_id}: participants {stored[0]} -> {actual[0]}, accepted {stored[1]} -> {actual[1]}"
+            )
+            # The default minimum days depend on the participant count
+            ScheduleValidationService.refresh(schedule_id=schedule_id, participant_ids=[])
+        
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(repaired)} schedule(s)"))
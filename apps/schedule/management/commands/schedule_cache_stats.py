@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.schedule.cache import ScheduleCache
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the schedule read cache'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+    
+    def handle(self, *args, **options):
+        stats = ScheduleCache.stats()
+        self.stdout.write(f"hits={stats['hits']} misses={stats['misses']} hit_ratio={stats['hit_ratio']}")
+        
+        if options['reset']:
+            ScheduleCache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
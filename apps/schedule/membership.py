@@ -0,0 +1,35 @@
+"""
+Schedule membership lookups. A user is a member of the schedules they own
+and of those they participate in, each side answered from its own index:
+Schedule(owner) and Participant(user, schedule), which covers the lookup
+without reading the participant rows.
+"""
+from apps.schedule.models import Participant, Schedule
+
+class ScheduleMembership:
+    """
+    Subqueries selecting the schedules of a user
+    """
+    
+    @staticmethod
+    def schedule_ids(user):
+        """
+        Ids of the schedules owned by or shared with user, as a UNION ALL
+        subquery to filter on with __in. Listings filtered this way need
+        neither an OR across a join nor DISTINCT over the joined rows.
+        """
+        return Participant.objects.filter(user=user).values('schedule_id').union(
+            Schedule.objects.filter(owner=user).values('id'), all=True
+        )
+    
+    @staticmethod
+    def editable_schedule_ids(user):
+        """Ids of the schedules user owns or holds a role that can edit"""
+        return Participant.objects.filter(user=user, role__can_edit_schedule=True).values('schedule_id').union(
+            Schedule.objects.filter(owner=user).values('id'), all=True
+        )
+    
+    @staticmethod
+    def participant_schedule_ids(user):
+        """Ids of the schedules user participates in"""
+        return Participant.objects.filter(user=user).values('schedule_id')
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0004_schedule_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='permutationrequest',
+            index=models.Index(fields=['-created_at', '-id'], name='schedule_pe_created_a4fd96_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleday',
+            index=models.Index(fields=['date', 'id'], name='schedule_sc_date_b6ca25_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['schedule_day', 'start_time', 'id'], name='schedule_ti_schedul_bfd31b_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_selected_days(apps, schema_editor):
+    Participant = apps.get_model('schedule', 'Participant')
+    TimeSlot = apps.get_model('schedule', 'TimeSlot')
+    days = (
+        TimeSlot.participants.through.objects.filter(participant_id=OuterRef('pk'))
+        .values('participant_id')
+        .annotate(days=Count('timeslot__schedule_day__date', distinct=True))
+        .values('days')[:1]
+    )
+    Participant.objects.update(selected_days=Coalesce(Subquery(days), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0005_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='selected_days',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_selected_days, migrations.RunPython.noop),
+    ]
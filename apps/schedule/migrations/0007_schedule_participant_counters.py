@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_participants(apps, schema_editor):
+    Schedule = apps.get_model('schedule', 'Schedule')
+    Participant = apps.get_model('schedule', 'Participant')
+    counts = (
+        Participant.objects.filter(schedule_id=OuterRef('pk'))
+        .values('schedule_id')
+        .annotate(
+            total=Count('id'),
+            accepted=Count('id', filter=Q(invitation_accepted=True))
+        )
+    )
+    Schedule.objects.update(
+        participant_count=Coalesce(Subquery(counts.values('total')[:1]), 0),
+        accepted_participant_count=Coalesce(Subquery(counts.values('accepted')[:1]), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0006_participant_selected_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='accepted_participant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-17 12:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0007_schedule_participant_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='participant',
+            name='schedule_pa_user_id_c2e4a4_idx',
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['user', 'schedule'], name='schedule_pa_user_id_34ee8d_idx'),
+        ),
+    ]
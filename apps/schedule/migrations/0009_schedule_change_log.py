@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-17 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0008_participant_user_schedule_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScheduleChange',
+            fields=[
+                ('seq', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('schedule_id', models.UUIDField()),
+                ('kind', models.CharField(choices=[('schedule', 'Schedule'), ('schedule_day', 'Schedule Day'), ('time_slot', 'Time Slot'), ('participant', 'Participant')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['schedule_id', 'seq'], name='schedule_sc_schedul_263aaa_idx')],
+            },
+        ),
+    ]
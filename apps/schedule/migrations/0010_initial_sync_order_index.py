@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0009_schedule_change_log'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['schedule_day', 'id'], name='schedule_ti_schedul_d99647_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='timeslot',
+            name='schedule_ti_schedul_9a9b04_idx',
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0010_initial_sync_order_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.UUIDField()),
+                ('schedule_id', models.UUIDField(null=True)),
+                ('schedule_day_id', models.UUIDField(null=True)),
+                ('kind', models.CharField(choices=[('schedule', 'Schedule'), ('schedule_day', 'Schedule Day'), ('time_slot', 'Time Slot'), ('participant', 'Participant')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['batch'], name='schedule_pe_batch_00b1da_idx'), models.Index(fields=['created_at'], name='schedule_pe_created_a22398_idx')],
+            },
+        ),
+    ]
@@ -2,7 +2,7 @@ import uuid
 from django.conf import settings
 from django.db import models
 
-from apps.schedule.enums import StatusChoices
+from apps.schedule.enums import ChangeKinds, StatusChoices
 
 class Schedule(models.Model):
     # Existing fields...
@@ -26,8 +26,19 @@ class Schedule(models.Model):
         help_text="User-specific minimum days requirements {user_id: min_days}"
     )
     
-    def get_min_days_for_user(self, user_id):
-        """Get minimum days requirement for a specific user or the default"""
+    # Bumped whenever the schedule or one of its rows changes, keys the read cache
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Denormalized participant counters, kept up to date by
+    # ScheduleCounterService and repaired by reconcile_schedule_counters
+    participant_count = models.PositiveIntegerField(default=0, editable=False)
+    accepted_participant_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    def get_min_days_for_user(self, user_id, participant_count=None):
+        """
+        Get minimum days requirement for a specific user or the default.
+        The default is derived from the cached participant_count unless
+        participant_count is given.
+        """
         user_id_str = str(user_id)
         if user_id_str in self.user_specific_min_days:
             return self.user_specific_min_days[user_id_str]
@@ -35,11 +46,24 @@ class Schedule(models.Model):
             return self.min_days_selection
         else:
             # Auto-calculate based on duration and participant count
-            participant_count = self.participants.count()
+            if participant_count is None:
+                participant_count = self.participant_count
             if participant_count > 0:
                 return max(1, self.duration // (participant_count * 2))
             return 1
     
+    # Columns only written with F() updates, a full save must not write
+    # back the stale values held by the instance
+    COUNTER_FIELDS = ('version', 'participant_count', 'accepted_participant_count')
+    
+    def save(self, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(**kwargs)
+    
     class Meta:
         indexes = [
             models.Index(fields=['owner']),
@@ -92,12 +116,16 @@ class Participant(models.Model):
     role = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='users')
     joined_at = models.DateTimeField(auto_now_add=True)
     invitation_accepted = models.BooleanField(default=False)
+    # Distinct days with at least one assigned time slot, kept up to date by
+    # ScheduleValidationService.refresh
+    selected_days = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         unique_together = ('schedule', 'user')
         indexes = [
             models.Index(fields=['schedule']),
-            models.Index(fields=['user']),
+            # Covers the schedules-of-a-user lookup of ScheduleMembership
+            models.Index(fields=['user', 'schedule']),
             models.Index(fields=['invitation_accepted']),
         ]
         
@@ -116,6 +144,8 @@ class ScheduleDay(models.Model):
         unique_together = ('schedule', 'date')
         indexes = [
             models.Index(fields=['schedule', 'date']),
+            # Keyset pagination of day listings, and of slot listings by date
+            models.Index(fields=['date', 'id']),
         ]
         
     def __str__(self):
@@ -140,9 +170,12 @@ class TimeSlot(models.Model):
     
     class Meta:
         indexes = [
-            models.Index(fields=['schedule_day']),
+            # Order of resumable initial syncs, serves schedule_day lookups as well
+            models.Index(fields=['schedule_day', 'id']),
             models.Index(fields=['is_available']),
             models.Index(fields=['sync_status']),
+            # Keyset pagination of slot listings within a day
+            models.Index(fields=['schedule_day', 'start_time', 'id']),
         ]
         
     def __str__(self):
@@ -167,7 +200,62 @@ class PermutationRequest(models.Model):
             models.Index(fields=['recipient']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            # Keyset pagination of permutation requests
+            models.Index(fields=['-created_at', '-id']),
         ]
         
     def __str__(self):
-        return f"Permutation between {self.requester.user.username} and {self.recipient.user.username}"
\ No newline at end of file
+        return f"Permutation between {self.requester.user.username} and {self.recipient.user.username}"
+
+class ScheduleChange(models.Model):
+    """
+    Append-only log of the rows of a schedule that changed, read by delta
+    sync. seq follows commit order and a deleted row is logged as a
+    tombstone. schedule_id is no foreign key, tombstones outlive their schedule.
+    """
+    seq = models.BigIntegerField(primary_key=True)
+    schedule_id = models.UUIDField()
+    kind = models.CharField(max_length=20, choices=ChangeKinds)
+    object_id = models.UUIDField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            # Changes of the schedules of a user after a sequence number
+            models.Index(fields=['schedule_id', 'seq']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.seq} {self.kind} {self.object_id}{' deleted' if self.deleted else ''}"
+
+class PendingChange(models.Model):
+    """
+    Change log entry written in the transaction of its change and moved to
+    ScheduleChange, with a sequence number, once that transaction commits.
+    The schedule may only be known through a day, resolved when moved.
+    """
+    batch = models.UUIDField()
+    schedule_id = models.UUIDField(null=True)
+    schedule_day_id = models.UUIDField(null=True)
+    kind = models.CharField(max_length=20, choices=ChangeKinds)
+    object_id = models.UUIDField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['batch']),
+            # Entries left behind by a process that died after its commit
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"pending {self.kind} {self.object_id}{' deleted' if self.deleted else ''}"
+
+class ChangeSequence(models.Model):
+    """
+    Last sequence number handed out to the change log, in a single row
+    whose lock orders the writers of the log
+    """
+    value = models.PositiveBigIntegerField(default=0)
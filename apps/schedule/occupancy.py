@@ -0,0 +1,263 @@
+"""
+In-process occupancy index of a schedule: who holds which slot and how many
+distinct days every participant holds.
+
+Indexes are built from one flat query the first time a schedule is read and
+then kept in step with membership changes made by this process. Each index
+remembers the schedule version it reflects. Changes recorded through
+ScheduleOccupancy.record are applied on commit when the index is exactly one
+version behind, anything else (other processes, bulk paths that only bump
+the version) leaves it behind and it is rebuilt on the next read.
+"""
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.models import Participant, TimeSlot
+
+_indexes = OrderedDict()
+_lock = threading.RLock()
+
+def _overlaps(start, end, other_start, other_end):
+    return start < other_end and other_start < end
+
+def _days_after(counts, lost, gained):
+    """Distinct days held after giving up a slot on lost for one on gained"""
+    if lost == gained:
+        return len(counts)
+    return len(counts) - (counts.get(lost) == 1) + (gained not in counts)
+
+class OccupancyIndex:
+    """
+    Occupancy of one schedule
+    """
+    def __init__(self, schedule_id, version):
+        self.schedule_id = schedule_id
+        self.version = version
+        self.days = {}
+        self.slots = {}
+        self.members = {}
+        self.holders = defaultdict(set)
+        self.assigned = defaultdict(set)
+        self.day_counts = defaultdict(Counter)
+    
+    @classmethod
+    def build(cls, schedule):
+        """Load the index of a schedule with one query for slots and one for participants"""
+        index = cls(schedule.pk, schedule.version)
+        index.members = {
+            participant_id: (user_id, username)
+            for participant_id, user_id, username in Participant.objects.filter(schedule=schedule)
+            .values_list('id', 'user_id', 'user__username')
+        }
+        rows = TimeSlot.objects.filter(schedule_day__schedule=schedule).values_list(
+            'id', 'schedule_day_id', 'schedule_day__date', 'start_time', 'end_time', 'participants__id'
+        )
+        for slot_id, day_id, date, start_time, end_time, participant_id in rows:
+            if slot_id not in index.slots:
+                index.days[day_id] = date
+                index.slots[slot_id] = (day_id, start_time, end_time)
+            if participant_id is not None:
+                index.add(slot_id, [participant_id])
+        return index
+    
+    def date_of(self, slot_id):
+        return self.days[self.slots[slot_id][0]]
+    
+    def add(self, slot_id, participant_ids):
+        if slot_id not in self.slots:
+            return
+        date = self.date_of(slot_id)
+        for participant_id in participant_ids:
+            if participant_id in self.holders[slot_id]:
+                continue
+            self.holders[slot_id].add(participant_id)
+            self.assigned[participant_id].add(slot_id)
+            self.day_counts[participant_id][date] += 1
+    
+    def remove(self, slot_id, participant_ids=None):
+        """Remove participants from a slot, every holder when participant_ids is None"""
+        if slot_id not in self.slots:
+            return
+        date = self.date_of(slot_id)
+        holders = self.holders[slot_id]
+        for participant_id in list(holders if participant_ids is None else participant_ids):
+            if participant_id not in holders:
+                continue
+            holders.discard(participant_id)
+            self.assigned[participant_id].discard(slot_id)
+            counts = self.day_counts[participant_id]
+            counts[date] -= 1
+            if counts[date] <= 0:
+                del counts[date]
+    
+    def remove_participant(self, participant_id):
+        for slot_id in list(self.assigned.get(participant_id, ())):
+            self.remove(slot_id, [participant_id])
+    
+    def put_slot(self, slot_id, day_id, start_time, end_time):
+        """
+        Add or move a slot. Returns False when its day is unknown to the index.
+        """
+        if day_id not in self.days:
+            return False
+        holders = list(self.holders.get(slot_id, ()))
+        self.remove(slot_id, holders)
+        self.slots[slot_id] = (day_id, start_time, end_time)
+        self.add(slot_id, holders)
+        return True
+    
+    def drop_slot(self, slot_id):
+        self.remove(slot_id)
+        self.slots.pop(slot_id, None)
+        self.holders.pop(slot_id, None)
+    
+    def suggest(self, schedule, slot_id, participant_id, limit=20):
+        """
+        Rank the (slot, holder) pairs the participant could swap slot_id with.
+        
+        A candidate must not overlap another slot of either side on the same
+        date, and nobody may end up holding fewer distinct days than both
+        their minimum and what they hold now. Swaps that gain the most days
+        for both sides come first, then the ones closest in time.
+        """
+        day_id, start_time, end_time = self.slots[slot_id]
+        date = self.days[day_id]
+        
+        requester_counts = self.day_counts[participant_id]
+        requester_days = len(requester_counts)
+        requester_floor = min(
+            schedule.get_min_days_for_user(self.members[participant_id][0]), requester_days
+        )
+        requester_busy = defaultdict(list)
+        for other_id in self.assigned[participant_id]:
+            if other_id != slot_id:
+                _, other_start, other_end = self.slots[other_id]
+                requester_busy[self.date_of(other_id)].append((other_start, other_end))
+        
+        # Slots of each holder overlapping the offered slot, computed once per holder
+        holder_clashes = {}
+        candidates = []
+        for candidate_id, (candidate_day_id, candidate_start, candidate_end) in self.slots.items():
+            holders = self.holders.get(candidate_id)
+            if candidate_id == slot_id or not holders or participant_id in holders:
+                continue
+            candidate_date = self.days[candidate_day_id]
+            if any(
+                _overlaps(candidate_start, candidate_end, busy_start, busy_end)
+                for busy_start, busy_end in requester_busy.get(candidate_date, ())
+            ):
+                continue
+            requester_after = _days_after(requester_counts, date, candidate_date)
+            if requester_after < requester_floor:
+                continue
+            
+            for holder_id in holders:
+                if holder_id in self.holders[slot_id] or holder_id not in self.members:
+                    continue
+                if holder_id not in holder_clashes:
+                    holder_clashes[holder_id] = {
+                        other_id for other_id in self.assigned[holder_id]
+                        if self.date_of(other_id) == date
+                        and _overlaps(start_time, end_time, *self.slots[other_id][1:])
+                    }
+                if holder_clashes[holder_id] - {candidate_id}:
+                    continue
+                
+                holder_counts = self.day_counts[holder_id]
+                holder_after = _days_after(holder_counts, candidate_date, date)
+                holder_floor = min(
+                    schedule.get_min_days_for_user(self.members[holder_id][0]), len(holder_counts)
+                )
+                if holder_after < holder_floor:
+                    continue
+                
+                gain = (requester_after - requester_days) + (holder_after - len(holder_counts))
+                distance = abs((candidate_date - date).days)
+                candidates.append((
+                    (-gain, distance, candidate_date, candidate_start),
+                    {
+                        "slot": str(candidate_id),
+                        "date": candidate_date,
+                        "start_time": candidate_start,
+                        "end_time": candidate_end,
+                        "recipient": str(holder_id),
+                        "recipient_username": self.members[holder_id][1],
+                        "requester_days_after": requester_after,
+                        "recipient_days_after": holder_after,
+                    }
+                ))
+        
+        candidates.sort(key=lambda candidate: candidate[0])
+        return [suggestion for _, suggestion in candidates[:limit]]
+
+class ScheduleOccupancy:
+    """
+    Registry of the occupancy indexes kept by this process
+    """
+    
+    @staticmethod
+    def get(schedule):
+        """Index of a schedule at its current version, rebuilt when stale"""
+        with _lock:
+            index = _indexes.get(schedule.pk)
+            if index is not None and index.version == schedule.version:
+                _indexes.move_to_end(schedule.pk)
+                return index
+        
+        index = OccupancyIndex.build(schedule)
+        with _lock:
+            _indexes[schedule.pk] = index
+            _indexes.move_to_end(schedule.pk)
+            while len(_indexes) > getattr(settings, 'SCHEDULE_OCCUPANCY_MAX_INDEXES', 32):
+                _indexes.popitem(last=False)
+        return index
+    
+    @staticmethod
+    def suggest(schedule, slot_id, participant_id, limit=20):
+        index = ScheduleOccupancy.get(schedule)
+        with _lock:
+            if slot_id not in index.slots or participant_id not in index.members:
+                return []
+            return index.suggest(schedule, slot_id, participant_id, limit)
+    
+    @staticmethod
+    def record(change, schedule_id=None, schedule_day_id=None):
+        """
+        Apply change(index) to the index of a schedule once the current
+        transaction commits, dropping the index when change returns False.
+        Call it right after the version bump of the change, the bumped
+        version is read here while the row is still locked.
+        """
+        with _lock:
+            if schedule_id is None:
+                schedule_id = next(
+                    (index.schedule_id for index in _indexes.values() if schedule_day_id in index.days), None
+                )
+            if schedule_id not in _indexes:
+                return
+        
+        version = ScheduleCache.get_version(schedule_id)
+        
+        def apply():
+            with _lock:
+                index = _indexes.get(schedule_id)
+                if index is None:
+                    return
+                if version is None or index.version != version - 1:
+                    del _indexes[schedule_id]
+                    return
+                if change(index) is False:
+                    del _indexes[schedule_id]
+                    return
+                index.version = version
+        
+        transaction.on_commit(apply)
+    
+    @staticmethod
+    def clear():
+        with _lock:
+            _indexes.clear()
@@ -0,0 +1,192 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a composite, unique ordering.
+    
+    The cursor holds the ordering values of the row at the edge of the page
+    and the next page is fetched with a range condition on them, so deep
+    pages cost the same as the first one: no COUNT(*) and no OFFSET scan.
+    Back it with an index on the ordering fields.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    
+    # Only paginate when the client asks for it with cursor or page_size,
+    # for listings that used to return a plain list
+    opt_in = False
+    
+    def is_requested(self, request):
+        """Whether this request is paginated at all"""
+        params = request.query_params
+        return not self.opt_in or self.cursor_query_param in params or self.page_size_query_param in params
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        values, self.reverse = self.decode_cursor(request)
+        if values is not None:
+            values = self.parse_values(queryset.model, values)
+        
+        ordering = [self._invert(field) for field in self.ordering] if self.reverse else list(self.ordering)
+        keys = [f"keyset_{i}" for i in range(len(ordering))]
+        queryset = queryset.annotate(**{
+            key: F(field.lstrip('-')) for key, field in zip(keys, ordering)
+        }).order_by(*[
+            f"-{key}" if field.startswith('-') else key for key, field in zip(keys, ordering)
+        ])
+        
+        if values is not None:
+            queryset = queryset.filter(self.build_filter(keys, ordering, values))
+        
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        
+        self.keys = keys
+        return self.page
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+    
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f"-{field}"
+    
+    @staticmethod
+    def build_filter(keys, ordering, values):
+        """
+        Rows strictly after values in the given ordering:
+        (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+        The redundant k1 >= v1 bound lets the database use a range scan.
+        """
+        ops = ['lt' if field.startswith('-') else 'gt' for field in ordering]
+        alternatives = []
+        for i, (key, op) in enumerate(zip(keys, ops)):
+            equal = [Q(**{keys[j]: values[j]}) for j in range(i)]
+            alternatives.append(reduce(and_, equal + [Q(**{f"{key}__{op}": values[i]})]))
+        
+        bound = Q(**{f"{keys[0]}__{ops[0]}e": values[0]})
+        return bound & reduce(or_, alternatives)
+    
+    @classmethod
+    def make_cursor(cls, values, reverse=False):
+        """Opaque cursor token for the given ordering values"""
+        payload = json.dumps({"v": [cls._dump(value) for value in values], "r": int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+    
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances, or dicts for values() querysets
+        values = [row[key] for key in self.keys] if isinstance(row, dict) else [getattr(row, key) for key in self.keys]
+        cursor = self.make_cursor(values, reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+    
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values = payload['v']
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return values, bool(payload.get('r'))
+        except (binascii.Error, KeyError, TypeError, ValueError, UnicodeError):
+            raise NotFound("Invalid cursor")
+    
+    def parse_values(self, model, values):
+        """
+        Cursor values converted by the model fields of the ordering, so a
+        tampered cursor is rejected instead of failing in the database
+        """
+        parsed = []
+        for field, value in zip(self.ordering, values):
+            path = field.lstrip('-').split('__')
+            owner = model
+            for name in path[:-1]:
+                owner = owner._meta.get_field(name).related_model
+            try:
+                if not isinstance(value, str):
+                    raise ValueError
+                parsed.append(owner._meta.get_field(path[-1]).to_python(value))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound("Invalid cursor")
+        return parsed
+    
+    @staticmethod
+    def _dump(value):
+        # isoformat keeps microseconds, which the equality test needs
+        return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+    
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data
+        })
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+class ScheduleDayPagination(KeysetPagination):
+    ordering = ('date', 'id')
+    opt_in = True
+
+class TimeSlotPagination(KeysetPagination):
+    # Days are walked in date order by the (date, id) index of the day table
+    # and the slots of each day by the (schedule_day, start_time, id) index
+    # of the slot table, only slots of days sharing a date are sorted
+    ordering = ('schedule_day__date', 'start_time', 'id')
+    opt_in = True
+
+class PermutationRequestPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+    opt_in = True
@@ -0,0 +1,126 @@
+"""
+Schedule authorization shared by the schedule endpoints.
+
+ScheduleAccess describes what a user may do on a schedule. It is loaded with
+one query, kept on the request so every check of a request reuses it, and
+cached across requests in the versioned read cache under (schedule, version,
+user). Membership and role changes bump the schedule version, so a cached
+entry never outlives the rows it was built from.
+"""
+from rest_framework import permissions
+
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.models import Participant, PermutationRequest, Schedule, TimeSlot
+
+class ScheduleAccess:
+    """
+    Ownership, membership and role flags of a user on a schedule
+    """
+    
+    def __init__(self, is_owner=False, participant_id=None, can_edit_schedule=False,
+                 can_invate_users=False, can_request_permutations=False):
+        self.is_owner = is_owner
+        self.participant_id = participant_id
+        self.can_edit_schedule = can_edit_schedule
+        self.can_invate_users = can_invate_users
+        self.can_request_permutations = can_request_permutations
+    
+    @property
+    def is_participant(self):
+        return self.participant_id is not None
+    
+    @property
+    def is_member(self):
+        return self.is_owner or self.is_participant
+    
+    @property
+    def can_edit(self):
+        return self.is_owner or self.can_edit_schedule
+    
+    @property
+    def can_invite(self):
+        return self.is_owner or self.can_invate_users
+    
+    @property
+    def can_request(self):
+        """Only participants hold slots to offer, owners included"""
+        return self.is_participant and self.can_request_permutations
+    
+    @staticmethod
+    def load(user, schedule):
+        """Access of user on schedule, with one query for their participant and role"""
+        row = Participant.objects.filter(schedule_id=schedule.pk, user_id=user.pk).values_list(
+            'id', 'role__can_edit_schedule', 'role__can_invate_users', 'role__can_request_permutations'
+        ).first()
+        access = ScheduleAccess(is_owner=schedule.owner_id == user.pk)
+        if row is not None:
+            (access.participant_id, access.can_edit_schedule,
+             access.can_invate_users, access.can_request_permutations) = row
+        return access
+    
+    @staticmethod
+    def get(request, schedule):
+        """
+        Access of the requesting user on a loaded schedule, at most one query
+        per request and none while the schedule version is unchanged
+        """
+        loaded = getattr(request, '_schedule_access', None)
+        if loaded is None:
+            loaded = request._schedule_access = {}
+        key = (schedule.pk, schedule.version)
+        if key not in loaded:
+            loaded[key] = ScheduleCache.get_or_build(
+                schedule.pk, schedule.version, f"access:{request.user.pk}",
+                lambda: ScheduleAccess.load(request.user, schedule)
+            )
+        return loaded[key]
+    
+    @staticmethod
+    def schedule_of(obj):
+        """The schedule of a Schedule, a time slot, a permutation request or a row with a schedule foreign key"""
+        if isinstance(obj, Schedule):
+            return obj
+        if isinstance(obj, TimeSlot):
+            return obj.schedule_day.schedule
+        if isinstance(obj, PermutationRequest):
+            return obj.recipient.schedule
+        return obj.schedule
+
+class IsScheduleMember(permissions.BasePermission):
+    """
+    Object permission on a Schedule, or a row belonging to one, granted
+    when the ScheduleAccess property named by `check` is true.
+    `read_check`, when set, replaces it for safe methods.
+    """
+    check = 'is_member'
+    read_check = None
+    message = "You don't have permission to access this schedule"
+    
+    def has_object_permission(self, request, view, obj):
+        check = self.check
+        if self.read_check and request.method in permissions.SAFE_METHODS:
+            check = self.read_check
+        return getattr(ScheduleAccess.get(request, ScheduleAccess.schedule_of(obj)), check)
+
+class IsScheduleOwner(IsScheduleMember):
+    check = 'is_owner'
+    message = "Only the owner can perform this action"
+
+class CanEditSchedule(IsScheduleMember):
+    check = 'can_edit'
+    message = "You don't have permission to edit this schedule"
+
+class CanEditScheduleOrReadOnly(CanEditSchedule):
+    read_check = 'is_member'
+
+class CanInviteUsers(IsScheduleMember):
+    check = 'can_invite'
+    message = "You don't have permission to add participants"
+
+class IsPermutationRecipient(IsScheduleMember):
+    """Granted to the participant a permutation request is addressed to"""
+    message = "Only the recipient can answer the permutation"
+    
+    def has_object_permission(self, request, view, obj):
+        access = ScheduleAccess.get(request, ScheduleAccess.schedule_of(obj))
+        return access.participant_id == obj.recipient_id
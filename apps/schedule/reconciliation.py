@@ -0,0 +1,88 @@
+"""
+Merkle summaries of the time slots of schedules, for offline sync clients
+to find where their copy drifted without downloading it again.
+
+A slot hashes to the SHA-256 hex digest of the compact JSON array
+[id, start_time, end_time, is_available, has_alarm, alarm_times,
+sorted participant ids], with the values as the API renders them. A day,
+a month, a schedule and the set of a user's schedules hash to the digest
+of their children's "key:hash" lines in key order, the keys being slot
+ids, ISO dates, YYYY-MM months and schedule ids. A node without slots,
+such as an empty schedule, has a null hash and no line in its parent. A
+client computes the same hashes from its rows and walks down only where
+they differ.
+
+The month and day hashes of a schedule are built in one pass and cached
+per schedule version, which every change of one of its slots bumps.
+"""
+import hashlib
+import json
+
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.models import Schedule, TimeSlot
+
+SLOT_COLUMNS = ('id', 'start_time', 'end_time', 'is_available', 'has_alarm', 'alarm_times')
+
+class ScheduleDigest:
+    """
+    Hierarchical hashes of the time slots of schedules
+    """
+    
+    @staticmethod
+    def slot_hash(row, participant_ids):
+        """Hash of a slot from its SLOT_COLUMNS values and participant ids"""
+        slot_id, start_time, end_time, is_available, has_alarm, alarm_times = row
+        payload = [
+            str(slot_id), start_time.isoformat(), end_time.isoformat(), is_available, has_alarm, alarm_times,
+            sorted(str(participant_id) for participant_id in participant_ids)
+        ]
+        return hashlib.sha256(json.dumps(payload, separators=(',', ':')).encode()).hexdigest()
+    
+    @staticmethod
+    def combine(children):
+        """Hash of a node from the {key: hash} of its children, None when none of them has slots"""
+        children = {key: value for key, value in children.items() if value is not None}
+        if not children:
+            return None
+        lines = "\n".join(f"{key}:{children[key]}" for key in sorted(children))
+        return hashlib.sha256(lines.encode()).hexdigest()
+    
+    @staticmethod
+    def build(schedule_id):
+        """
+        Hashes of a schedule, its months and its days with slots
+        
+        Returns:
+            dict: {"hash": str or None, "months": {"YYYY-MM": {"hash": str, "days": {"YYYY-MM-DD": str}}}}
+        """
+        slots = TimeSlot.objects.filter(schedule_day__schedule_id=schedule_id)
+        assignments = TimeSlot.participants.through.objects.filter(timeslot__in=slots)
+        participants = {}
+        for slot_id, participant_id in assignments.values_list('timeslot_id', 'participant_id'):
+            participants.setdefault(slot_id, []).append(participant_id)
+        
+        days = {}
+        for date, *row in slots.values_list('schedule_day__date', *SLOT_COLUMNS).iterator(chunk_size=2000):
+            days.setdefault(date, {})[str(row[0])] = ScheduleDigest.slot_hash(row, participants.get(row[0], ()))
+        
+        months = {}
+        for date, leaves in days.items():
+            months.setdefault(date.strftime('%Y-%m'), {})[date.isoformat()] = ScheduleDigest.combine(leaves)
+        months = {month: {"hash": ScheduleDigest.combine(dates), "days": dates} for month, dates in months.items()}
+        return {
+            "hash": ScheduleDigest.combine({month: node["hash"] for month, node in months.items()}),
+            "months": months,
+        }
+    
+    @staticmethod
+    def tree(schedule_id, version):
+        """The cached hashes of a schedule at a version"""
+        return ScheduleCache.get_or_build(schedule_id, version, 'digest', lambda: ScheduleDigest.build(schedule_id))
+    
+    @staticmethod
+    def roots(schedule_ids):
+        """{schedule_id: hash} of schedules, built only for those changed since last asked"""
+        versions = Schedule.objects.filter(pk__in=schedule_ids).values_list('id', 'version')
+        return {
+            str(schedule_id): ScheduleDigest.tree(schedule_id, version)["hash"] for schedule_id, version in versions
+        }
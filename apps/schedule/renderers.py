@@ -0,0 +1,86 @@
+"""
+Renderers and parsers negotiated by the read-heavy and sync endpoints.
+
+MessagePack bodies carry the same values as the JSON ones: anything msgpack
+has no type for is converted by the JSON encoder of the REST framework, so
+dates, UUIDs and decimals read the same in either format. Bytes stay raw in
+MessagePack. FastJSON encodes with orjson when it is installed and falls
+back to the REST framework encoder otherwise.
+"""
+import msgpack
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, FormParser, JSONParser, MultiPartParser
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+def encode_default(value):
+    """Plain value of an object the encoders have no type for"""
+    return _encoder.default(value)
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renders the response data as MessagePack
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies
+    """
+    media_type = 'application/msgpack'
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer encoding with orjson, the output matches the compact
+    JSONRenderer one. Indented output for the browsable API is left to
+    the parent class.
+    """
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Datetimes go through the REST framework encoder, orjson keeps microseconds
+        return orjson.dumps(
+            data, default=encode_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser decoding with orjson when it is installed
+    """
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+# Negotiated by the sync, time slot, schedule day and notification endpoints
+NEGOTIATED_RENDERERS = [FastJSONRenderer, MessagePackRenderer, renderers.BrowsableAPIRenderer]
+NEGOTIATED_PARSERS = [FastJSONParser, MessagePackParser, FormParser, MultiPartParser]
@@ -1,26 +1,45 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from apps.users.serializers import UserSerializer
+from apps.schedule.fieldsets import SparseFieldsMixin
 from apps.schedule.models import Schedule, Role, Participant, ScheduleDay, TimeSlot, PermutationRequest
+from apps.schedule.services import parse_available_days
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = ['id', 'name', 'description', 'can_edit_schedule', 'can_invate_users', 'can_request_permutations']
         read_only_fields = ['id']
         
-class ScheduleSerializer(serializers.ModelSerializer):
+class ScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     
     class Meta:
         model = Schedule
         fields = [
             'id', 'name', 'description', 'owner', 'created_at', 'updated_at', 
-            'duration', 'available_days', 'is_complete', 'min_days_required',
-            'user_specific_requirements', 'roles', 'to_weeks', 'to_months', 'to_years'
+            'duration', 'available_days', 'is_complete', 'min_days_selection',
+            'user_specific_min_days', 'participant_count', 'accepted_participant_count',
+            'roles', 'to_weeks', 'to_months', 'to_years'
         ]
-        read_only_fields = ['id', 'owner', 'created_at', 'updated_at', 'to_weeks', 'to_months', 'to_years']
+        read_only_fields = [
+            'id', 'owner', 'created_at', 'updated_at', 'participant_count', 'accepted_participant_count',
+            'roles', 'to_weeks', 'to_months', 'to_years'
+        ]
+    
+    def validate_available_days(self, value):
+        try:
+            parse_available_days(value)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise serializers.ValidationError(f"Invalid available_days: {e}")
+        return value
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the related rows rendered by this serializer up front"""
+        return queryset.select_related('owner').prefetch_related('roles')
         
-class ParticipantSerializer(serializers.ModelSerializer):
+class ParticipantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     role = RoleSerializer(read_only=True)
 
@@ -29,7 +48,12 @@ class ParticipantSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'role', 'joined_at', 'invitation_accepted']
         read_only_fields = ['id', 'user', 'joined_at']
         
-class TimeSlotSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the related rows rendered by this serializer up front"""
+        return queryset.select_related('user', 'role')
+
+class TimeSlotSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     participants = ParticipantSerializer(many=True, read_only=True)
     
     class Meta:
@@ -37,15 +61,37 @@ class TimeSlotSerializer(serializers.ModelSerializer):
         fields = ['id', 'start_time', 'end_time', 'participants', 'is_available', 'has_alarm', 'alarm_times', 'last_modified', 'sync_status']
         read_only_fields = ['id', 'last_modified']
         
-class ScheduleDaySerializer(serializers.ModelSerializer):
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=''):
+        """Load the related rows rendered by this serializer up front"""
+        return queryset.prefetch_related(
+            Prefetch(
+                f'{prefix}participants',
+                queryset=ParticipantSerializer.setup_eager_loading(Participant.objects.all())
+            )
+        )
+
+class ScheduleDaySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     time_slots = TimeSlotSerializer(many=True, read_only=True)
+    # Order of the nested lists rendered from values() rows
+    values_orderings = {'time_slots': ('start_time',)}
     
     class Meta:
         model = ScheduleDay
         fields = ['id', 'date', 'time_slots']
         read_only_fields = ['id']
         
-class PermutationRequestSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load days -> time_slots -> participants -> user/role in four queries"""
+        return queryset.prefetch_related(
+            Prefetch(
+                'time_slots',
+                queryset=TimeSlotSerializer.setup_eager_loading(TimeSlot.objects.order_by('start_time'))
+            )
+        )
+
+class PermutationRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     requester = ParticipantSerializer(read_only=True)
     recipient = ParticipantSerializer(read_only=True)
     requester_slot = TimeSlotSerializer(read_only=True)
@@ -54,4 +100,15 @@ class PermutationRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = PermutationRequest
         fields = ['id', 'requester', 'recipient', 'requester_slot', 'recipient_slot', 'message', 'created_at', 'status']
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the related rows rendered by this serializer up front"""
+        queryset = queryset.select_related(
+            'requester__user', 'requester__role',
+            'recipient__user', 'recipient__role',
+            'requester_slot', 'recipient_slot'
+        )
+        queryset = TimeSlotSerializer.setup_eager_loading(queryset, prefix='requester_slot__')
+        return TimeSlotSerializer.setup_eager_loading(queryset, prefix='recipient_slot__')
\ No newline at end of file
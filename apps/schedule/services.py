@@ -1,9 +1,123 @@
+import base64
+import heapq
+import time
+import uuid
+from array import array
+from datetime import datetime, timedelta
 
-from django.db.models import Count
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, prefetch_related_objects
+from django.db.models.functions import Coalesce
 
-from apps.schedule.models import TimeSlot
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.changelog import ChangeLog
+from apps.schedule.intervals import UserIntervals
+from apps.schedule.occupancy import ScheduleOccupancy
+from apps.schedule.enums import ChangeKinds, StatusChoices
+from apps.schedule.models import Participant, PermutationRequest, Role, Schedule, ScheduleDay, TimeSlot
+from apps.notification.services import NotificationService
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+def parse_time(value):
+    """Parse an "HH:MM" or "HH:MM:SS" string into a time"""
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid time '{value}', expected HH:MM")
+
+def parse_available_days(available_days):
+    """
+    Normalize Schedule.available_days into {weekday: [(start_time, end_time), ...]}
+    
+    Keys are weekday names ("monday") or indexes ("0" is Monday). Values are
+    lists of {"start_time": "HH:MM", "end_time": "HH:MM"} entries. An empty
+    mapping means every day of the week is available.
+    """
+    parsed = {}
+    for key, slots in (available_days or {}).items():
+        key = str(key).strip().lower()
+        if key.isdigit():
+            weekday = int(key)
+        elif key in WEEKDAYS:
+            weekday = WEEKDAYS.index(key)
+        else:
+            raise ValueError(f"Invalid weekday '{key}' in available_days")
+        if not 0 <= weekday < 7:
+            raise ValueError(f"Invalid weekday '{key}' in available_days")
+        
+        parsed[weekday] = [
+            (parse_time(slot['start_time']), parse_time(slot['end_time']))
+            for slot in (slots if isinstance(slots, list) else [])
+        ]
+    return parsed
 
 class ScheduleValidationService:
+    """
+    Service for checking and tracking whether every participant selected
+    their minimum number of days
+    """
+    
+    @staticmethod
+    def selected_days_expression():
+        """
+        Distinct dates of the participant's time slots, as a subquery usable
+        in annotate() and update()
+        """
+        days = (
+            TimeSlot.participants.through.objects.filter(participant_id=OuterRef('pk'))
+            .values('participant_id')
+            .annotate(days=Count('timeslot__schedule_day__date', distinct=True))
+            .values('days')[:1]
+        )
+        return Coalesce(Subquery(days), 0)
+    
+    @staticmethod
+    def unmet(schedule, rows):
+        """
+        Participants below their minimum among (participant_id, user_id,
+        selected_days) rows covering every participant of the schedule
+        """
+        unmet = []
+        for participant_id, user_id, selected_days in rows:
+            min_days = schedule.get_min_days_for_user(user_id)
+            if selected_days < min_days:
+                unmet.append({
+                    "participant_id": str(participant_id),
+                    "user_id": str(user_id),
+                    "selected_days": selected_days,
+                    "min_days": min_days
+                })
+        return unmet
+    
+    @staticmethod
+    def validate(schedule):
+        """
+        Count the distinct selected days of every participant with one
+        aggregate query, ignoring the cached counters
+        
+        Returns:
+            tuple: (is_valid, unmet_participants)
+        """
+        rows = list(
+            Participant.objects.filter(schedule=schedule)
+            .annotate(days=ScheduleValidationService.selected_days_expression())
+            .values_list('id', 'user_id', 'days')
+        )
+        unmet = ScheduleValidationService.unmet(schedule, rows)
+        return bool(rows) and not unmet, unmet
+    
+    @staticmethod
+    def is_complete(schedule):
+        """
+        Completion from the selected_days counters, one query
+        """
+        rows = list(Participant.objects.filter(schedule=schedule).values_list('id', 'user_id', 'selected_days'))
+        return bool(rows) and not ScheduleValidationService.unmet(schedule, rows)
+    
     @staticmethod
     def validate_participant_selections(schedule, participant):
         """
@@ -12,24 +126,59 @@ class ScheduleValidationService:
         Returns:
             tuple: (is_valid, message)
         """
-        # Get time slots where this participant is assigned
-        participant_slots = TimeSlot.objects.filter(participants=participant)
+        unique_days = (
+            TimeSlot.objects.filter(participants=participant)
+            .values('schedule_day__date').distinct().count()
+        )
+        min_required = schedule.get_min_days_for_user(participant.user_id)
         
-        # Count unique days
-        unique_days = participant_slots.values('schedule_day__date').distinct().count()
-        
-        # Check custom requirement for this participant
-        custom_requirement = schedule.min_days_per_participant.get(str(participant.id))
-        
-        if custom_requirement:
-            min_required = int(custom_requirement)
-        else:
-            min_required = schedule.min_days_required
-            
         if unique_days < min_required:
             return (False, f"You must select at least {min_required} days")
         
         return (True, "Valid selection")
+    
+    @staticmethod
+    def refresh(schedule_id=None, schedule_day_id=None, participant_ids=None):
+        """
+        Recount the selected days of some participants of a schedule,
+        identified directly or through one of its days, with one UPDATE and
+        switch is_complete to match. Every participant is recounted when
+        participant_ids is None.
+        """
+        if schedule_id is not None:
+            schedules = Schedule.objects.filter(pk=schedule_id)
+        else:
+            schedules = Schedule.objects.filter(days__id=schedule_day_id)
+        schedule = schedules.only(
+            'id', 'duration', 'min_days_selection', 'user_specific_min_days', 'is_complete', 'participant_count'
+        ).first()
+        if schedule is None:
+            return
+        
+        participants = Participant.objects.filter(schedule=schedule)
+        if participant_ids is not None:
+            participants = participants.filter(pk__in=participant_ids)
+        if participant_ids is None or participant_ids:
+            participants.update(selected_days=ScheduleValidationService.selected_days_expression())
+        ScheduleValidationService.update_completion(schedule)
+    
+    @staticmethod
+    def update_completion(schedule):
+        """
+        Set is_complete from the counters, bumping the schedule version when
+        it changes
+        
+        Returns:
+            bool: whether the schedule is complete
+        """
+        complete = ScheduleValidationService.is_complete(schedule)
+        if complete != schedule.is_complete:
+            Schedule.objects.filter(pk=schedule.pk).update(
+                is_complete=complete, version=F('version') + 1
+            )
+            ChangeLog.record(ChangeKinds.SCHEDULE, [schedule.pk], schedule_id=schedule.pk)
+            schedule.is_complete = complete
+        return complete
         
     @staticmethod
     def calculate_default_min_days(schedule):
@@ -37,7 +186,7 @@ class ScheduleValidationService:
         Calculate sensible default for minimum days based on 
         schedule duration and number of participants
         """
-        participant_count = schedule.participants.count()
+        participant_count = schedule.participant_count
         
         if participant_count == 0:
             return 1
@@ -47,4 +196,1228 @@ class ScheduleValidationService:
         # with a minimum of 1 day
         min_days = max(1, int(schedule.duration * 0.1 / participant_count))
         
-        return min_days
\ No newline at end of file
+        return min_days
+
+class ScheduleCounterService:
+    """
+    Service for maintaining the denormalized participant counters of schedules
+    """
+    
+    @staticmethod
+    def adjust(schedule, participants=0, accepted=0):
+        """
+        Shift the counters of a schedule within the current transaction,
+        keeping the given instance in step
+        """
+        if not participants and not accepted:
+            return
+        Schedule.objects.filter(pk=schedule.pk).update(
+            participant_count=F('participant_count') + participants,
+            accepted_participant_count=F('accepted_participant_count') + accepted
+        )
+        schedule.participant_count += participants
+        schedule.accepted_participant_count += accepted
+    
+    @staticmethod
+    def actual_counts():
+        """
+        Subqueries counting the participants of the outer schedule, as
+        (total, accepted)
+        """
+        counts = (
+            Participant.objects.filter(schedule_id=OuterRef('pk'))
+            .values('schedule_id')
+            .annotate(
+                total=Count('id'),
+                accepted=Count('id', filter=Q(invitation_accepted=True))
+            )
+        )
+        return (
+            Coalesce(Subquery(counts.values('total')[:1]), 0),
+            Coalesce(Subquery(counts.values('accepted')[:1]), 0)
+        )
+    
+    @staticmethod
+    def recount(schedule_ids):
+        """Recompute the counters of some schedules with one UPDATE"""
+        total, accepted = ScheduleCounterService.actual_counts()
+        Schedule.objects.filter(pk__in=schedule_ids).update(
+            participant_count=total, accepted_participant_count=accepted
+        )
+    
+    @staticmethod
+    def reconcile(schedule_ids=None):
+        """
+        Find the schedules whose counters drifted from the participant rows
+        and repair them
+        
+        Returns:
+            list: (schedule_id, stored_counts, actual_counts) of the repaired schedules
+        """
+        total, accepted = ScheduleCounterService.actual_counts()
+        schedules = Schedule.objects.all()
+        if schedule_ids is not None:
+            schedules = schedules.filter(pk__in=schedule_ids)
+        drifted = list(
+            schedules.annotate(actual_total=total, actual_accepted=accepted)
+            .filter(
+                ~Q(participant_count=F('actual_total'))
+                | ~Q(accepted_participant_count=F('actual_accepted'))
+            )
+            .values_list(
+                'id', 'participant_count', 'accepted_participant_count', 'actual_total', 'actual_accepted'
+            )
+        )
+        if drifted:
+            ScheduleCounterService.recount([row[0] for row in drifted])
+        return [(row[0], row[1:3], row[3:5]) for row in drifted]
+
+class ScheduleSolverService:
+    """
+    Service for automatically assigning participants to time slots
+    """
+    DEFAULT_TIME_BUDGET = 5.0
+    # Longest a request may keep a worker solving, in seconds
+    MAX_TIME_BUDGET = 30.0
+    BATCH_SIZE = 1000
+    
+    @staticmethod
+    def solve(slot_days, day_count, min_days, slot_capacity=1, existing=(), time_budget=None, conflicts=()):
+        """
+        Greedy assignment over plain arrays, no ORM objects involved.
+        
+        Slots are walked in order and each one is given to the participants
+        furthest below their minimum days, then to the least loaded ones.
+        A participant is never assigned twice on the same day.
+        
+        Args:
+            slot_days: day index of every slot, in chronological order
+            day_count: number of distinct days
+            min_days: minimum days requirement of every participant
+            slot_capacity: number of participants per slot
+            existing: (slot_index, participant_index) pairs already assigned
+            time_budget: seconds after which the solver stops early
+            conflicts: (slot_index, participant_index) pairs never to assign
+        
+        Returns:
+            tuple: (assignments, days_held, complete)
+        """
+        participant_count = len(min_days)
+        slot_count = len(slot_days)
+        
+        # Participant x day occupancy matrix, row-major
+        occupied = bytearray(participant_count * day_count)
+        days_held = array('l', [0]) * participant_count
+        load = array('l', [0]) * participant_count
+        filled = array('l', [0]) * slot_count
+        
+        for slot, index in existing:
+            filled[slot] += 1
+            load[index] += 1
+            cell = index * day_count + slot_days[slot]
+            if not occupied[cell]:
+                occupied[cell] = 1
+                days_held[index] += 1
+        
+        # One live entry per participant: (days above minimum, load, index)
+        heap = [(days_held[i] - min_days[i], load[i], i) for i in range(participant_count)]
+        heapq.heapify(heap)
+        
+        deadline = time.perf_counter() + time_budget if time_budget else None
+        assignments = []
+        complete = True
+        
+        for slot in range(slot_count):
+            if deadline and slot % 256 == 0 and time.perf_counter() > deadline:
+                complete = False
+                break
+            
+            day = slot_days[slot]
+            blocked = []
+            while filled[slot] < slot_capacity and heap:
+                entry = heapq.heappop(heap)
+                index = entry[2]
+                cell = index * day_count + day
+                if occupied[cell] or (slot, index) in conflicts:
+                    blocked.append(entry)
+                    continue
+                
+                occupied[cell] = 1
+                days_held[index] += 1
+                load[index] += 1
+                filled[slot] += 1
+                assignments.append((slot, index))
+                heapq.heappush(heap, (days_held[index] - min_days[index], load[index], index))
+            
+            for entry in blocked:
+                heapq.heappush(heap, entry)
+        
+        return assignments, days_held, complete
+    
+    @staticmethod
+    def conflicts(schedule, slots, participants):
+        """
+        (slot_index, participant_index) pairs where the slot overlaps an
+        assignment of the participant's user in another schedule, read from
+        the users' interval indexes
+        """
+        slots_by_date = {}
+        for i, (_, date, _, _) in enumerate(slots):
+            slots_by_date.setdefault(date, []).append(i)
+        indexes = UserIntervals.get_many(
+            {user_id for _, user_id in participants}
+        ) if slots_by_date and participants else {}
+        
+        conflicts = set()
+        for index, (_, user_id) in enumerate(participants):
+            intervals = indexes.get(user_id)
+            if intervals is None:
+                continue
+            for date in intervals.dates.keys() & slots_by_date.keys():
+                for slot in slots_by_date[date]:
+                    _, _, start_time, end_time = slots[slot]
+                    # Assignments in this schedule are the solver's to keep or replace
+                    if any(
+                        intervals.intervals[key][3] != schedule.id
+                        for key in intervals.overlapping(date, start_time, end_time)
+                    ):
+                        conflicts.add((slot, index))
+        return conflicts
+    
+    @staticmethod
+    def auto_assign(schedule, slot_capacity=1, time_budget=DEFAULT_TIME_BUDGET, replace=False):
+        """
+        Fill the time slots of a schedule with its participants in one pass.
+        
+        Only available slots on the weekdays listed in available_days are
+        filled, and each participant is driven towards
+        Schedule.get_min_days_for_user. Slots overlapping an assignment of the
+        same user in another schedule are skipped. New assignments are
+        written with a single bulk insert into the TimeSlot/Participant
+        through table.
+        
+        Returns:
+            dict: assignment statistics, including participants left below
+            their minimum
+        """
+        started = time.perf_counter()
+        through = TimeSlot.participants.through
+        
+        participants = list(
+            Participant.objects.filter(schedule=schedule).values_list('id', 'user_id')
+        )
+        slots = list(
+            TimeSlot.objects.filter(schedule_day__schedule=schedule, is_available=True)
+            .order_by('schedule_day__date', 'start_time')
+            .values_list('id', 'schedule_day__date', 'start_time', 'end_time')
+        )
+        
+        available = parse_available_days(schedule.available_days)
+        if available:
+            slots = [slot for slot in slots if slot[1].weekday() in available]
+        
+        day_index = {}
+        slot_days = [day_index.setdefault(date, len(day_index)) for _, date, _, _ in slots]
+        slot_index = {slot[0]: i for i, slot in enumerate(slots)}
+        participant_index = {participant_id: i for i, (participant_id, _) in enumerate(participants)}
+        min_days = [schedule.get_min_days_for_user(user_id) for _, user_id in participants]
+        conflicts = ScheduleSolverService.conflicts(schedule, slots, participants)
+        
+        with transaction.atomic():
+            assigned = through.objects.filter(timeslot__schedule_day__schedule=schedule)
+            replaced = set()
+            if replace:
+                replaced = set(assigned.values_list('timeslot_id', flat=True))
+                assigned.delete()
+                existing = []
+            else:
+                existing = [
+                    (slot_index[slot_id], participant_index[participant_id])
+                    for slot_id, participant_id in assigned.values_list('timeslot_id', 'participant_id')
+                    if slot_id in slot_index and participant_id in participant_index
+                ]
+            
+            assignments, days_held, complete = ScheduleSolverService.solve(
+                slot_days, len(day_index), min_days,
+                slot_capacity=slot_capacity,
+                existing=existing,
+                time_budget=time_budget,
+                conflicts=conflicts
+            )
+            
+            through.objects.bulk_create(
+                [
+                    through(timeslot_id=slots[slot][0], participant_id=participants[index][0])
+                    for slot, index in assignments
+                ],
+                batch_size=ScheduleSolverService.BATCH_SIZE
+            )
+            # Bulk inserts skip m2m_changed, invalidate the cached schedule here
+            if assignments or replace:
+                ScheduleCache.bump_version(schedule_id=schedule.id)
+                ChangeLog.record(
+                    ChangeKinds.TIME_SLOT, replaced | {slots[slot][0] for slot, _ in assignments},
+                    schedule_id=schedule.id
+                )
+                ScheduleValidationService.refresh(schedule_id=schedule.id)
+        
+        unmet = [
+            {
+                "participant_id": str(participant_id),
+                "user_id": str(user_id),
+                "selected_days": days_held[i],
+                "min_days": min_days[i]
+            }
+            for i, (participant_id, user_id) in enumerate(participants)
+            if days_held[i] < min_days[i]
+        ]
+        
+        return {
+            "assigned": len(assignments),
+            "slots": len(slots),
+            "participants": len(participants),
+            "complete": complete,
+            "unmet": unmet,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+class ScheduleMaterializationService:
+    """
+    Service for expanding a schedule's duration and available_days into
+    ScheduleDay and TimeSlot rows
+    """
+    BATCH_SIZE = 1000
+    
+    @staticmethod
+    def iter_days(schedule, start_date, skip_dates=()):
+        """
+        Yield (date, [(start_time, end_time), ...]) for every day of the
+        schedule that falls on an available weekday, skipping skip_dates
+        """
+        available = parse_available_days(schedule.available_days)
+        for offset in range(schedule.duration):
+            date = start_date + timedelta(days=offset)
+            if date in skip_dates:
+                continue
+            if available and date.weekday() not in available:
+                continue
+            yield date, available.get(date.weekday(), [])
+    
+    @staticmethod
+    def materialize(schedule, start_date=None, incremental=True):
+        """
+        Create the ScheduleDay and TimeSlot rows of a schedule with bulk inserts
+        in bounded batches, inside one transaction.
+        
+        In incremental mode only the days that do not exist yet are added, so
+        extending the duration fills in the new tail of the schedule. Otherwise
+        the existing days and their time slots are rebuilt from scratch. The
+        start date defaults to the first existing day, or the creation date.
+        
+        Returns:
+            dict: number of days and time slots created
+        """
+        batch_size = ScheduleMaterializationService.BATCH_SIZE
+        created = {"days_created": 0, "time_slots_created": 0}
+        days = []
+        slots = []
+        
+        def flush():
+            # Days first, the time slots reference their primary keys
+            ScheduleDay.objects.bulk_create(days, batch_size=batch_size)
+            TimeSlot.objects.bulk_create(slots, batch_size=batch_size)
+            # Bulk inserts skip post_save, log the new rows here
+            ChangeLog.record(ChangeKinds.SCHEDULE_DAY, [day.pk for day in days], schedule_id=schedule.id)
+            ChangeLog.record(ChangeKinds.TIME_SLOT, [slot.pk for slot in slots], schedule_id=schedule.id)
+            created["days_created"] += len(days)
+            created["time_slots_created"] += len(slots)
+            days.clear()
+            slots.clear()
+        
+        with transaction.atomic():
+            schedule_days = ScheduleDay.objects.filter(schedule=schedule)
+            existing_dates = set(schedule_days.values_list('date', flat=True))
+            if start_date is None:
+                start_date = min(existing_dates) if existing_dates else schedule.created_at.date()
+            
+            if not incremental and existing_dates:
+                schedule_days.delete()
+                existing_dates = set()
+            
+            for date, times in ScheduleMaterializationService.iter_days(schedule, start_date, existing_dates):
+                day = ScheduleDay(schedule=schedule, date=date)
+                days.append(day)
+                slots.extend(
+                    TimeSlot(schedule_day=day, start_time=start_time, end_time=end_time)
+                    for start_time, end_time in times
+                )
+                if len(days) >= batch_size or len(slots) >= batch_size:
+                    flush()
+            
+            if days:
+                flush()
+            
+            if created["days_created"]:
+                ScheduleCache.bump_version(schedule_id=schedule.id)
+        
+        return created
+
+class ParticipantInvitationService:
+    """
+    Service for inviting many users to a schedule at once
+    """
+    
+    @staticmethod
+    def invite(schedule, inviter, role, users_data):
+        """
+        Add the users described by users_data ({"email"} or {"username"}
+        entries) to the schedule with a fixed number of queries: one IN
+        query per lookup field, one for existing memberships, one bulk insert
+        for the participants and one for their invitation notifications.
+        
+        Users added by a concurrent request between the membership query and
+        the insert are skipped by the insert and reported as already there.
+        
+        Returns:
+            tuple: (created_participants, errors)
+        """
+        User = get_user_model()
+        
+        emails = {entry.get('email') for entry in users_data if entry.get('email')}
+        usernames = {
+            entry.get('username') for entry in users_data
+            if not entry.get('email') and entry.get('username')
+        }
+        users_by_email = {user.email: user for user in User.objects.filter(email__in=emails)} if emails else {}
+        users_by_username = {
+            user.username: user for user in User.objects.filter(username__in=usernames)
+        } if usernames else {}
+        
+        found = [user.id for user in users_by_email.values()] + [user.id for user in users_by_username.values()]
+        member_ids = set(
+            Participant.objects.filter(schedule=schedule, user_id__in=found).values_list('user_id', flat=True)
+        ) if found else set()
+        
+        created = []
+        errors = []
+        for entry in users_data:
+            email = entry.get('email')
+            username = entry.get('username')
+            
+            if email:
+                user = users_by_email.get(email)
+            elif username:
+                user = users_by_username.get(username)
+            else:
+                errors.append({"detail": "Either email or username is required"})
+                continue
+            
+            if user is None:
+                errors.append({
+                    "detail": f"User with {'email ' + email if email else 'username ' + username} not found"
+                })
+                continue
+            
+            if user.id in member_ids:
+                errors.append({"detail": f"User {user.username} is already a participant"})
+                continue
+            
+            member_ids.add(user.id)
+            created.append(Participant(schedule=schedule, user=user, role=role))
+        
+        with transaction.atomic():
+            if created:
+                Participant.objects.bulk_create(created, ignore_conflicts=True)
+                # Primary keys are generated here, those not found lost the race
+                inserted = set(
+                    Participant.objects.filter(pk__in=[participant.pk for participant in created])
+                    .values_list('pk', flat=True)
+                )
+                for participant in created:
+                    if participant.pk not in inserted:
+                        errors.append({"detail": f"User {participant.user.username} is already a participant"})
+                created = [participant for participant in created if participant.pk in inserted]
+            NotificationService.send_schedule_invitations(
+                [participant.user for participant in created], schedule, inviter, role
+            )
+            if created:
+                ScheduleCache.bump_version(schedule_id=schedule.id)
+                ChangeLog.record(
+                    ChangeKinds.PARTICIPANT, [participant.pk for participant in created], schedule_id=schedule.id
+                )
+                # bulk_create skips post_save, count the new participants here
+                ScheduleCounterService.adjust(schedule, participants=len(created))
+                ScheduleValidationService.update_completion(schedule)
+        
+        return created, errors
+
+class ScheduleCloneService:
+    """
+    Service for copying the structure of a schedule into a new one
+    """
+    BATCH_SIZE = 1000
+    
+    @staticmethod
+    def clone(schedule, owner, name=None, date_offset=0, include_participants=True, include_assignments=False):
+        """
+        Copy the roles, days and time slots (with their alarms) of a schedule,
+        optionally its participants and their assignments, into a new
+        schedule owned by owner with every day shifted by date_offset days.
+        
+        Source rows are read with flat values_list queries and written with
+        bulk inserts in bounded batches. New primary keys are generated up
+        front into old id -> new id maps that the dependent rows are remapped
+        through, so the copy takes a fixed number of queries per table.
+        
+        Returns:
+            dict: id of the new schedule, rows copied per table and elapsed time
+        """
+        if include_assignments and not include_participants:
+            raise ValueError("Assignments can only be copied along with the participants")
+        
+        started = time.perf_counter()
+        batch_size = ScheduleCloneService.BATCH_SIZE
+        offset = timedelta(days=date_offset)
+        through = TimeSlot.participants.through
+        
+        def remap(ids, old_id):
+            ids[old_id] = new_id = uuid.uuid4()
+            return new_id
+        
+        with transaction.atomic():
+            participants = list(
+                Participant.objects.filter(schedule=schedule)
+                .values_list('id', 'user_id', 'role_id', 'invitation_accepted', 'selected_days')
+            ) if include_participants else []
+            
+            clone = Schedule.objects.create(
+                name=name or f"{schedule.name} (copy)",
+                description=schedule.description,
+                owner=owner,
+                duration=schedule.duration,
+                available_days=schedule.available_days,
+                min_days_selection=schedule.min_days_selection,
+                user_specific_min_days=schedule.user_specific_min_days,
+                participant_count=len(participants),
+                accepted_participant_count=sum(1 for participant in participants if participant[3])
+            )
+            
+            role_ids = {}
+            roles = Role.objects.bulk_create([
+                Role(
+                    id=remap(role_ids, role_id), schedule=clone, name=role_name, description=description,
+                    can_edit_schedule=can_edit, can_invate_users=can_invite, can_request_permutations=can_request
+                )
+                for role_id, role_name, description, can_edit, can_invite, can_request in
+                Role.objects.filter(schedule=schedule).values_list(
+                    'id', 'name', 'description', 'can_edit_schedule', 'can_invate_users', 'can_request_permutations'
+                )
+            ], batch_size=batch_size)
+            
+            participant_ids = {}
+            Participant.objects.bulk_create([
+                Participant(
+                    id=remap(participant_ids, participant_id), schedule=clone, user_id=user_id,
+                    role_id=role_ids[role_id], invitation_accepted=accepted,
+                    # The copied assignments cover the same distinct days
+                    selected_days=selected_days if include_assignments else 0
+                )
+                for participant_id, user_id, role_id, accepted, selected_days in participants
+            ], batch_size=batch_size)
+            
+            day_ids = {}
+            days = ScheduleDay.objects.bulk_create([
+                ScheduleDay(id=remap(day_ids, day_id), schedule=clone, date=date + offset)
+                for day_id, date in ScheduleDay.objects.filter(schedule=schedule).values_list('id', 'date')
+            ], batch_size=batch_size)
+            
+            slot_ids = {}
+            slots = TimeSlot.objects.bulk_create([
+                TimeSlot(
+                    id=remap(slot_ids, slot_id), schedule_day_id=day_ids[day_id],
+                    start_time=start_time, end_time=end_time, is_available=is_available,
+                    has_alarm=has_alarm, alarm_times=alarm_times
+                )
+                for slot_id, day_id, start_time, end_time, is_available, has_alarm, alarm_times in
+                TimeSlot.objects.filter(schedule_day__schedule=schedule).values_list(
+                    'id', 'schedule_day_id', 'start_time', 'end_time', 'is_available', 'has_alarm', 'alarm_times'
+                )
+            ], batch_size=batch_size)
+            
+            assignments = []
+            if include_assignments:
+                assignments = through.objects.bulk_create([
+                    through(timeslot_id=slot_ids[slot_id], participant_id=participant_ids[participant_id])
+                    for slot_id, participant_id in through.objects.filter(
+                        timeslot__schedule_day__schedule=schedule
+                    ).values_list('timeslot_id', 'participant_id')
+                ], batch_size=batch_size)
+            
+            # Bulk inserts skip post_save, log the copied rows here
+            for kind, ids in (
+                (ChangeKinds.PARTICIPANT, participant_ids), (ChangeKinds.SCHEDULE_DAY, day_ids),
+                (ChangeKinds.TIME_SLOT, slot_ids)
+            ):
+                ChangeLog.record(kind, ids.values(), schedule_id=clone.id)
+            ScheduleValidationService.update_completion(clone)
+        
+        return {
+            "schedule_id": str(clone.id),
+            "copied": {
+                "roles": len(roles),
+                "participants": len(participants),
+                "days": len(days),
+                "time_slots": len(slots),
+                "assignments": len(assignments)
+            },
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+class ScheduleGridService:
+    """
+    Service for building a compact day x slot x participant representation
+    of a schedule
+    """
+    
+    @staticmethod
+    def build(schedule, binary=False):
+        """
+        Build the grid of a schedule from a single flat values_list query,
+        without instantiating model objects.
+        
+        Days and time windows are indexed once, every slot is a (day, window)
+        pair of indexes and the assignments of each participant are packed
+        as a bitset over the slots (bit i set when assigned to slot i, least
+        significant bit first). With binary=True the bitsets and slot ids are
+        raw bytes for msgpack, otherwise base64 and strings for JSON.
+        """
+        rows = (
+            TimeSlot.objects.filter(schedule_day__schedule=schedule)
+            .order_by('schedule_day__date', 'start_time', 'id')
+            .values_list(
+                'id', 'schedule_day__date', 'start_time', 'end_time',
+                'participants__id', 'participants__user_id',
+                'participants__user__username', 'participants__role__name'
+            )
+        )
+        
+        day_index = {}
+        window_index = {}
+        participant_index = {}
+        participants = []
+        slot_ids = []
+        slot_days = array('I')
+        slot_windows = array('I')
+        assigned = []
+        
+        previous_id = None
+        for slot_id, date, start_time, end_time, participant_id, user_id, username, role in rows:
+            if slot_id != previous_id:
+                previous_id = slot_id
+                slot_ids.append(slot_id)
+                slot_days.append(day_index.setdefault(date, len(day_index)))
+                slot_windows.append(window_index.setdefault((start_time, end_time), len(window_index)))
+            
+            if participant_id is None:
+                continue
+            
+            index = participant_index.get(participant_id)
+            if index is None:
+                index = participant_index[participant_id] = len(participants)
+                participants.append({
+                    "id": str(participant_id),
+                    "user_id": str(user_id),
+                    "username": username,
+                    "role": role
+                })
+            assigned.append((index, len(slot_ids) - 1))
+        
+        bitsets = [bytearray((len(slot_ids) + 7) // 8) for _ in participants]
+        for index, slot in assigned:
+            bitsets[index][slot >> 3] |= 1 << (slot & 7)
+        
+        if binary:
+            ids = b''.join(slot_id.bytes for slot_id in slot_ids)
+            assignments = [bytes(bitset) for bitset in bitsets]
+        else:
+            ids = [str(slot_id) for slot_id in slot_ids]
+            assignments = [base64.b64encode(bitset).decode('ascii') for bitset in bitsets]
+        
+        return {
+            "schedule_id": str(schedule.id),
+            "days": [date.isoformat() for date in day_index],
+            "windows": [
+                [start_time.strftime('%H:%M'), end_time.strftime('%H:%M')]
+                for start_time, end_time in window_index
+            ],
+            "slots": {
+                "ids": ids,
+                "days": slot_days.tolist(),
+                "windows": slot_windows.tolist()
+            },
+            "participants": participants,
+            "assignments": assignments
+        }
+
+class ScheduleHeatmapService:
+    """
+    Service for summarizing the coverage of a schedule: empty slots, load of
+    each participant and totals per weekday
+    """
+    
+    @staticmethod
+    def build(schedule):
+        """
+        Build the heatmap of a schedule from a single flat values_list query.
+        
+        Every (day, slot, participant) row is turned into integer indexes
+        stored in flat typed arrays, the matrices are then filled with
+        whole-array passes. coverage is a day x time window matrix holding
+        the number of participants of the slots in each cell, -1 where the
+        day has no slot in that window. Every participant of the schedule is
+        listed, those without assignments included.
+        """
+        rows = (
+            TimeSlot.objects.filter(schedule_day__schedule=schedule)
+            .order_by('schedule_day__date', 'start_time', 'id')
+            .values_list(
+                'id', 'schedule_day__date', 'start_time', 'end_time',
+                'participants__id', 'participants__user_id', 'participants__user__username'
+            )
+        )
+        
+        day_index = {}
+        window_index = {}
+        participant_index = {}
+        participants = []
+        members = (
+            Participant.objects.filter(schedule=schedule)
+            .order_by('user__username', 'id')
+            .values_list('id', 'user_id', 'user__username')
+        )
+        for participant_id, user_id, username in members:
+            participant_index[participant_id] = len(participants)
+            participants.append({"id": str(participant_id), "user_id": str(user_id), "username": username})
+        slot_days = array('l')
+        slot_windows = array('l')
+        assigned_slots = array('l')
+        assigned_participants = array('l')
+        
+        previous_id = None
+        for slot_id, date, start_time, end_time, participant_id, user_id, username in rows:
+            if slot_id != previous_id:
+                previous_id = slot_id
+                slot_days.append(day_index.setdefault(date, len(day_index)))
+                slot_windows.append(window_index.setdefault((start_time, end_time), len(window_index)))
+            
+            if participant_id is None:
+                continue
+            
+            index = participant_index.get(participant_id)
+            if index is None:
+                index = participant_index[participant_id] = len(participants)
+                participants.append({"id": str(participant_id), "user_id": str(user_id), "username": username})
+            assigned_slots.append(len(slot_days) - 1)
+            assigned_participants.append(index)
+        
+        # Windows are indexed as met, renumber them chronologically
+        windows = sorted(window_index)
+        renumber = array('l', [0]) * len(windows)
+        for position, window in enumerate(windows):
+            renumber[window_index[window]] = position
+        
+        day_count = len(day_index)
+        window_count = len(windows)
+        participant_count = len(participants)
+        slot_cells = array('l', (
+            day * window_count + renumber[window] for day, window in zip(slot_days, slot_windows)
+        ))
+        
+        filled = array('l', [0]) * len(slot_cells)
+        for slot in assigned_slots:
+            filled[slot] += 1
+        coverage = array('l', [-1]) * (day_count * window_count)
+        # A day may hold several slots over the same window
+        for cell, count in zip(slot_cells, filled):
+            coverage[cell] = max(coverage[cell], 0) + count
+        
+        # Participant x day load matrix, row-major
+        load = array('l', [0]) * (participant_count * day_count)
+        for slot, index in zip(assigned_slots, assigned_participants):
+            load[index * day_count + slot_days[slot]] += 1
+        
+        weekdays = [day.weekday() for day in day_index]
+        weekday_slots = array('l', [0]) * 7
+        weekday_assignments = array('l', [0]) * 7
+        weekday_uncovered = array('l', [0]) * 7
+        for day, count in zip(slot_days, filled):
+            weekday = weekdays[day]
+            weekday_slots[weekday] += 1
+            weekday_assignments[weekday] += count
+            weekday_uncovered[weekday] += not count
+        
+        for index, participant in enumerate(participants):
+            row = load[index * day_count:(index + 1) * day_count]
+            participant["slots"] = sum(row)
+            participant["days"] = day_count - row.count(0)
+            participant["max_per_day"] = max(row, default=0)
+        
+        uncovered = filled.count(0)
+        return {
+            "schedule_id": str(schedule.id),
+            "days": [date.isoformat() for date in day_index],
+            "windows": [
+                [start_time.strftime('%H:%M'), end_time.strftime('%H:%M')]
+                for start_time, end_time in windows
+            ],
+            "coverage": [
+                coverage[day * window_count:(day + 1) * window_count].tolist()
+                for day in range(day_count)
+            ],
+            "participants": participants,
+            "weekdays": {
+                WEEKDAYS[weekday]: {
+                    "slots": weekday_slots[weekday],
+                    "assignments": weekday_assignments[weekday],
+                    "uncovered": weekday_uncovered[weekday]
+                }
+                for weekday in range(7) if weekday_slots[weekday]
+            },
+            "totals": {
+                "slots": len(filled),
+                "assignments": len(assigned_slots),
+                "uncovered": uncovered,
+                "coverage_ratio": round(1 - uncovered / len(filled), 4) if filled else None
+            }
+        }
+
+class PermutationService:
+    """
+    Service for applying accepted permutation requests
+    """
+    # Related rows read by the serializer and the response notifications
+    RELATED = (
+        'requester__user', 'requester__role', 'recipient__user', 'recipient__role',
+        'requester_slot__schedule_day__schedule', 'recipient_slot__schedule_day'
+    )
+    
+    @staticmethod
+    def accept(permutation):
+        """
+        Swap the participants of the two time slots of a permutation request
+        in one transaction.
+        
+        Both slots are locked with select_for_update, in primary key order so
+        concurrent accepts on overlapping slots queue up instead of
+        deadlocking, before the request itself is locked and checked. The
+        through table rows are swapped with one delete and one bulk insert,
+        and every other pending request referencing either slot is rejected.
+        
+        Returns:
+            tuple: (accepted_permutation, error_message)
+        """
+        through = TimeSlot.participants.through
+        slot_ids = sorted({permutation.requester_slot_id, permutation.recipient_slot_id})
+        other_slot = {
+            permutation.requester_slot_id: permutation.recipient_slot_id,
+            permutation.recipient_slot_id: permutation.requester_slot_id,
+        }
+        
+        with transaction.atomic():
+            list(TimeSlot.objects.select_for_update().filter(id__in=slot_ids).order_by('id').values_list('id'))
+            
+            permutation = (
+                PermutationRequest.objects.select_for_update(of=('self',))
+                .select_related(*PermutationService.RELATED)
+                .filter(pk=permutation.pk).first()
+            )
+            if permutation is None or permutation.status != StatusChoices.PENDING:
+                return None, "This permutation request is no longer pending"
+            
+            assigned = through.objects.filter(timeslot_id__in=slot_ids)
+            rows = list(assigned.values_list('timeslot_id', 'participant_id'))
+            slots = {slot.pk: slot for slot in (permutation.requester_slot, permutation.recipient_slot)}
+            username = PermutationService.find_overlap(
+                [(participant_id, slots[other_slot[slot_id]]) for slot_id, participant_id in rows], slot_ids
+            )
+            if username is not None:
+                return None, f"The swap would overlap another assignment of {username}"
+            
+            assigned.delete()
+            through.objects.bulk_create([
+                through(timeslot_id=other_slot[slot_id], participant_id=participant_id)
+                for slot_id, participant_id in rows
+            ], ignore_conflicts=True)
+            
+            # Load the swapped participants once for the post_save WebSocket payload
+            participants = Participant.objects.select_related('user', 'role')
+            prefetch_related_objects(
+                [permutation],
+                Prefetch('requester_slot__participants', queryset=participants),
+                Prefetch('recipient_slot__participants', queryset=participants)
+            )
+            permutation.status = StatusChoices.ACCEPTED
+            permutation.save(update_fields=['status'])
+            
+            PermutationService.reject_pending(list(
+                PermutationRequest.objects.select_related(*PermutationService.RELATED)
+                .filter(status=StatusChoices.PENDING)
+                .filter(Q(requester_slot_id__in=slot_ids) | Q(recipient_slot_id__in=slot_ids))
+            ))
+            
+            NotificationService.send_permutation_response(
+                permutation.requester.user, permutation, accepted=True
+            )
+            
+            # Through table writes skip m2m_changed, invalidate the cached schedule here
+            schedule_id = permutation.requester_slot.schedule_day.schedule_id
+            ScheduleCache.bump_version(schedule_id=schedule_id)
+            ChangeLog.record(ChangeKinds.TIME_SLOT, slot_ids, schedule_id=schedule_id)
+            ScheduleOccupancy.record(
+                lambda index: PermutationService.move(index, [
+                    (slot_id, other_slot[slot_id], participant_id) for slot_id, participant_id in rows
+                ]),
+                schedule_id=schedule_id
+            )
+            ScheduleValidationService.refresh(
+                schedule_id=schedule_id, participant_ids={participant_id for _, participant_id in rows}
+            )
+        
+        return permutation, None
+    
+    @staticmethod
+    def find_overlap(moves, slot_ids):
+        """
+        Username of the first participant whose (participant_id, slot) move
+        would overlap one of their assignments in any schedule, other than
+        the slot_ids being swapped, or None. The slots must be loaded along
+        with their day. Reads the users' interval indexes, with a fixed
+        number of queries whatever the number of moves.
+        """
+        if not moves:
+            return None
+        users = dict(
+            Participant.objects.filter(pk__in={participant_id for participant_id, _ in moves})
+            .values_list('id', 'user_id')
+        )
+        indexes = UserIntervals.get_many(set(users.values()))
+        exclude = set(slot_ids)
+        for participant_id, slot in moves:
+            index = indexes.get(users.get(participant_id))
+            if index is not None and index.overlapping(
+                slot.schedule_day.date, slot.start_time, slot.end_time, exclude=exclude
+            ):
+                return (
+                    Participant.objects.filter(pk=participant_id)
+                    .values_list('user__username', flat=True).first()
+                )
+        return None
+    
+    @staticmethod
+    def move(index, moves):
+        """Apply (from_slot, to_slot, participant) moves to an occupancy index"""
+        for from_slot, _, participant_id in moves:
+            index.remove(from_slot, [participant_id])
+        for _, to_slot, participant_id in moves:
+            index.add(to_slot, [participant_id])
+    
+    @staticmethod
+    def reject_pending(permutations):
+        """
+        Reject pending permutation requests made obsolete by a swap with one
+        update, notifying their requesters in bulk
+        """
+        if not permutations:
+            return
+        PermutationRequest.objects.filter(
+            pk__in=[permutation.pk for permutation in permutations]
+        ).update(status=StatusChoices.REJECTED)
+        for permutation in permutations:
+            permutation.status = StatusChoices.REJECTED
+        NotificationService.send_permutation_responses(permutations, accepted=False)
+
+class SwapCycleService:
+    """
+    Service for matching pending permutation requests into k-way swaps.
+    
+    Every pending request is an edge from the requester's position, a
+    (participant, slot) pair, to the recipient's position. A directed cycle
+    is a swap everybody in it asked for: each requester moves into the slot
+    of the next one.
+    """
+    MAX_CYCLE_LENGTH = 6
+    
+    @staticmethod
+    def find(schedule, max_length=MAX_CYCLE_LENGTH):
+        """
+        Find disjoint swap cycles among the pending requests of a schedule.
+        
+        The graph is built from one flat values_list query. Older requests
+        are matched first and every position belongs to at most one cycle.
+        
+        Returns:
+            dict: {"pending": int, "cycles": [{"length", "requests", "moves"}]}
+        """
+        rows = list(
+            PermutationRequest.objects.filter(
+                requester_slot__schedule_day__schedule=schedule,
+                status=StatusChoices.PENDING
+            )
+            .order_by('created_at', 'id')
+            .values_list('id', 'requester_id', 'requester_slot_id', 'recipient_id', 'recipient_slot_id')
+        )
+        
+        nodes = {}
+        edges = []
+        for request_id, requester_id, requester_slot_id, recipient_id, recipient_slot_id in rows:
+            source = nodes.setdefault((requester_id, requester_slot_id), len(nodes))
+            target = nodes.setdefault((recipient_id, recipient_slot_id), len(nodes))
+            edges.append((source, target))
+        
+        cycles = []
+        for cycle in SwapCycleService.find_cycles(len(nodes), edges, max_length):
+            moves = [
+                {
+                    "request": str(rows[edge][0]),
+                    "participant": str(rows[edge][1]),
+                    "from_slot": str(rows[edge][2]),
+                    "to_slot": str(rows[edge][4]),
+                }
+                for edge in cycle
+            ]
+            cycles.append({
+                "length": len(moves),
+                "requests": [move["request"] for move in moves],
+                "moves": moves,
+            })
+        
+        return {"pending": len(rows), "cycles": cycles}
+    
+    @staticmethod
+    def find_cycles(node_count, edges, max_length=MAX_CYCLE_LENGTH):
+        """
+        Greedy disjoint cycle packing on a directed graph.
+        
+        Nodes outside a non-trivial strongly connected component are
+        discarded first. Then, in node order, a depth-bounded breadth first
+        search looks for the shortest cycle back to each unused node through
+        unused nodes of its component. A node whose search fails can never
+        close a cycle later, since the set of unused nodes only shrinks, so
+        each node is searched at most once.
+        
+        Args:
+            node_count: Number of nodes, numbered from 0
+            edges: Sequence of (source, target) pairs in priority order
+            max_length: Longest cycle to look for
+        
+        Returns:
+            list: Cycles as lists of edge indexes, in walking order
+        """
+        outgoing = [[] for _ in range(node_count)]
+        for index, (source, target) in enumerate(edges):
+            if source != target:
+                outgoing[source].append(index)
+        
+        component = SwapCycleService.components(outgoing, edges)
+        used = bytearray(node_count)
+        cycles = []
+        
+        for start in range(node_count):
+            if used[start]:
+                continue
+            start_component = component[start]
+            parents = {start: None}
+            frontier = [start]
+            closing = None
+            for _ in range(max_length):
+                next_frontier = []
+                for node in frontier:
+                    for index in outgoing[node]:
+                        target = edges[index][1]
+                        if target == start:
+                            closing = (node, index)
+                            break
+                        if used[target] or component[target] != start_component or target in parents:
+                            continue
+                        parents[target] = (node, index)
+                        next_frontier.append(target)
+                    if closing:
+                        break
+                if closing or not next_frontier:
+                    break
+                frontier = next_frontier
+            
+            if closing is None:
+                continue
+            
+            node, index = closing
+            cycle = [index]
+            while node != start:
+                used[node] = 1
+                node, index = parents[node]
+                cycle.append(index)
+            used[start] = 1
+            cycle.reverse()
+            cycles.append(cycle)
+        
+        return cycles
+    
+    @staticmethod
+    def components(outgoing, edges):
+        """
+        Label the strongly connected components of a graph with an iterative
+        Tarjan walk
+        """
+        node_count = len(outgoing)
+        index = [-1] * node_count
+        low = [0] * node_count
+        on_stack = bytearray(node_count)
+        component = [-1] * node_count
+        stack = []
+        counter = 0
+        label = 0
+        
+        for root in range(node_count):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [(root, 0)]
+            while work:
+                node, position = work[-1]
+                if position < len(outgoing[node]):
+                    work[-1] = (node, position + 1)
+                    target = edges[outgoing[node][position]][1]
+                    if index[target] == -1:
+                        index[target] = low[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack[target] = 1
+                        work.append((target, 0))
+                    elif on_stack[target] and index[target] < low[node]:
+                        low[node] = index[target]
+                    continue
+                
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component[member] = label
+                        if member == node:
+                            break
+                    label += 1
+        
+        return component
+    
+    @staticmethod
+    def accept(schedule, request_ids):
+        """
+        Apply a swap cycle in one transaction.
+        
+        request_ids must be pending requests of the schedule in walking
+        order, the recipient position of each being the requester position
+        of the next. The slots are locked in primary key order before the
+        requests, like PermutationService.accept, and each requester must
+        still hold the slot they offered. Other pending requests involving
+        one of the moved positions are rejected.
+        
+        Returns:
+            tuple: (accepted_permutations, error_message)
+        """
+        request_ids = [str(request_id) for request_id in request_ids]
+        if len(request_ids) < 2 or len(set(request_ids)) != len(request_ids):
+            return None, "A swap cycle needs at least two distinct permutation requests"
+        
+        requests = PermutationRequest.objects.filter(
+            id__in=request_ids, requester_slot__schedule_day__schedule=schedule
+        )
+        through = TimeSlot.participants.through
+        
+        with transaction.atomic():
+            slot_ids = sorted(set(requests.values_list('requester_slot_id', flat=True)))
+            list(TimeSlot.objects.select_for_update().filter(id__in=slot_ids).order_by('id').values_list('id'))
+            
+            locked = {
+                str(permutation.pk): permutation
+                for permutation in requests.select_for_update(of=('self',))
+                .select_related(*PermutationService.RELATED).order_by('id')
+            }
+            if len(locked) != len(request_ids):
+                return None, "Some permutation requests do not belong to this schedule"
+            
+            cycle = [locked[request_id] for request_id in request_ids]
+            if any(permutation.status != StatusChoices.PENDING for permutation in cycle):
+                return None, "Some permutation requests are no longer pending"
+            
+            for permutation, following in zip(cycle, cycle[1:] + cycle[:1]):
+                if (permutation.recipient_id, permutation.recipient_slot_id) != (
+                    following.requester_id, following.requester_slot_id
+                ):
+                    return None, "The permutation requests do not form a cycle"
+            
+            positions = {(permutation.requester_id, permutation.requester_slot_id) for permutation in cycle}
+            if len(positions) != len(cycle):
+                return None, "The permutation requests do not form a simple cycle"
+            
+            held = Q()
+            for participant_id, slot_id in positions:
+                held |= Q(participant_id=participant_id, timeslot_id=slot_id)
+            assigned = through.objects.filter(held)
+            if assigned.count() != len(positions):
+                return None, "Some participants no longer hold the slot they offered"
+            
+            username = PermutationService.find_overlap(
+                [(permutation.requester_id, permutation.recipient_slot) for permutation in cycle], slot_ids
+            )
+            if username is not None:
+                return None, f"The swap cycle would overlap another assignment of {username}"
+            
+            assigned.delete()
+            through.objects.bulk_create([
+                through(timeslot_id=permutation.recipient_slot_id, participant_id=permutation.requester_id)
+                for permutation in cycle
+            ], ignore_conflicts=True)
+            
+            # Load the swapped participants once for the post_save WebSocket payloads
+            participants = Participant.objects.select_related('user', 'role')
+            prefetch_related_objects(
+                cycle,
+                Prefetch('requester_slot__participants', queryset=participants),
+                Prefetch('recipient_slot__participants', queryset=participants)
+            )
+            for permutation in cycle:
+                permutation.status = StatusChoices.ACCEPTED
+                permutation.save(update_fields=['status'])
+            
+            PermutationService.reject_pending([
+                permutation
+                for permutation in PermutationRequest.objects.select_related(*PermutationService.RELATED)
+                .filter(status=StatusChoices.PENDING)
+                .filter(Q(requester_slot_id__in=slot_ids) | Q(recipient_slot_id__in=slot_ids))
+                if (permutation.requester_id, permutation.requester_slot_id) in positions
+                or (permutation.recipient_id, permutation.recipient_slot_id) in positions
+            ])
+            NotificationService.send_permutation_responses(cycle, accepted=True)
+            
+            # Through table writes skip m2m_changed, invalidate the cached schedule here
+            ScheduleCache.bump_version(schedule_id=schedule.pk)
+            ChangeLog.record(ChangeKinds.TIME_SLOT, slot_ids, schedule_id=schedule.pk)
+            ScheduleOccupancy.record(
+                lambda index: PermutationService.move(index, [
+                    (permutation.requester_slot_id, permutation.recipient_slot_id, permutation.requester_id)
+                    for permutation in cycle
+                ]),
+                schedule_id=schedule.pk
+            )
+            ScheduleValidationService.refresh(
+                schedule_id=schedule.pk, participant_ids=[permutation.requester_id for permutation in cycle]
+            )
+        
+        return cycle, None
@@ -0,0 +1,203 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.changelog import ChangeLog
+from apps.schedule.enums import ChangeKinds
+from apps.schedule.models import Schedule, Role, Participant, ScheduleDay, TimeSlot
+from apps.schedule.intervals import UserIntervals
+from apps.schedule.membership import ScheduleMembership
+from apps.schedule.occupancy import ScheduleOccupancy
+from apps.schedule.services import ScheduleCounterService, ScheduleValidationService
+
+User = get_user_model()
+
+def _origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+CHANGE_KINDS = {
+    Schedule: ChangeKinds.SCHEDULE,
+    ScheduleDay: ChangeKinds.SCHEDULE_DAY,
+    TimeSlot: ChangeKinds.TIME_SLOT,
+    Participant: ChangeKinds.PARTICIPANT,
+}
+
+def _schedule_of(instance):
+    """Arguments of ChangeLog.record locating the schedule of a row"""
+    if isinstance(instance, Schedule):
+        return {'schedule_id': instance.pk}
+    if isinstance(instance, TimeSlot):
+        return {'schedule_day_id': instance.schedule_day_id}
+    return {'schedule_id': instance.schedule_id}
+
+def _first_time(origin, key):
+    """
+    True the first time key is seen for this deletion origin, so deleting
+    many rows of the same schedule bumps its version once
+    """
+    if origin is None:
+        return True
+    seen = origin.__dict__.setdefault('_bumped_schedule_versions', set())
+    if key in seen:
+        return False
+    seen.add(key)
+    return True
+
+@receiver(post_save, sender=Schedule)
+def schedule_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Invalidate the cached representations of an updated schedule and
+    recheck completion against its possibly changed minimum days
+    """
+    if not created and not raw:
+        ScheduleCache.bump_version(schedule_id=instance.pk)
+        ScheduleValidationService.update_completion(instance)
+
+@receiver(post_save, sender=Role)
+@receiver(post_save, sender=Participant)
+@receiver(post_save, sender=ScheduleDay)
+def schedule_row_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ScheduleCache.bump_version(schedule_id=instance.schedule_id)
+
+@receiver(post_save, sender=Participant)
+def participant_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # Keep a schedule instance loaded along with the participant in step
+        field = Participant._meta.get_field('schedule')
+        schedule = instance.schedule if field.is_cached(instance) else Schedule(pk=instance.schedule_id)
+        ScheduleCounterService.adjust(schedule, participants=1, accepted=int(instance.invitation_accepted))
+        # A new participant starts without days and changes the default minimum
+        ScheduleValidationService.refresh(schedule_id=instance.schedule_id, participant_ids=[])
+    elif update_fields is None or 'invitation_accepted' in update_fields:
+        ScheduleCounterService.recount([instance.schedule_id])
+
+@receiver(post_delete, sender=Role)
+@receiver(post_delete, sender=Participant)
+@receiver(post_delete, sender=ScheduleDay)
+def schedule_row_deleted(sender, instance, origin=None, **kwargs):
+    # Rows deleted along with their schedule have nothing left to invalidate
+    if _origin_model(origin) is Schedule:
+        return
+    if _first_time(origin, instance.schedule_id):
+        ScheduleCache.bump_version(schedule_id=instance.schedule_id)
+    if sender is Participant and _first_time(origin, ('participant_count', instance.schedule_id)):
+        # Every participant of the deletion is gone by now, count them once
+        ScheduleCounterService.recount([instance.schedule_id])
+    if sender is not Role and _first_time(origin, ('selected_days', instance.schedule_id)):
+        # Slots deleted along with a day drop their assignments without m2m_changed
+        ScheduleValidationService.refresh(
+            schedule_id=instance.schedule_id, participant_ids=None if sender is ScheduleDay else []
+        )
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=ScheduleDay)
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_save, sender=Participant)
+def change_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ChangeLog.record(CHANGE_KINDS[sender], [instance.pk], **_schedule_of(instance))
+
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=ScheduleDay)
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_delete, sender=Participant)
+def change_deleted(sender, instance, origin=None, **kwargs):
+    # The tombstone of a deleted schedule or day covers the rows deleted along with it
+    origin_model = _origin_model(origin)
+    if sender is not Schedule and origin_model is Schedule:
+        return
+    if sender is TimeSlot and origin_model is ScheduleDay:
+        return
+    ChangeLog.record(CHANGE_KINDS[sender], [instance.pk], deleted=True, **_schedule_of(instance))
+
+@receiver(post_save, sender=TimeSlot)
+def time_slot_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ScheduleCache.bump_version(schedule_day_id=instance.schedule_day_id)
+        ScheduleOccupancy.record(
+            lambda index: index.put_slot(instance.pk, instance.schedule_day_id, instance.start_time, instance.end_time),
+            schedule_day_id=instance.schedule_day_id
+        )
+
+@receiver(post_delete, sender=TimeSlot)
+def time_slot_deleted(sender, instance, origin=None, **kwargs):
+    # The day or schedule being deleted invalidates the schedule itself
+    if _origin_model(origin) in (Schedule, ScheduleDay):
+        return
+    if _first_time(origin, instance.schedule_day_id):
+        ScheduleCache.bump_version(schedule_day_id=instance.schedule_day_id)
+    ScheduleOccupancy.record(lambda index: index.drop_slot(instance.pk), schedule_day_id=instance.schedule_day_id)
+    if _first_time(origin, ('selected_days', instance.schedule_day_id)):
+        ScheduleValidationService.refresh(schedule_day_id=instance.schedule_day_id)
+
+@receiver(m2m_changed, sender=TimeSlot.participants.through)
+def time_slot_participants_changed(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if action == 'pre_clear':
+        # post_clear carries no pk_set, remember whose counters to refresh
+        # and, for a participant, which slots changed
+        if reverse:
+            instance._cleared_slot_ids = list(instance.time_slots.values_list('id', flat=True))
+        else:
+            instance._cleared_participant_ids = list(instance.participants.values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        ScheduleCache.bump_version(schedule_id=instance.schedule_id)
+    else:
+        ScheduleCache.bump_version(schedule_day_id=instance.schedule_day_id)
+    
+    # Keep this process' occupancy index in step with the membership change
+    def change(index):
+        if action == 'post_clear':
+            if reverse:
+                index.remove_participant(instance.pk)
+            else:
+                index.remove(instance.pk)
+        elif reverse:
+            for slot_id in pk_set:
+                if action == 'post_add':
+                    index.add(slot_id, [instance.pk])
+                else:
+                    index.remove(slot_id, [instance.pk])
+        elif action == 'post_add':
+            index.add(instance.pk, pk_set)
+        else:
+            index.remove(instance.pk, pk_set)
+    
+    added = action == 'post_add'
+    if reverse:
+        slot_ids = pk_set
+        if action == 'post_clear':
+            slot_ids = instance.__dict__.pop('_cleared_slot_ids', [])
+        ChangeLog.record(ChangeKinds.TIME_SLOT, slot_ids, schedule_id=instance.schedule_id)
+        ScheduleOccupancy.record(change, schedule_id=instance.schedule_id)
+        UserIntervals.membership_changed(added, pk_set, [instance.pk], schedule_id=instance.schedule_id)
+        ScheduleValidationService.refresh(schedule_id=instance.schedule_id, participant_ids=[instance.pk])
+    else:
+        participant_ids = pk_set
+        if action == 'post_clear':
+            participant_ids = instance.__dict__.pop('_cleared_participant_ids', None)
+        ChangeLog.record(ChangeKinds.TIME_SLOT, [instance.pk], schedule_day_id=instance.schedule_day_id)
+        ScheduleOccupancy.record(change, schedule_day_id=instance.schedule_day_id)
+        UserIntervals.membership_changed(
+            added, [instance.pk], participant_ids, schedule_day_id=instance.schedule_day_id
+        )
+        ScheduleValidationService.refresh(schedule_day_id=instance.schedule_day_id, participant_ids=participant_ids)
+
+@receiver(post_save, sender=User)
+def user_profile_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    Nested schedule representations embed the user, invalidate them when
+    the rendered profile fields change
+    """
+    rendered = {'username', 'email', 'profile_picture'}
+    if created or raw or (update_fields is not None and not rendered & set(update_fields)):
+        return
+    Schedule.objects.filter(
+        pk__in=ScheduleMembership.schedule_ids(instance)
+    ).update(version=F('version') + 1)
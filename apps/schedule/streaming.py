@@ -0,0 +1,103 @@
+"""
+Streaming JSON responses for listings without a size bound.
+
+With ?stream=1 an unpaginated JSON listing is written as it is read: the
+queryset is iterated with a server-side cursor, chunk_size rows at a time,
+and each chunk is rendered and encoded into the response before the next
+one is fetched. Memory stays bounded by one chunk whatever the number of
+rows. Other formats and paginated requests are rendered as usual.
+
+Under ASGI Django reads a synchronous iterator to the end before sending
+anything, the response content is then an async iterator fetching and
+encoding each chunk in the request's thread.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from apps.schedule.fieldsets import ValuesSerializer
+from apps.schedule.renderers import FastJSONRenderer
+
+def wants_stream(request):
+    """Whether the client asked for a streamed JSON response"""
+    stream = request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+    return stream and request.accepted_renderer.format == 'json'
+
+def chunk_size():
+    return getattr(settings, 'STREAM_CHUNK_SIZE', 2000)
+
+def chunked(iterable, size):
+    """Lists of up to size consecutive items"""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+def stream_representations(serializer, queryset, size=None):
+    """
+    Representations of the queryset rows with the fields of a serializer
+    instance, rendered one chunk at a time
+    """
+    size = size or chunk_size()
+    renderer = ValuesSerializer(serializer)
+    if renderer.supported:
+        for chunk in chunked(renderer.values(queryset).iterator(chunk_size=size), size):
+            yield renderer.render(chunk)
+    else:
+        # Prefetches run once per chunk of the iterator
+        for chunk in chunked(queryset.iterator(chunk_size=size), size):
+            yield [serializer.to_representation(instance) for instance in chunk]
+
+def encode_json(chunks, key=None, envelope=None):
+    """
+    JSON bytes of a list made of chunks, either bare or under key of an
+    object that also holds the envelope items
+    """
+    renderer = FastJSONRenderer()
+    yield b'[' if key is None else b'{' + renderer.render(key) + b':['
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # Strip the brackets of the chunk list, its items join the outer one
+        body = renderer.render(chunk)[1:-1]
+        yield body if first else b',' + body
+        first = False
+    if key is None:
+        yield b']'
+        return
+    rest = renderer.render(envelope or {})
+    yield b']}' if rest == b'{}' else b'],' + rest[1:]
+
+async def aiterate(iterable):
+    """Items of a synchronous iterable, each produced in the request's thread"""
+    iterator = iter(iterable)
+    advance = sync_to_async(next)
+    done = object()
+    while (item := await advance(iterator, done)) is not done:
+        yield item
+
+def streaming_json_response(request, chunks, key=None, envelope=None):
+    content = encode_json(chunks, key, envelope)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = aiterate(content)
+    return StreamingHttpResponse(content, content_type='application/json')
+
+class StreamingListMixin:
+    """
+    ViewSet mixin streaming unpaginated list responses on ?stream=1
+    """
+    
+    def list(self, request, *args, **kwargs):
+        paginated = self.paginator is not None and self.paginator.is_requested(request)
+        if paginated or not wants_stream(request):
+            return super().list(request, *args, **kwargs)
+        
+        serializer = self.get_serializer(many=True).child
+        return streaming_json_response(
+            request, stream_representations(serializer, self.filter_queryset(self.get_queryset()))
+        )
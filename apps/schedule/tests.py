@@ -1,3 +1,1849 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import io
+import json
+import threading
+import tracemalloc
+import uuid
+import warnings
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core import signals
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from apps.notification.enums import NotificationTypes
+from apps.notification.models import Notification
+from apps.notification.serializers import NotificationSerializer
+from apps.notification.services import NotificationService
+from apps.schedule.models import (
+    Schedule, Role, Participant, ScheduleDay, TimeSlot, PermutationRequest, ScheduleChange, PendingChange
+)
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.changelog import ChangeLog
+from apps.schedule.enums import ChangeKinds, StatusChoices
+from apps.schedule.intervals import IntervalIndex, UserIntervals
+from apps.schedule.occupancy import ScheduleOccupancy
+from apps.schedule.pagination import KeysetPagination
+from apps.schedule.renderers import FastJSONRenderer
+from apps.schedule.streaming import encode_json
+from apps.schedule.serializers import RoleSerializer, ScheduleDaySerializer, TimeSlotSerializer
+from apps.schedule.views import ScheduleDayViewSet, ScheduleViewSet, TimeSlotViewSet
+from apps.schedule.services import (
+    WEEKDAYS, ParticipantInvitationService, PermutationService, ScheduleCounterService,
+    ScheduleMaterializationService, ScheduleSolverService, ScheduleValidationService, SwapCycleService
+)
+
+User = get_user_model()
+
+def create_user(username):
+    return User.objects.create(username=username, email=f"{username}@example.com")
+
+class ScheduleTestCase(TestCase):
+    """
+    Base test case with a schedule, an owner and a few participants
+    """
+    participant_count = 3
+    day_count = 4
+    slots_per_day = 2
+    
+    def setUp(self):
+        self.owner = create_user('owner')
+        self.schedule = Schedule.objects.create(
+            name='Roster', owner=self.owner, duration=self.day_count
+        )
+        self.role = Role.objects.create(schedule=self.schedule, name='Member')
+        self.participants = [
+            Participant.objects.create(
+                schedule=self.schedule, user=create_user(f"user{i}"), role=self.role
+            )
+            for i in range(self.participant_count)
+        ]
+        
+        start = datetime.date(2025, 1, 6)
+        self.days = [
+            ScheduleDay.objects.create(schedule=self.schedule, date=start + datetime.timedelta(days=i))
+            for i in range(self.day_count)
+        ]
+        self.slots = [
+            TimeSlot.objects.create(
+                schedule_day=day,
+                start_time=datetime.time(8 + 4 * i),
+                end_time=datetime.time(12 + 4 * i)
+            )
+            for day in self.days
+            for i in range(self.slots_per_day)
+        ]
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+class ScheduleSolverServiceTests(TestCase):
+    def test_solve_meets_min_days_without_same_day_assignments(self):
+        slot_days = [day for day in range(10) for _ in range(3)]
+        assignments, days_held, complete = ScheduleSolverService.solve(
+            slot_days, 10, [5, 5, 5, 5, 5]
+        )
+        
+        self.assertTrue(complete)
+        self.assertEqual(len(assignments), 30)
+        self.assertTrue(all(held >= 5 for held in days_held))
+        pairs = {(slot_days[slot], index) for slot, index in assignments}
+        self.assertEqual(len(pairs), len(assignments))
+    
+    def test_solve_keeps_existing_assignments(self):
+        assignments, days_held, _ = ScheduleSolverService.solve(
+            [0, 0, 1, 1], 2, [1, 1], existing=[(0, 0)]
+        )
+        
+        self.assertNotIn(0, [slot for slot, _ in assignments])
+        self.assertEqual(list(days_held), [2, 2])
+
+class AutoAssignTests(ScheduleTestCase):
+    def test_auto_assign_fills_slots_with_one_bulk_insert(self):
+        url = reverse('schedules-auto-assign', args=[self.schedule.id])
+        
+        response = self.client.post(url, {'time_budget': 2}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['assigned'], len(self.slots))
+        self.assertTrue(response.data['complete'])
+        self.assertEqual(response.data['unmet'], [])
+        self.assertEqual(
+            TimeSlot.participants.through.objects.filter(
+                timeslot__schedule_day__schedule=self.schedule
+            ).count(),
+            len(self.slots)
+        )
+    
+    def test_replace_is_parsed_as_a_boolean(self):
+        url = reverse('schedules-auto-assign', args=[self.schedule.id])
+        self.client.post(url, {}, format='json')
+        
+        # A form-encoded "false" keeps the assignments made so far
+        response = self.client.post(url, {'replace': 'false'})
+        self.assertEqual((response.status_code, response.data['assigned']), (status.HTTP_200_OK, 0))
+        
+        response = self.client.post(url, {'replace': 'sometimes'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_time_budget_must_be_finite_and_is_capped(self):
+        url = reverse('schedules-auto-assign', args=[self.schedule.id])
+        for time_budget in ('nan', 'inf', '-inf', 0):
+            with self.subTest(time_budget=time_budget):
+                response = self.client.post(url, {'time_budget': time_budget}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        with mock.patch.object(ScheduleSolverService, 'auto_assign', return_value={}) as auto_assign:
+            self.client.post(url, {'time_budget': 1e9}, format='json')
+        self.assertEqual(auto_assign.call_args.kwargs['time_budget'], ScheduleSolverService.MAX_TIME_BUDGET)
+    
+    def test_auto_assign_respects_available_days(self):
+        # 2025-01-06 is a Monday, keep Monday and Tuesday only
+        self.schedule.available_days = {'monday': [], 'tuesday': []}
+        self.schedule.save()
+        
+        result = ScheduleSolverService.auto_assign(self.schedule)
+        
+        self.assertEqual(result['slots'], 2 * self.slots_per_day)
+        self.assertFalse(
+            TimeSlot.objects.filter(
+                schedule_day__in=self.days[2:], participants__isnull=False
+            ).exists()
+        )
+    
+    def test_auto_assign_requires_edit_permission(self):
+        self.client.force_authenticate(self.participants[0].user)
+        url = reverse('schedules-auto-assign', args=[self.schedule.id])
+        
+        response = self.client.post(url, {}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class ScheduleMaterializationTests(TestCase):
+    def setUp(self):
+        self.owner = create_user('owner')
+        self.available_days = {
+            day: [
+                {'start_time': f"{hour:02d}:00", 'end_time': f"{hour + 2:02d}:00"}
+                for hour in range(8, 20, 2)
+            ]
+            for day in WEEKDAYS
+        }
+    
+    def test_materialize_uses_a_few_bulk_inserts(self):
+        schedule = Schedule.objects.create(
+            name='Year', owner=self.owner, duration=365, available_days=self.available_days
+        )
+        
+        with CaptureQueriesContext(connection) as queries:
+            result = ScheduleMaterializationService.materialize(schedule, start_date=datetime.date(2025, 1, 1))
+        
+        self.assertEqual(result, {"days_created": 365, "time_slots_created": 365 * 6})
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        # Backends with a low parameter limit split the batches further, but
+        # this stays far below one INSERT per row
+        self.assertLess(len(inserts), 50)
+        self.assertEqual(TimeSlot.objects.filter(schedule_day__schedule=schedule).count(), 365 * 6)
+    
+    def test_materialize_skips_unavailable_weekdays(self):
+        schedule = Schedule.objects.create(
+            name='Weekends', owner=self.owner, duration=14,
+            available_days={'saturday': [], 'sunday': [{'start_time': '10:00', 'end_time': '12:00'}]}
+        )
+        
+        result = ScheduleMaterializationService.materialize(schedule, start_date=datetime.date(2025, 1, 6))
+        
+        self.assertEqual(result, {"days_created": 4, "time_slots_created": 2})
+        self.assertTrue(all(day.date.weekday() >= 5 for day in schedule.days.all()))
+    
+    def test_incremental_materialize_only_adds_missing_days(self):
+        schedule = Schedule.objects.create(
+            name='Month', owner=self.owner, duration=30, available_days=self.available_days
+        )
+        ScheduleMaterializationService.materialize(schedule, start_date=datetime.date(2025, 1, 1))
+        
+        schedule.duration = 45
+        schedule.save()
+        result = ScheduleMaterializationService.materialize(schedule, incremental=True)
+        
+        self.assertEqual(result, {"days_created": 15, "time_slots_created": 15 * 6})
+        self.assertEqual(schedule.days.count(), 45)
+        self.assertEqual(max(schedule.days.values_list('date', flat=True)), datetime.date(2025, 2, 14))
+    
+    def test_materialize_parses_incremental_as_a_boolean(self):
+        schedule = Schedule.objects.create(
+            name='Week', owner=self.owner, duration=7, available_days=self.available_days
+        )
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        url = reverse('schedules-materialize', args=[schedule.id])
+        
+        response = client.post(url, {'incremental': 'often'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.post(url, {'start_date': '2025-02-30'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"detail": "start_date must be formatted as YYYY-MM-DD"})
+        self.assertFalse(schedule.days.exists())
+        
+        client.post(url, {'start_date': '2025-01-01', 'incremental': 'true'})
+        response = client.post(url, {'incremental': 'true'})
+        self.assertEqual(response.data, {"days_created": 0, "time_slots_created": 0})
+    
+    def test_create_schedule_materializes_days(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        
+        response = client.post(
+            reverse('schedules-list'),
+            {'name': 'Roster', 'duration': 7, 'available_days': {'monday': [{'start_time': '08:00', 'end_time': '12:00'}]}},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        schedule = Schedule.objects.get(id=response.data['id'])
+        self.assertEqual(schedule.days.count(), 1)
+        self.assertEqual(TimeSlot.objects.filter(schedule_day__schedule=schedule).count(), 1)
+    
+    def test_create_schedule_rejects_invalid_available_days(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        
+        response = client.post(
+            reverse('schedules-list'),
+            {'name': 'Roster', 'available_days': {'someday': []}},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class AddParticipantsTests(ScheduleTestCase):
+    def invite(self, entries):
+        return self.client.post(
+            reverse('schedules-add-participants', args=[self.schedule.id]),
+            {'role_id': str(self.role.id), 'participants': entries},
+            format='json'
+        )
+    
+    def test_add_participants_reports_created_and_errors(self):
+        create_user('alice')
+        create_user('bob')
+        
+        response = self.invite([
+            {'email': 'alice@example.com'},
+            {'username': 'bob'},
+            {'username': 'user0'},
+            {'email': 'nobody@example.com'},
+            {},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [participant['user']['username'] for participant in response.data['created']],
+            ['alice', 'bob']
+        )
+        self.assertEqual(response.data['errors'], [
+            {"detail": "User user0 is already a participant"},
+            {"detail": "User with email nobody@example.com not found"},
+            {"detail": "Either email or username is required"},
+        ])
+        self.assertEqual(
+            Notification.objects.filter(type=NotificationTypes.SCHEDULE_INVITATION).count(), 2
+        )
+    
+    def test_add_participants_query_count_does_not_grow_with_payload(self):
+        small = [create_user(f"small{i}") for i in range(2)]
+        large = [create_user(f"large{i}") for i in range(30)]
+        
+        with CaptureQueriesContext(connection) as small_queries:
+            self.invite([{'email': user.email} for user in small])
+        with CaptureQueriesContext(connection) as large_queries:
+            self.invite([{'username': user.username} for user in large])
+        
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(self.schedule.participants.count(), self.participant_count + 32)
+
+    def test_users_added_concurrently_are_reported(self):
+        alice, bob = create_user('alice'), create_user('bob')
+        bulk_create = Participant.objects.bulk_create
+        
+        def racing_bulk_create(participants, **kwargs):
+            # Another request adds bob after the membership query
+            bulk_create([Participant(schedule=self.schedule, user=bob, role=self.role)])
+            return bulk_create(participants, **kwargs)
+        
+        with mock.patch.object(Participant.objects, 'bulk_create', side_effect=racing_bulk_create):
+            response = self.invite([{'username': 'alice'}, {'username': 'bob'}])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([participant['user']['id'] for participant in response.data['created']], [str(alice.id)])
+        self.assertEqual(response.data['errors'], [{"detail": "User bob is already a participant"}])
+        self.assertEqual(self.schedule.participants.filter(user=bob).count(), 1)
+
+class ReadPathQueryBudgetTests(ScheduleTestCase):
+    """
+    List endpoints must issue a constant number of queries however many
+    days, slots and participants they render
+    """
+    budgets = {
+        'schedules-list': 3,
+        'roles-list': 1,
+        'schedule-days-list': 3,
+        'time-slots-list': 2,
+        'permutation-requests-list': 3,
+    }
+    
+    def setUp(self):
+        super().setUp()
+        self.user = self.participants[0].user
+        self.client.force_authenticate(self.user)
+        self.grow()
+    
+    def grow(self):
+        """Add a week of days with assigned slots and permutation requests"""
+        start = max(day.date for day in self.days) + datetime.timedelta(days=1)
+        for offset in range(7):
+            day = ScheduleDay.objects.create(schedule=self.schedule, date=start + datetime.timedelta(days=offset))
+            self.days.append(day)
+            for hour in (8, 14):
+                slot = TimeSlot.objects.create(
+                    schedule_day=day, start_time=datetime.time(hour), end_time=datetime.time(hour + 4)
+                )
+                slot.participants.set(self.participants)
+                self.slots.append(slot)
+        
+        for recipient in self.participants[1:]:
+            PermutationRequest.objects.create(
+                requester=self.participants[0], recipient=recipient,
+                requester_slot=self.slots[-1], recipient_slot=self.slots[-2]
+            )
+        
+        self.participants.append(
+            Participant.objects.create(
+                schedule=self.schedule, user=create_user(f"user{len(self.participants)}"), role=self.role
+            )
+        )
+    
+    def count_queries(self, name, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+    
+    def test_list_endpoints_stay_within_constant_query_budget(self):
+        params = {
+            'schedules-list': {},
+            'roles-list': {'schedule_id': str(self.schedule.id)},
+            'schedule-days-list': {},
+            'time-slots-list': {},
+            'permutation-requests-list': {},
+        }
+        
+        before = {name: self.count_queries(name, params[name]) for name in self.budgets}
+        self.grow()
+        self.grow()
+        after = {name: self.count_queries(name, params[name]) for name in self.budgets}
+        
+        for name, budget in self.budgets.items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(before[name], after[name])
+                self.assertLessEqual(after[name], budget)
+
+class ScheduleGridTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.slots[0].participants.add(self.participants[0])
+        self.slots[3].participants.add(self.participants[0], self.participants[2])
+    
+    def test_grid_json_encodes_assignments_as_bitsets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('schedules-grid', args=[self.schedule.id]))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        grid = response.json()
+        self.assertEqual(grid['days'], [day.date.isoformat() for day in self.days])
+        self.assertEqual(grid['windows'], [['08:00', '12:00'], ['12:00', '16:00']])
+        self.assertEqual(grid['slots']['ids'], [str(slot.id) for slot in self.slots])
+        self.assertEqual(grid['slots']['days'], [0, 0, 1, 1, 2, 2, 3, 3])
+        self.assertEqual(grid['slots']['windows'], [0, 1] * 4)
+        
+        usernames = [participant['username'] for participant in grid['participants']]
+        self.assertEqual(usernames, ['user0', 'user2'])
+        self.assertEqual(base64.b64decode(grid['assignments'][0]), bytes([0b1001]))
+        self.assertEqual(base64.b64decode(grid['assignments'][1]), bytes([0b1000]))
+        # A single flat query reads the slots and their assignments
+        slot_queries = [query for query in queries.captured_queries if 'schedule_timeslot' in query['sql']]
+        self.assertEqual(len(slot_queries), 1)
+    
+    def test_grid_msgpack_uses_raw_bytes(self):
+        response = self.client.get(
+            reverse('schedules-grid', args=[self.schedule.id]), HTTP_ACCEPT='application/msgpack'
+        )
+        
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        grid = msgpack.unpackb(response.content)
+        self.assertEqual(grid['slots']['ids'][:16], self.slots[0].id.bytes)
+        self.assertEqual(grid['assignments'][0], bytes([0b1001]))
+
+class ScheduleHeatmapTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.evening = TimeSlot.objects.create(
+            schedule_day=self.days[0], start_time=datetime.time(20), end_time=datetime.time(22)
+        )
+        self.slots[0].participants.add(self.participants[0])
+        self.slots[2].participants.add(self.participants[1])
+        self.slots[3].participants.add(self.participants[0], self.participants[2])
+    
+    def heatmap(self):
+        return self.client.get(reverse('schedules-heatmap', args=[self.schedule.id]))
+    
+    def test_heatmap_summarizes_coverage(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.heatmap()
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        heatmap = response.data
+        self.assertEqual(heatmap['windows'], [['08:00', '12:00'], ['12:00', '16:00'], ['20:00', '22:00']])
+        self.assertEqual(heatmap['coverage'], [[1, 0, 0], [1, 2, -1], [0, 0, -1], [0, 0, -1]])
+        self.assertEqual(
+            [(p['username'], p['slots'], p['days'], p['max_per_day']) for p in heatmap['participants']],
+            [('user0', 2, 2, 1), ('user1', 1, 1, 1), ('user2', 1, 1, 1)]
+        )
+        self.assertEqual(heatmap['weekdays']['monday'], {"slots": 3, "assignments": 1, "uncovered": 2})
+        self.assertEqual(heatmap['weekdays']['tuesday'], {"slots": 2, "assignments": 3, "uncovered": 0})
+        self.assertNotIn('friday', heatmap['weekdays'])
+        self.assertEqual(
+            heatmap['totals'], {"slots": 9, "assignments": 4, "uncovered": 6, "coverage_ratio": 0.3333}
+        )
+        slot_queries = [query for query in queries.captured_queries if 'schedule_timeslot' in query['sql']]
+        self.assertEqual(len(slot_queries), 1)
+    
+    def test_idle_participants_and_overlapping_slots_are_counted(self):
+        idle = Participant.objects.create(schedule=self.schedule, user=create_user('idle'), role=self.role)
+        second = TimeSlot.objects.create(
+            schedule_day=self.days[0], start_time=datetime.time(8), end_time=datetime.time(12)
+        )
+        second.participants.add(self.participants[1])
+        
+        heatmap = self.heatmap().data
+        
+        self.assertEqual(heatmap['coverage'][0], [2, 0, 0])
+        self.assertEqual(
+            [(p['username'], p['slots'], p['days'], p['max_per_day']) for p in heatmap['participants']],
+            [('idle', 0, 0, 0), ('user0', 2, 2, 1), ('user1', 2, 2, 1), ('user2', 1, 1, 1)]
+        )
+        self.assertEqual(heatmap['participants'][0]['id'], str(idle.id))
+    
+    def test_heatmap_is_cached_per_version(self):
+        self.heatmap()
+        with CaptureQueriesContext(connection) as queries:
+            self.heatmap()
+        self.assertFalse([query for query in queries.captured_queries if 'schedule_timeslot' in query['sql']])
+        
+        self.evening.participants.add(self.participants[1])
+        
+        self.assertEqual(self.heatmap().data['coverage'][0], [1, 0, 1])
+
+class ScheduleCloneTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.slots[0].has_alarm = True
+        self.slots[0].alarm_times = ['07:30']
+        self.slots[0].save()
+        self.slots[0].participants.add(self.participants[0])
+        self.slots[3].participants.add(self.participants[1])
+    
+    def clone(self, data):
+        return self.client.post(reverse('schedules-clone', args=[self.schedule.id]), data, format='json')
+    
+    def test_clone_copies_the_structure_with_a_date_offset(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.clone({'name': 'February', 'date_offset': 28, 'include_assignments': True})
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data['copied'],
+            {"roles": 1, "participants": 3, "days": 4, "time_slots": 8, "assignments": 2}
+        )
+        clone = Schedule.objects.get(pk=response.data['schedule_id'])
+        self.assertEqual((clone.name, clone.owner, clone.participant_count), ('February', self.owner, 3))
+        self.assertEqual(
+            list(clone.days.order_by('date').values_list('date', flat=True)),
+            [day.date + datetime.timedelta(days=28) for day in self.days]
+        )
+        first = TimeSlot.objects.get(
+            schedule_day__schedule=clone, schedule_day__date=datetime.date(2025, 2, 3), start_time=datetime.time(8)
+        )
+        self.assertEqual((first.has_alarm, first.alarm_times), (True, ['07:30']))
+        self.assertEqual(
+            [(participant.user_id, participant.selected_days) for participant in first.participants.all()],
+            [(self.participants[0].user_id, 1)]
+        )
+        self.assertFalse(TimeSlot.participants.through.objects.filter(
+            timeslot__schedule_day__schedule=clone, participant__schedule=self.schedule
+        ).exists())
+        # Bulk copies, not one query per row
+        self.assertLess(len(queries), 24)
+    
+    def test_clone_skips_assignments_by_default(self):
+        response = self.clone({'start_date': '2025-03-03', 'include_participants': False})
+        
+        self.assertEqual(response.data['copied']['participants'], 0)
+        self.assertEqual(response.data['copied']['assignments'], 0)
+        clone = Schedule.objects.get(pk=response.data['schedule_id'])
+        self.assertEqual(clone.days.order_by('date').first().date, datetime.date(2025, 3, 3))
+        self.assertEqual(clone.participant_count, 0)
+    
+    def test_clone_rejects_invalid_flags_and_offsets(self):
+        for data in (
+            {'include_participants': 'perhaps'},
+            {'include_assignments': 'perhaps'},
+            {'date_offset': 10 ** 9},
+            {'date_offset': -10 ** 20},
+            {'start_date': '2025-02-30'},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.clone(data).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Schedule.objects.count(), 1)
+        
+        # Form payloads spell booleans as strings
+        response = self.client.post(
+            reverse('schedules-clone', args=[self.schedule.id]), {'include_participants': 'false'}
+        )
+        self.assertEqual(response.data['copied']['participants'], 0)
+    
+    def test_clone_requires_edit_permission(self):
+        self.client.force_authenticate(self.participants[0].user)
+        
+        response = self.clone({})
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class ScheduleMembershipTests(ScheduleTestCase):
+    """
+    Listings are filtered through the membership subquery: no OR across a
+    join, no DISTINCT, index lookups only
+    """
+    viewsets = {
+        'schedules': ScheduleViewSet,
+        'schedule-days': ScheduleDayViewSet,
+        'time-slots': TimeSlotViewSet,
+    }
+    
+    def setUp(self):
+        super().setUp()
+        # The owner also participates, their schedule must be listed once
+        Participant.objects.create(schedule=self.schedule, user=self.owner, role=self.role)
+        other = Schedule.objects.create(name='Other', owner=create_user('stranger'))
+        ScheduleDay.objects.create(schedule=other, date=self.days[0].date)
+    
+    def queryset(self, name, user):
+        view = self.viewsets[name](request=SimpleNamespace(user=user, query_params={}), format_kwarg=None)
+        return view.get_queryset()
+    
+    def test_list_plans_use_indexes_without_distinct(self):
+        for name in self.viewsets:
+            with self.subTest(name):
+                queryset = self.queryset(name, self.owner)
+                self.assertNotIn('DISTINCT', str(queryset.query))
+                plan = queryset.explain()
+                for marker in ('DISTINCT', 'HashAggregate', 'Unique'):
+                    self.assertNotIn(marker, plan)
+                if connection.vendor == 'sqlite':
+                    self.assertNotRegex(plan, r'SCAN (schedule_participant|U\d)\b')
+                    self.assertRegex(plan, r'SEARCH U\d USING COVERING INDEX schedule_pa_user_id')
+    
+    def test_owners_and_participants_see_their_schedules_once(self):
+        for user in (self.owner, self.participants[0].user):
+            with self.subTest(user=user.username):
+                self.client.force_authenticate(user)
+                
+                schedules = self.client.get(reverse('schedules-list')).data['results']
+                days = self.client.get(reverse('schedule-days-list'), {'page_size': 100}).data['results']
+                
+                self.assertEqual([schedule['id'] for schedule in schedules], [str(self.schedule.id)])
+                self.assertEqual(len(days), len(self.days))
+
+class SchedulePermissionTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = self.participants[0]
+        self.client.force_authenticate(self.member.user)
+    
+    def access_queries(self, queries):
+        return [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "schedule_participant"."id", "schedule_role"."can_edit_schedule"')
+        ]
+    
+    def test_access_is_loaded_once_and_cached_per_version(self):
+        url = reverse('roles-detail', args=[self.role.id])
+        
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url, {'schedule_id': str(self.schedule.id)})
+        with CaptureQueriesContext(connection) as second:
+            self.client.get(url, {'schedule_id': str(self.schedule.id)})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.access_queries(first)), 1)
+        self.assertEqual(self.access_queries(second), [])
+        
+        response = self.client.patch(
+            f"{url}?schedule_id={self.schedule.id}", {'description': 'Edited'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        # Saving the role bumps the schedule version, the cached access is dropped
+        self.role.can_edit_schedule = True
+        self.role.save()
+        response = self.client.patch(
+            f"{url}?schedule_id={self.schedule.id}", {'description': 'Edited'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_roles_of_other_schedules_are_hidden(self):
+        other = Schedule.objects.create(name='Other', owner=create_user('stranger'))
+        Role.objects.create(schedule=other, name='Hidden')
+        
+        response = self.client.get(reverse('roles-list'), {'schedule_id': str(other.id)})
+        
+        self.assertEqual(response.data, [])
+    
+    def test_schedule_changes_need_edit_or_owner_rights(self):
+        url = reverse('schedules-detail', args=[self.schedule.id])
+        
+        self.assertEqual(self.client.patch(url, {'name': 'Mine'}, format='json').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_403_FORBIDDEN)
+        
+        Role.objects.filter(pk=self.role.pk).update(can_edit_schedule=True, can_invate_users=True)
+        ScheduleCache.bump_version(schedule_id=self.schedule.id)
+        self.assertEqual(self.client.patch(url, {'name': 'Mine'}, format='json').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(
+            reverse('schedules-add-participants', args=[self.schedule.id]),
+            {'role_id': str(self.role.id), 'participants': []}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_permutation_requests_follow_the_role(self):
+        self.slots[0].participants.add(self.member)
+        self.slots[1].participants.add(self.participants[1])
+        data = {'requester_slot_id': str(self.slots[0].id), 'recipient_slot_id': str(self.slots[1].id)}
+        
+        response = self.client.post(reverse('permutation-requests-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['requester']['id'], str(self.member.id))
+        
+        self.role.can_request_permutations = False
+        self.role.save()
+        response = self.client.post(reverse('permutation-requests-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(reverse('permutation-requests-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_days_and_slots_are_scoped_to_members_and_edited_by_editors(self):
+        slot_url = reverse('time-slots-detail', args=[self.slots[0].id])
+        day_url = reverse('schedule-days-detail', args=[self.days[0].id])
+        alarm_url = reverse('time-slots-set-alarm', args=[self.slots[0].id])
+        
+        def statuses():
+            return [
+                self.client.patch(slot_url, {'is_available': False}, format='json').status_code,
+                self.client.post(alarm_url, {'alarm_times': [15]}, format='json').status_code,
+            ]
+        
+        self.client.force_authenticate(create_user('stranger'))
+        days = self.client.get(reverse('schedule-days-list'), {'schedule_id': str(self.schedule.id)})
+        slots = self.client.get(reverse('time-slots-list'), {'schedule_day_id': str(self.days[0].id)})
+        self.assertEqual((days.data, slots.data), ([], []))
+        self.assertEqual(statuses(), [status.HTTP_404_NOT_FOUND] * 2)
+        self.assertEqual(self.client.delete(day_url).status_code, status.HTTP_404_NOT_FOUND)
+        
+        # Members read and set their alarms, only editors change the rows
+        self.client.force_authenticate(self.member.user)
+        slots = self.client.get(reverse('time-slots-list'), {'schedule_day_id': str(self.days[0].id)})
+        self.assertEqual(len(slots.data), 2)
+        self.assertEqual(statuses(), [status.HTTP_403_FORBIDDEN, status.HTTP_200_OK])
+        self.assertEqual(self.client.delete(day_url).status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.role.can_edit_schedule = True
+        self.role.save()
+        self.assertEqual(statuses(), [status.HTTP_200_OK] * 2)
+        self.assertEqual(self.client.delete(day_url).status_code, status.HTTP_204_NO_CONTENT)
+    
+    def test_schedule_actions_and_answers_use_the_permission_layer(self):
+        self.assertEqual(
+            self.client.post(reverse('schedules-materialize', args=[self.schedule.id])).status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(
+            self.client.post(reverse('schedules-mark-complete', args=[self.schedule.id])).status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+        
+        permutation = PermutationRequest.objects.create(
+            requester=self.member, recipient=self.participants[1],
+            requester_slot=self.slots[0], recipient_slot=self.slots[1], status='Pending'
+        )
+        for name in ('permutation-requests-accept', 'permutation-requests-reject'):
+            with self.subTest(name):
+                response = self.client.post(reverse(name, args=[permutation.id]))
+                self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(self.participants[1].user)
+        response = self.client.post(reverse('permutation-requests-reject', args=[permutation.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class ScheduleCacheTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        ScheduleCache.reset_stats()
+    
+    def current_version(self):
+        return ScheduleCache.get_version(self.schedule.id)
+    
+    def test_version_is_bumped_by_every_schedule_row(self):
+        changes = [
+            lambda: Schedule.objects.get(id=self.schedule.id).save(),
+            lambda: Role.objects.create(schedule=self.schedule, name='Lead'),
+            lambda: self.participants[0].save(),
+            lambda: ScheduleDay.objects.create(schedule=self.schedule, date=datetime.date(2025, 2, 1)),
+            lambda: self.slots[0].save(),
+            lambda: self.slots[0].participants.add(self.participants[0]),
+            lambda: self.participants[1].time_slots.add(self.slots[1]),
+            lambda: self.slots[0].participants.clear(),
+            lambda: self.slots[1].delete(),
+            lambda: self.days[-1].delete(),
+        ]
+        
+        for change in changes:
+            version = self.current_version()
+            change()
+            self.assertGreater(self.current_version(), version)
+    
+    def test_saving_a_stale_instance_keeps_the_version(self):
+        stale = Schedule.objects.get(id=self.schedule.id)
+        self.slots[0].save()
+        version = self.current_version()
+        
+        stale.name = 'Renamed'
+        stale.save()
+        
+        self.assertGreater(self.current_version(), version)
+        self.assertEqual(Schedule.objects.get(id=self.schedule.id).name, 'Renamed')
+    
+    def test_deleting_many_rows_bumps_once(self):
+        version = self.current_version()
+        
+        with CaptureQueriesContext(connection) as queries:
+            ScheduleDay.objects.filter(schedule=self.schedule).delete()
+        
+        bumps = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "schedule_schedule"')
+        ]
+        self.assertEqual(len(bumps), 1)
+        self.assertEqual(self.current_version(), version + 1)
+    
+    def test_bulk_paths_bump_version(self):
+        version = self.current_version()
+        ScheduleSolverService.auto_assign(self.schedule)
+        self.assertGreater(self.current_version(), version)
+    
+    def test_cached_days_are_served_until_the_schedule_changes(self):
+        url = reverse('schedule-days-list')
+        params = {'schedule_id': str(self.schedule.id)}
+        
+        first = self.client.get(url, params)
+        second = self.client.get(url, params)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(ScheduleCache.stats()['hits'], 1)
+        self.assertEqual(ScheduleCache.stats()['misses'], 1)
+        
+        self.slots[0].participants.add(self.participants[0])
+        third = self.client.get(url, params)
+        
+        self.assertEqual(ScheduleCache.stats()['misses'], 2)
+        self.assertEqual(len(third.data[0]['time_slots'][0]['participants']), 1)
+
+class KeysetPaginationTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.participants[0].user)
+    
+    def test_slot_listing_stays_a_plain_list_without_pagination_params(self):
+        response = self.client.get(reverse('time-slots-list'))
+        
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), len(self.slots))
+    
+    def test_slot_listing_pages_by_day_start_time_and_id(self):
+        url = reverse('time-slots-list') + '?page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen.extend(slot['id'] for slot in response.data['results'])
+            url = response.data['next']
+        
+        slots = sorted(self.slots, key=lambda slot: (slot.schedule_day.date, slot.start_time, slot.id.hex))
+        self.assertEqual(seen, [str(slot.id) for slot in slots])
+    
+    def test_slot_listing_spans_days_in_date_order(self):
+        # Day ids in reverse date order, which a listing keyed on the day id would follow
+        other = Schedule.objects.create(name='Other', owner=self.owner)
+        Participant.objects.create(schedule=other, user=self.participants[0].user, role=self.role)
+        days = [
+            ScheduleDay.objects.create(id=uuid.UUID(int=10 - i), schedule=other, date=datetime.date(2025, 3, 1 + i))
+            for i in range(3)
+        ]
+        slots = [
+            TimeSlot.objects.create(schedule_day=day, start_time=datetime.time(9), end_time=datetime.time(10))
+            for day in days
+        ]
+        
+        response = self.client.get(
+            reverse('time-slots-list'), {'page_size': 2, 'cursor': KeysetPagination.make_cursor(
+                [datetime.date(2025, 2, 1), datetime.time(0), uuid.UUID(int=0)]
+            )}
+        )
+        self.assertEqual([slot['id'] for slot in response.data['results']], [str(slot.id) for slot in slots[:2]])
+    
+    def test_slot_listing_is_ordered_by_indexes_of_the_day_and_slot_tables(self):
+        self.assertIn(['date', 'id'], [index.fields for index in ScheduleDay._meta.indexes])
+        self.assertIn(['schedule_day', 'start_time', 'id'], [index.fields for index in TimeSlot._meta.indexes])
+    
+    def test_cursor_values_are_checked_against_the_ordering_fields(self):
+        url = reverse('time-slots-list')
+        valid = KeysetPagination.make_cursor([self.days[1].date, datetime.time(8), self.slots[0].id])
+        invalid = KeysetPagination.make_cursor([self.days[1].date, 'noon', self.slots[0].id])
+        
+        self.assertEqual(self.client.get(url, {'cursor': valid}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, {'cursor': invalid}).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_day_listing_pages_by_date(self):
+        response = self.client.get(
+            reverse('schedule-days-list'), {'schedule_id': str(self.schedule.id), 'page_size': 3}
+        )
+        
+        self.assertEqual([day['date'] for day in response.data['results']], [str(day.date) for day in self.days[:3]])
+        self.assertIsNotNone(response.data['next'])
+
+class SparseFieldsTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = self.participants[0]
+        self.client.force_authenticate(self.member.user)
+        self.slots[0].participants.add(self.member, self.participants[1])
+        self.slots[3].participants.add(self.participants[2])
+        self.slots[3].has_alarm = True
+        self.slots[3].alarm_times = ['07:45']
+        self.slots[3].save()
+        NotificationService.send_schedule_invitations([self.member.user], self.schedule, self.owner, self.role)
+    
+    def rendered(self, data):
+        """JSON round trip, with nested participants in a stable order"""
+        data = json.loads(JSONRenderer().render(data))
+        for row in data:
+            for slot in row.get('time_slots', [row]):
+                slot.get('participants', []).sort(key=lambda participant: participant['id'])
+        return data
+    
+    def test_values_listings_match_the_model_serializers(self):
+        slots = TimeSlot.objects.filter(schedule_day__schedule=self.schedule)
+        days = ScheduleDay.objects.filter(schedule=self.schedule)
+        expected = {
+            'time-slots-list': ({}, TimeSlotSerializer(TimeSlotSerializer.setup_eager_loading(slots), many=True)),
+            'schedule-days-list': (
+                {'schedule_id': str(self.schedule.id)},
+                ScheduleDaySerializer(ScheduleDaySerializer.setup_eager_loading(days), many=True)
+            ),
+            'roles-list': ({'schedule_id': str(self.schedule.id)}, RoleSerializer([self.role], many=True)),
+        }
+        
+        for name, (params, serializer) in expected.items():
+            with self.subTest(name):
+                model_data = self.rendered(serializer.data)
+                response = self.client.get(reverse(name), params)
+                self.assertEqual(self.rendered(response.data), model_data)
+        
+        notifications = self.client.get(reverse('notifications-list')).data['results']
+        self.assertEqual(
+            self.rendered(notifications),
+            self.rendered(NotificationSerializer(Notification.objects.filter(user=self.member.user), many=True).data)
+        )
+    
+    def test_fields_and_expand(self):
+        url = reverse('time-slots-list')
+        
+        response = self.client.get(url, {'fields': 'id,start_time,participants'})
+        first = next(slot for slot in response.data if slot['id'] == str(self.slots[0].id))
+        self.assertEqual(set(first), {'id', 'start_time', 'participants'})
+        self.assertEqual(sorted(map(str, first['participants'])), sorted([str(self.member.id), str(self.participants[1].id)]))
+        
+        response = self.client.get(url, {'fields': 'id,participants', 'expand': 'participants'})
+        first = next(slot for slot in response.data if slot['id'] == str(self.slots[0].id))
+        self.assertEqual(
+            sorted(participant['user']['username'] for participant in first['participants']), ['user0', 'user1']
+        )
+        
+        response = self.client.get(reverse('notifications-list'), {'fields': 'id,title'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+    
+    def test_sparse_day_listings_are_cached_apart(self):
+        params = {'schedule_id': str(self.schedule.id)}
+        full = self.client.get(reverse('schedule-days-list'), params)
+        sparse = self.client.get(reverse('schedule-days-list'), {**params, 'fields': 'date'})
+        
+        self.assertIn('time_slots', full.data[0])
+        self.assertEqual(sparse.data[0], {'date': str(self.days[0].date)})
+    
+    def test_schedules_fall_back_to_the_model_serializer(self):
+        response = self.client.get(reverse('schedules-list'))
+        self.assertEqual(response.data['results'][0]['to_weeks'], 0)
+        
+        response = self.client.get(reverse('schedules-list'), {'fields': 'id,name,roles'})
+        self.assertEqual(response.data['results'][0], {
+            'id': str(self.schedule.id), 'name': 'Roster', 'roles': [self.role.id]
+        })
+
+class NegotiationTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = self.participants[0]
+        self.slots[0].participants.add(self.member)
+        NotificationService.send_schedule_invitations([self.member.user], self.schedule, self.owner, self.role)
+    
+    def test_msgpack_listings_carry_the_json_values(self):
+        self.client.force_authenticate(self.member.user)
+        urls = {
+            'time-slots-list': {},
+            'schedule-days-list': {'schedule_id': str(self.schedule.id)},
+            'notifications-list': {},
+        }
+        for name, params in urls.items():
+            with self.subTest(name):
+                as_json = self.client.get(reverse(name), params, HTTP_ACCEPT='application/json')
+                as_msgpack = self.client.get(reverse(name), params, HTTP_ACCEPT='application/msgpack')
+                
+                self.assertEqual(as_msgpack['Content-Type'], 'application/msgpack')
+                self.assertEqual(msgpack.unpackb(as_msgpack.content), json.loads(as_json.content))
+    
+    def test_fast_json_matches_the_default_renderer(self):
+        data = {
+            'id': self.schedule.id,
+            'synced_at': datetime.datetime(2025, 1, 6, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'date': datetime.date(2025, 1, 6),
+            'time': datetime.time(8, 30),
+            'slots': TimeSlotSerializer(self.slots[:2], many=True).data,
+            'name': 'Réunion',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+    
+    def test_msgpack_request_bodies(self):
+        response = self.client.patch(
+            reverse('time-slots-detail', args=[self.slots[1].id]),
+            msgpack.packb({'is_available': False, 'alarm_times': ['07:30']}),
+            content_type='application/msgpack'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.slots[1].refresh_from_db()
+        self.assertFalse(self.slots[1].is_available)
+        self.assertEqual(self.slots[1].alarm_times, ['07:30'])
+        
+        response = self.client.patch(
+            reverse('time-slots-detail', args=[self.slots[1].id]), b'\xc1', content_type='application/msgpack'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class StreamingTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.slots[0].participants.add(self.participants[0])
+    
+    def streamed(self, name, params=None):
+        response = self.client.get(reverse(name), {**(params or {}), 'stream': '1'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return b''.join(response.streaming_content)
+    
+    def add_slots(self, count):
+        day = ScheduleDay.objects.create(schedule=self.schedule, date=datetime.date(2025, 3, 3))
+        TimeSlot.objects.bulk_create([
+            TimeSlot(schedule_day=day, start_time=datetime.time(i % 24), end_time=datetime.time(i % 24, 30))
+            for i in range(count)
+        ])
+    
+    def test_streamed_listings_match_the_buffered_ones(self):
+        urls = {
+            'time-slots-list': {},
+            'schedule-days-list': {'schedule_id': str(self.schedule.id)},
+            'roles-list': {'schedule_id': str(self.schedule.id)},
+        }
+        for name, params in urls.items():
+            with self.subTest(name), self.settings(STREAM_CHUNK_SIZE=3):
+                buffered = self.client.get(reverse(name), params)
+                self.assertEqual(json.loads(self.streamed(name, params)), json.loads(buffered.content))
+        
+        self.assertEqual(self.streamed('roles-list', {'schedule_id': str(self.owner.id)}), b'[]')
+    
+    def test_envelope_follows_the_streamed_list(self):
+        body = b''.join(encode_json([[1, 2], [], [3]], key='time_slots', envelope={'count': 3}))
+        self.assertEqual(json.loads(body), {'time_slots': [1, 2, 3], 'count': 3})
+        self.assertEqual(b''.join(encode_json([], key='time_slots')), b'{"time_slots":[]}')
+    
+    def test_asgi_sends_each_chunk_once_it_is_fetched(self):
+        self.add_slots(10)
+        owner = self.owner
+        
+        class OwnerAuthentication(BaseAuthentication):
+            def authenticate(self, request):
+                return owner, None
+        
+        sent = []
+        requests = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+        
+        async def receive():
+            for message in requests:
+                return message
+            # The client stays connected
+            await asyncio.Event().wait()
+        
+        async def send(message):
+            sent.append((message, len(queries.captured_queries)))
+        
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': reverse('time-slots-list'), 'query_string': b'stream=1', 'root_path': '',
+            'headers': [(b'host', b'testserver')], 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        }
+        # Like the test client, keep the test transaction's connection open, and count its queries
+        # through the wrapper itself as the connection proxy resolves to another in the event loop
+        signals.request_started.disconnect(close_old_connections)
+        signals.request_finished.disconnect(close_old_connections)
+        try:
+            with self.settings(STREAM_CHUNK_SIZE=2), warnings.catch_warnings(), \
+                    mock.patch.object(APIView, 'authentication_classes', [OwnerAuthentication]), \
+                    CaptureQueriesContext(connections['default']) as queries:
+                warnings.simplefilter('error')
+                async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            signals.request_started.connect(close_old_connections)
+            signals.request_finished.connect(close_old_connections)
+        
+        self.assertEqual(sent[0][0]['status'], 200)
+        bodies = [(message.get('body', b''), count) for message, count in sent if message['type'] == 'http.response.body']
+        self.assertEqual(len(json.loads(b''.join(body for body, _ in bodies))), len(self.slots) + 10)
+        # Parts went out while later chunks were still to be queried
+        counts = [count for body, count in bodies if body]
+        self.assertLess(counts[0], counts[-1])
+    
+    def test_memory_stays_bounded_by_the_chunk_size(self):
+        def peak(count):
+            TimeSlot.objects.filter(schedule_day__date=datetime.date(2025, 3, 3)).delete()
+            ScheduleDay.objects.filter(date=datetime.date(2025, 3, 3)).delete()
+            self.add_slots(count)
+            response = self.client.get(reverse('time-slots-list'), {'stream': '1'})
+            tracemalloc.start()
+            try:
+                size = sum(len(part) for part in response.streaming_content)
+                return tracemalloc.get_traced_memory()[1], size
+            finally:
+                tracemalloc.stop()
+        
+        with self.settings(STREAM_CHUNK_SIZE=200):
+            small_peak, small_size = peak(1000)
+            large_peak, large_size = peak(8000)
+        
+        self.assertGreater(large_size, 7 * small_size)
+        self.assertLess(large_peak, 1.5 * small_peak)
+
+class ChangeLogTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        # The fixtures never commit, their entries are never published
+        PendingChange.objects.all().delete()
+    
+    def logged(self):
+        return list(ScheduleChange.objects.order_by('seq').values_list('seq', 'kind', 'object_id', 'deleted'))
+    
+    def test_changes_and_tombstones_are_logged_in_commit_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[0].is_available = False
+            self.slots[0].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[1].participants.add(self.participants[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.participants[1].time_slots.add(self.slots[2], self.slots[3])
+        deleted_slot_id, deleted_day_id = self.slots[4].id, self.days[3].id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[4].delete()
+        # Slots deleted along with their day are covered by its tombstone
+        with self.captureOnCommitCallbacks(execute=True):
+            self.days[3].delete()
+        
+        entries = self.logged()
+        self.assertEqual([seq for seq, _, _, _ in entries], list(range(1, 7)))
+        self.assertEqual(entries[:2], [
+            (1, ChangeKinds.TIME_SLOT, self.slots[0].id, False),
+            (2, ChangeKinds.TIME_SLOT, self.slots[1].id, False),
+        ])
+        self.assertEqual({object_id for _, _, object_id, _ in entries[2:4]}, {self.slots[2].id, self.slots[3].id})
+        self.assertEqual(entries[4:], [
+            (5, ChangeKinds.TIME_SLOT, deleted_slot_id, True),
+            (6, ChangeKinds.SCHEDULE_DAY, deleted_day_id, True),
+        ])
+        self.assertEqual(ChangeLog.last_seq(), 6)
+        self.assertEqual(set(ScheduleChange.objects.values_list('schedule_id', flat=True)), {self.schedule.id})
+    
+    def test_rolled_back_changes_are_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.slots[0].save()
+                    raise ValueError
+            except ValueError:
+                pass
+        
+        self.assertEqual(self.logged(), [])
+        self.assertFalse(PendingChange.objects.exists())
+    
+    def test_entries_left_pending_by_a_failed_publish_are_repaired(self):
+        with mock.patch.object(ChangeLog, 'write', side_effect=RuntimeError('log unavailable')):
+            # The change committed, a failing publish must not surface as an error
+            with self.assertLogs('django.test', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                self.slots[0].save()
+        self.assertEqual(self.logged(), [])
+        self.assertEqual(PendingChange.objects.count(), 1)
+        
+        # Not stale yet, a publish may still be on its way
+        self.assertEqual(ChangeLog.delta([self.schedule.id], 0)['changed'][ChangeKinds.TIME_SLOT], [])
+        with self.settings(CHANGE_LOG_REPAIR_SECONDS=0):
+            delta = ChangeLog.delta([self.schedule.id], 0)
+        self.assertEqual(delta['changed'][ChangeKinds.TIME_SLOT], [self.slots[0].id])
+        self.assertEqual(self.logged(), [(1, ChangeKinds.TIME_SLOT, self.slots[0].id, False)])
+        self.assertFalse(PendingChange.objects.exists())
+    
+    def test_publish_change_log_command_publishes_stale_entries(self):
+        deleted_id = self.slots[1].id
+        with self.captureOnCommitCallbacks(execute=False):
+            self.slots[0].save()
+            self.slots[1].delete()
+        
+        out = io.StringIO()
+        call_command('publish_change_log', seconds=0, stdout=out)
+        self.assertIn('Published 2 pending change(s)', out.getvalue())
+        self.assertEqual(
+            [(kind, object_id, deleted) for _, kind, object_id, deleted in self.logged()],
+            [(ChangeKinds.TIME_SLOT, self.slots[0].id, False), (ChangeKinds.TIME_SLOT, deleted_id, True)]
+        )
+        # Publishing what was already moved is a no-op
+        self.assertEqual(ChangeLog.repair(0), 0)
+    
+    def test_bulk_writes_are_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ScheduleSolverService.auto_assign(self.schedule, time_budget=1.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            added, _ = ParticipantInvitationService.invite(
+                self.schedule, self.owner, self.role, [{'username': 'owner'}]
+            )
+        
+        kinds = {}
+        for _, kind, object_id, _ in self.logged():
+            kinds.setdefault(kind, set()).add(object_id)
+        self.assertEqual(kinds[ChangeKinds.TIME_SLOT], {slot.id for slot in self.slots})
+        self.assertEqual(kinds[ChangeKinds.PARTICIPANT], {added[0].id})
+    
+    def test_delta_reads_the_changes_of_some_schedules_after_a_sequence(self):
+        other = Schedule.objects.create(name='Other', owner=self.owner, min_days_selection=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[0].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            ScheduleDay.objects.create(schedule=other, date=datetime.date(2025, 1, 6))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[1].save()
+        deleted_id = self.slots[0].id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[0].delete()
+        
+        delta = ChangeLog.delta([self.schedule.id], 0, limit=2)
+        self.assertEqual(delta['changed'][ChangeKinds.TIME_SLOT], [deleted_id, self.slots[1].id])
+        self.assertEqual((delta['seq'], delta['has_more']), (3, True))
+        
+        delta = ChangeLog.delta([self.schedule.id], 0)
+        self.assertEqual(delta['changed'][ChangeKinds.TIME_SLOT], [self.slots[1].id])
+        self.assertEqual(delta['deleted'][ChangeKinds.TIME_SLOT], [deleted_id])
+        self.assertEqual((delta['seq'], delta['has_more']), (4, False))
+        
+        delta = ChangeLog.delta([self.schedule.id], 4)
+        self.assertEqual((delta['seq'], delta['has_more']), (4, False))
+        self.assertEqual(delta['changed'][ChangeKinds.TIME_SLOT], [])
+
+class PermutationAcceptTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.requester, self.recipient, self.third = self.participants
+        self.slots[0].participants.add(self.requester)
+        self.slots[1].participants.add(self.recipient)
+        self.permutation = PermutationRequest.objects.create(
+            requester=self.requester, recipient=self.recipient,
+            requester_slot=self.slots[0], recipient_slot=self.slots[1]
+        )
+        self.client.force_authenticate(self.recipient.user)
+    
+    def accept(self, permutation):
+        return self.client.post(reverse('permutation-requests-accept', args=[permutation.id]))
+    
+    def test_accept_swaps_participants_and_rejects_overlapping_requests(self):
+        overlapping = PermutationRequest.objects.create(
+            requester=self.third, recipient=self.recipient,
+            requester_slot=self.slots[2], recipient_slot=self.slots[1]
+        )
+        unrelated = PermutationRequest.objects.create(
+            requester=self.third, recipient=self.requester,
+            requester_slot=self.slots[2], recipient_slot=self.slots[3]
+        )
+        
+        response = self.accept(self.permutation)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.slots[0].participants.all()), [self.recipient])
+        self.assertEqual(list(self.slots[1].participants.all()), [self.requester])
+        self.assertEqual(response.data['permutation']['status'], StatusChoices.ACCEPTED)
+        self.assertEqual(
+            [participant['id'] for participant in response.data['permutation']['requester_slot']['participants']],
+            [str(self.recipient.id)]
+        )
+        overlapping.refresh_from_db()
+        unrelated.refresh_from_db()
+        self.assertEqual(overlapping.status, StatusChoices.REJECTED)
+        self.assertEqual(unrelated.status, StatusChoices.PENDING)
+        self.assertEqual(
+            Notification.objects.filter(type=NotificationTypes.PERMUTATION_RESPONSE).count(), 2
+        )
+    
+    def test_accept_twice_conflicts(self):
+        self.accept(self.permutation)
+        
+        response = self.accept(self.permutation)
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(list(self.slots[0].participants.all()), [self.recipient])
+    
+    def test_accept_query_count_does_not_grow_with_slot_participants(self):
+        with CaptureQueriesContext(connection) as small:
+            self.accept(self.permutation)
+        
+        extra = [
+            Participant.objects.create(schedule=self.schedule, user=create_user(f"extra{i}"), role=self.role)
+            for i in range(10)
+        ]
+        self.slots[4].participants.add(self.requester, *extra)
+        self.slots[5].participants.add(self.recipient, *extra[:5])
+        permutation = PermutationRequest.objects.create(
+            requester=self.requester, recipient=self.recipient,
+            requester_slot=self.slots[4], recipient_slot=self.slots[5]
+        )
+        with CaptureQueriesContext(connection) as large:
+            self.accept(permutation)
+        
+        self.assertEqual(len(small), len(large))
+        self.assertLessEqual(len(large), 25)
+
+@skipUnlessDBFeature('has_select_for_update')
+class PermutationAcceptConcurrencyTests(TransactionTestCase):
+    """
+    Parallel accepts of requests sharing the same slots must apply exactly
+    one swap
+    """
+    workers = 8
+    
+    def setUp(self):
+        owner = create_user('owner')
+        schedule = Schedule.objects.create(name='Roster', owner=owner)
+        role = Role.objects.create(schedule=schedule, name='Member')
+        day = ScheduleDay.objects.create(schedule=schedule, date=datetime.date(2025, 1, 6))
+        self.requester_slot = TimeSlot.objects.create(
+            schedule_day=day, start_time=datetime.time(8), end_time=datetime.time(12)
+        )
+        self.recipient_slot = TimeSlot.objects.create(
+            schedule_day=day, start_time=datetime.time(12), end_time=datetime.time(16)
+        )
+        self.recipient = Participant.objects.create(schedule=schedule, user=create_user('recipient'), role=role)
+        self.recipient_slot.participants.add(self.recipient)
+        
+        self.requesters = []
+        self.permutations = []
+        for i in range(self.workers):
+            requester = Participant.objects.create(schedule=schedule, user=create_user(f"requester{i}"), role=role)
+            self.requester_slot.participants.add(requester)
+            self.requesters.append(requester)
+            self.permutations.append(PermutationRequest.objects.create(
+                requester=requester, recipient=self.recipient,
+                requester_slot=self.requester_slot, recipient_slot=self.recipient_slot
+            ))
+    
+    def test_parallel_accepts_apply_a_single_swap(self):
+        barrier = threading.Barrier(self.workers)
+        results = []
+        
+        def accept(permutation):
+            try:
+                barrier.wait()
+                results.append(PermutationService.accept(permutation))
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=accept, args=(permutation,)) for permutation in self.permutations]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        accepted = [permutation for permutation, error in results if error is None]
+        self.assertEqual(len(results), self.workers)
+        self.assertEqual(len(accepted), 1)
+        self.assertEqual(
+            PermutationRequest.objects.filter(status=StatusChoices.ACCEPTED).count(), 1
+        )
+        self.assertEqual(
+            PermutationRequest.objects.filter(status=StatusChoices.REJECTED).count(), self.workers - 1
+        )
+        self.assertEqual(list(self.requester_slot.participants.all()), [self.recipient])
+        self.assertEqual(
+            set(self.recipient_slot.participants.all()), set(self.requesters)
+        )
+
+class SwapCycleTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        for participant, slot in zip(self.participants, self.slots):
+            slot.participants.add(participant)
+        # Each participant wants the slot of the next one
+        self.cycle = [
+            PermutationRequest.objects.create(
+                requester=self.participants[i], recipient=self.participants[(i + 1) % 3],
+                requester_slot=self.slots[i], recipient_slot=self.slots[(i + 1) % 3]
+            )
+            for i in range(3)
+        ]
+    
+    def test_find_cycles_returns_disjoint_shortest_cycles(self):
+        # 0 -> 1 -> 0 and 0 -> 2 -> 3 -> 0 share node 0, 4 -> 5 -> 4 is separate, 6 is a dead end
+        edges = [(0, 1), (1, 0), (0, 2), (2, 3), (3, 0), (4, 5), (5, 4), (5, 6)]
+        
+        cycles = SwapCycleService.find_cycles(7, edges)
+        
+        self.assertEqual(cycles, [[0, 1], [5, 6]])
+        self.assertEqual(SwapCycleService.find_cycles(7, edges, max_length=1), [])
+    
+    def test_swap_cycles_lists_the_cycle_with_one_query(self):
+        url = reverse('schedules-swap-cycles', args=[self.schedule.id])
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['pending'], 3)
+        self.assertEqual(len(response.data['cycles']), 1)
+        self.assertEqual(
+            response.data['cycles'][0]['requests'],
+            [str(permutation.id) for permutation in self.cycle]
+        )
+        self.assertEqual(
+            sum('schedule_permutationrequest' in query['sql'] for query in queries.captured_queries), 1
+        )
+    
+    def test_accept_swap_cycle_moves_every_participant(self):
+        stale = PermutationRequest.objects.create(
+            requester=self.participants[0], recipient=self.participants[1],
+            requester_slot=self.slots[0], recipient_slot=self.slots[1]
+        )
+        self.client.force_authenticate(self.participants[0].user)
+        
+        response = self.client.post(
+            reverse('schedules-accept-swap-cycle', args=[self.schedule.id]),
+            {'requests': [str(permutation.id) for permutation in self.cycle]},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for i in range(3):
+            self.assertEqual(list(self.slots[(i + 1) % 3].participants.all()), [self.participants[i]])
+        self.assertEqual(
+            PermutationRequest.objects.filter(status=StatusChoices.ACCEPTED).count(), 3
+        )
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, StatusChoices.REJECTED)
+    
+    def test_accept_swap_cycle_rejects_broken_cycles(self):
+        url = reverse('schedules-accept-swap-cycle', args=[self.schedule.id])
+        
+        response = self.client.post(
+            url, {'requests': [str(permutation.id) for permutation in self.cycle[:2]]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        
+        self.slots[1].participants.clear()
+        response = self.client.post(
+            url, {'requests': [str(permutation.id) for permutation in self.cycle]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            PermutationRequest.objects.filter(status=StatusChoices.PENDING).count(), 3
+        )
+    
+    def test_accept_swap_cycle_requires_permission(self):
+        outsider = Participant.objects.create(schedule=self.schedule, user=create_user('outsider'), role=self.role)
+        self.client.force_authenticate(outsider.user)
+        
+        response = self.client.post(
+            reverse('schedules-accept-swap-cycle', args=[self.schedule.id]),
+            {'requests': [str(permutation.id) for permutation in self.cycle]},
+            format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class SuggestSwapsTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        ScheduleOccupancy.clear()
+        self.schedule.min_days_selection = 1
+        self.schedule.save()
+        self.requester, self.second, self.third = self.participants
+        # Overlaps the requester's 08:00-12:00 slot on the second day
+        self.overlapping = TimeSlot.objects.create(
+            schedule_day=self.days[1], start_time=datetime.time(10), end_time=datetime.time(14)
+        )
+        self.slots[0].participants.add(self.requester)
+        self.slots[2].participants.add(self.requester)
+        self.slots[3].participants.add(self.second)
+        self.slots[4].participants.add(self.second)
+        self.slots[1].participants.add(self.third)
+        self.overlapping.participants.add(self.third)
+        self.client.force_authenticate(self.requester.user)
+    
+    def suggest(self, slot):
+        return self.client.get(reverse('time-slots-suggest-swaps', args=[slot.id]))
+    
+    def test_suggestions_are_ranked_and_skip_conflicts(self):
+        response = self.suggest(self.slots[0])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(suggestion['slot'], suggestion['recipient']) for suggestion in response.data],
+            [
+                (str(self.slots[1].id), str(self.third.id)),
+                (str(self.slots[4].id), str(self.second.id)),
+                (str(self.slots[3].id), str(self.second.id)),
+            ]
+        )
+        self.assertEqual(response.data[2]['requester_days_after'], 1)
+    
+    def test_suggestions_keep_both_sides_above_min_days(self):
+        self.schedule.min_days_selection = 2
+        self.schedule.save()
+        
+        response = self.suggest(self.slots[0])
+        
+        self.assertNotIn(str(self.slots[3].id), [suggestion['slot'] for suggestion in response.data])
+        self.assertEqual(len(response.data), 2)
+    
+    def test_only_holders_of_the_slot_get_suggestions(self):
+        response = self.suggest(self.slots[1])
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_index_follows_membership_changes_incrementally(self):
+        self.schedule.refresh_from_db()
+        index = ScheduleOccupancy.get(self.schedule)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[5].participants.add(self.third)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.time_slots.remove(self.slots[4])
+        with self.captureOnCommitCallbacks(execute=True):
+            PermutationService.accept(PermutationRequest.objects.create(
+                requester=self.requester, recipient=self.third,
+                requester_slot=self.slots[0], recipient_slot=self.slots[1]
+            ))
+        
+        self.schedule.refresh_from_db()
+        self.assertIs(ScheduleOccupancy.get(self.schedule), index)
+        self.assertEqual(index.holders[self.slots[5].id], {self.third.id})
+        self.assertEqual(index.holders[self.slots[4].id], set())
+        self.assertEqual(index.holders[self.slots[1].id], {self.requester.id})
+        self.assertEqual(index.holders[self.slots[0].id], {self.third.id})
+        self.assertEqual(len(index.day_counts[self.second.id]), 1)
+    
+    def test_index_is_rebuilt_after_bulk_writes(self):
+        self.schedule.refresh_from_db()
+        index = ScheduleOccupancy.get(self.schedule)
+        
+        through = TimeSlot.participants.through
+        through.objects.create(timeslot=self.slots[6], participant=self.third)
+        ScheduleCache.bump_version(schedule_id=self.schedule.id)
+        self.schedule.refresh_from_db()
+        
+        rebuilt = ScheduleOccupancy.get(self.schedule)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.holders[self.slots[6].id], {self.third.id})
+
+class ScheduleCompletionTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.schedule.min_days_selection = 2
+        self.schedule.save()
+    
+    def counters(self):
+        return [
+            participant.selected_days
+            for participant in Participant.objects.filter(pk__in=[p.pk for p in self.participants])
+            .order_by('user__username')
+        ]
+    
+    def assign_minimum(self):
+        for i, participant in enumerate(self.participants):
+            participant.time_slots.add(self.slots[2 * i], self.slots[2 * i + 2])
+    
+    def test_counters_follow_membership_changes(self):
+        first, second, _ = self.participants
+        
+        self.slots[0].participants.add(first, second)
+        # Same day as slots[0], the day is only counted once
+        self.slots[1].participants.add(first)
+        second.time_slots.add(self.slots[2], self.slots[4])
+        self.assertEqual(self.counters(), [1, 3, 0])
+        
+        self.slots[0].participants.remove(second)
+        first.time_slots.remove(self.slots[1])
+        self.assertEqual(self.counters(), [1, 2, 0])
+        
+        self.slots[0].participants.clear()
+        second.time_slots.clear()
+        self.assertEqual(self.counters(), [0, 0, 0])
+    
+    def test_counters_follow_swaps_and_slot_deletion(self):
+        first, second, _ = self.participants
+        self.slots[0].participants.add(first)
+        self.slots[7].participants.add(second)
+        self.slots[2].participants.add(first)
+        
+        PermutationService.accept(PermutationRequest.objects.create(
+            requester=first, recipient=second,
+            requester_slot=self.slots[0], recipient_slot=self.slots[7]
+        ))
+        self.assertEqual(self.counters(), [2, 1, 0])
+        
+        self.days[3].delete()
+        self.assertEqual(self.counters(), [1, 1, 0])
+    
+    def test_schedule_completes_automatically(self):
+        self.assign_minimum()
+        self.schedule.refresh_from_db()
+        self.assertTrue(self.schedule.is_complete)
+        
+        self.participants[2].time_slots.clear()
+        self.schedule.refresh_from_db()
+        self.assertFalse(self.schedule.is_complete)
+        
+        self.assign_minimum()
+        Participant.objects.create(schedule=self.schedule, user=create_user('late'), role=self.role)
+        self.schedule.refresh_from_db()
+        self.assertFalse(self.schedule.is_complete)
+    
+    def test_raising_the_minimum_reopens_the_schedule(self):
+        self.assign_minimum()
+        
+        self.schedule.refresh_from_db()
+        self.schedule.min_days_selection = 3
+        self.schedule.save()
+        
+        self.schedule.refresh_from_db()
+        self.assertFalse(self.schedule.is_complete)
+    
+    def test_validate_uses_one_query_for_every_participant(self):
+        Participant.objects.bulk_create([
+            Participant(schedule=self.schedule, user=create_user(f"bulk{i}"), role=self.role)
+            for i in range(50)
+        ])
+        self.assign_minimum()
+        
+        with self.assertNumQueries(1):
+            is_valid, unmet = ScheduleValidationService.validate(self.schedule)
+        with self.assertNumQueries(1):
+            complete = ScheduleValidationService.is_complete(self.schedule)
+        
+        self.assertFalse(is_valid)
+        self.assertFalse(complete)
+        self.assertEqual(len(unmet), 50)
+        self.assertEqual(unmet[0]['min_days'], 2)
+    
+    def test_mark_complete_validates(self):
+        url = reverse('schedules-mark-complete', args=[self.schedule.id])
+        
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['unmet']), 3)
+        
+        self.assign_minimum()
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.schedule.refresh_from_db()
+        self.assertTrue(self.schedule.is_complete)
+
+class ParticipantCounterTests(ScheduleTestCase):
+    def counts(self):
+        return tuple(
+            Schedule.objects.filter(pk=self.schedule.pk)
+            .values_list('participant_count', 'accepted_participant_count').get()
+        )
+    
+    def test_counters_follow_participant_rows(self):
+        self.assertEqual(self.counts(), (3, 0))
+        self.assertEqual(self.schedule.participant_count, 3)
+        
+        accepted = Participant.objects.create(
+            schedule=self.schedule, user=create_user('accepted'), role=self.role, invitation_accepted=True
+        )
+        self.assertEqual(self.counts(), (4, 1))
+        
+        accepted.invitation_accepted = False
+        accepted.save()
+        self.assertEqual(self.counts(), (4, 0))
+        
+        self.participants[0].delete()
+        self.assertEqual(self.counts(), (3, 0))
+        
+        self.role.delete()
+        self.assertEqual(self.counts(), (0, 0))
+    
+    def test_bulk_invitations_are_counted(self):
+        users = [create_user(f"invitee{i}") for i in range(5)]
+        
+        ParticipantInvitationService.invite(
+            self.schedule, self.owner, self.role, [{'email': user.email} for user in users]
+        )
+        
+        self.assertEqual(self.counts(), (8, 0))
+    
+    def test_saving_a_stale_schedule_keeps_the_counters(self):
+        stale = Schedule.objects.get(pk=self.schedule.pk)
+        Participant.objects.create(schedule=self.schedule, user=create_user('late'), role=self.role)
+        
+        stale.name = 'Renamed'
+        stale.save()
+        
+        self.assertEqual(self.counts(), (4, 0))
+    
+    def test_min_days_use_the_cached_count(self):
+        schedule = Schedule.objects.get(pk=self.schedule.pk)
+        
+        with self.assertNumQueries(0):
+            min_days = [schedule.get_min_days_for_user(p.user_id) for p in self.participants]
+        
+        self.assertEqual(min_days, [1, 1, 1])
+    
+    def test_reconcile_repairs_drift(self):
+        Schedule.objects.filter(pk=self.schedule.pk).update(participant_count=10, accepted_participant_count=2)
+        out = io.StringIO()
+        
+        call_command('reconcile_schedule_counters', stdout=out)
+        
+        self.assertEqual(self.counts(), (3, 0))
+        self.assertIn('participants 10 -> 3', out.getvalue())
+        self.assertEqual(ScheduleCounterService.reconcile(), [])
+
+class IntervalIndexTests(TestCase):
+    def setUp(self):
+        self.date = datetime.date(2025, 1, 6)
+        self.index = IntervalIndex()
+        self.index.add('a', self.date, datetime.time(8), datetime.time(12))
+        self.index.add('b', self.date, datetime.time(13), datetime.time(15))
+        self.index.add('c', self.date, datetime.time(11), datetime.time(14))
+        self.index.add('night', self.date, datetime.time(22), datetime.time(0))
+    
+    def test_overlapping(self):
+        index, date = self.index, self.date
+        
+        self.assertEqual(sorted(index.overlapping(date, datetime.time(9), datetime.time(10))), ['a'])
+        self.assertEqual(sorted(index.overlapping(date, datetime.time(11, 30), datetime.time(13, 30))), ['a', 'b', 'c'])
+        self.assertEqual(index.overlapping(date, datetime.time(16), datetime.time(18)), [])
+        self.assertEqual(index.overlapping(date, datetime.time(23), datetime.time(23, 30)), ['night'])
+        self.assertEqual(index.overlapping(date + datetime.timedelta(days=1), datetime.time(8), datetime.time(12)), [])
+        # Touching intervals do not overlap
+        self.assertEqual(index.overlapping(date, datetime.time(15), datetime.time(16)), [])
+        self.assertEqual(sorted(index.overlapping(date, datetime.time(8), datetime.time(12), exclude={'a'})), ['c'])
+    
+    def test_conflicts_and_remove(self):
+        self.assertEqual(
+            sorted(self.index.conflicts()), [('a', 'c', self.date), ('c', 'b', self.date)]
+        )
+        
+        self.index.remove('c')
+        
+        self.assertEqual(self.index.conflicts(), [])
+        self.assertEqual(self.index.overlapping(self.date, datetime.time(12), datetime.time(13)), [])
+        self.assertEqual(len(self.index), 3)
+
+class UserIntervalsTests(ScheduleTestCase):
+    def setUp(self):
+        super().setUp()
+        UserIntervals.clear()
+        self.member = self.participants[0]
+        # Never complete, so membership changes bump its version only once
+        self.other_schedule = Schedule.objects.create(
+            name='Other', owner=self.owner, duration=1, min_days_selection=2
+        )
+        other_role = Role.objects.create(schedule=self.other_schedule, name='Member')
+        self.other_member = Participant.objects.create(
+            schedule=self.other_schedule, user=self.member.user, role=other_role
+        )
+        other_day = ScheduleDay.objects.create(schedule=self.other_schedule, date=self.days[0].date)
+        # Overlaps the 08:00-12:00 slot of the first day only
+        self.other_slot = TimeSlot.objects.create(
+            schedule_day=other_day, start_time=datetime.time(9), end_time=datetime.time(11)
+        )
+        self.other_slot.participants.add(self.other_member)
+    
+    def test_conflicts_endpoint_lists_overlaps_across_schedules(self):
+        self.slots[0].participants.add(self.member)
+        self.slots[1].participants.add(self.member)
+        self.client.force_authenticate(self.member.user)
+        
+        response = self.client.get(reverse('users-me-conflicts'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['date'], self.days[0].date.isoformat())
+        self.assertEqual(
+            {(slot['slot'], slot['schedule']) for slot in response.data[0]['slots']},
+            {
+                (str(self.slots[0].id), str(self.schedule.id)),
+                (str(self.other_slot.id), str(self.other_schedule.id)),
+            }
+        )
+    
+    def test_index_follows_membership_changes_incrementally(self):
+        index = UserIntervals.get(self.member.user_id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[2].participants.add(self.member)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.time_slots.add(self.slots[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_member.time_slots.remove(self.other_slot)
+        
+        self.assertIs(UserIntervals.get(self.member.user_id), index)
+        self.assertEqual(set(index.intervals), {self.slots[0].id, self.slots[2].id})
+        
+        # A write this process did not record makes the index stale
+        TimeSlot.participants.through.objects.create(timeslot=self.slots[4], participant=self.member)
+        ScheduleCache.bump_version(schedule_id=self.schedule.id)
+        
+        rebuilt = UserIntervals.get(self.member.user_id)
+        self.assertIsNot(rebuilt, index)
+        self.assertIn(self.slots[4].id, rebuilt.intervals)
+    
+    def test_indexes_of_many_users_are_checked_together(self):
+        users = [participant.user_id for participant in self.participants]
+        
+        with self.assertNumQueries(2):
+            indexes = UserIntervals.get_many(users)
+        with self.assertNumQueries(1):
+            self.assertEqual(UserIntervals.get_many(users), indexes)
+        self.assertIs(UserIntervals.get(self.member.user_id), indexes[self.member.user_id])
+        self.assertEqual(set(indexes[self.member.user_id].intervals), {self.other_slot.id})
+    
+    def test_auto_assign_skips_slots_overlapping_other_schedules(self):
+        ScheduleSolverService.auto_assign(self.schedule)
+        
+        self.assertEqual(self.slots[0].participants.count(), 1)
+        self.assertFalse(self.slots[0].participants.filter(pk=self.member.pk).exists())
+    
+    def test_indexes_read_by_auto_assign_follow_its_assignments(self):
+        UserIntervals.get(self.member.user_id)
+        
+        ScheduleSolverService.auto_assign(self.schedule)
+        
+        # The bulk insert bumps the schedule version, the next read rebuilds
+        self.assertEqual(
+            set(UserIntervals.get(self.member.user_id).intervals) - {self.other_slot.id},
+            set(self.member.time_slots.values_list('id', flat=True))
+        )
+    
+    def test_swap_into_an_overlapping_slot_is_rejected(self):
+        recipient = self.participants[1]
+        self.slots[1].participants.add(self.member)
+        self.slots[0].participants.add(recipient)
+        permutation = PermutationRequest.objects.create(
+            requester=self.member, recipient=recipient,
+            requester_slot=self.slots[1], recipient_slot=self.slots[0]
+        )
+        
+        accepted, error = PermutationService.accept(permutation)
+        
+        self.assertIsNone(accepted)
+        self.assertIn(self.member.user.username, error)
+        self.assertEqual(list(self.slots[0].participants.all()), [recipient])
+        permutation.refresh_from_db()
+        self.assertEqual(permutation.status, StatusChoices.PENDING)
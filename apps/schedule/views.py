@@ -1,7 +1,12 @@
 # apps/schedule/views.py
+import math
+import uuid
+
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Q
-from rest_framework import viewsets, permissions, status
+from django.utils.dateparse import parse_date
+from rest_framework import viewsets, permissions, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
@@ -11,6 +16,26 @@ from apps.schedule.serializers import (
     ScheduleSerializer, RoleSerializer, ParticipantSerializer,
     ScheduleDaySerializer, TimeSlotSerializer, PermutationRequestSerializer
 )
+from apps.schedule.cache import ScheduleCache
+from apps.schedule.occupancy import ScheduleOccupancy
+from apps.schedule.pagination import (
+    PermutationRequestPagination, ScheduleDayPagination, TimeSlotPagination
+)
+from apps.schedule.fieldsets import ValuesListMixin, parse_names
+from apps.schedule.membership import ScheduleMembership
+from apps.schedule.permissions import (
+    CanEditSchedule, CanEditScheduleOrReadOnly, CanInviteUsers, IsPermutationRecipient, IsScheduleMember,
+    IsScheduleOwner, ScheduleAccess
+)
+from apps.schedule.renderers import (
+    NEGOTIATED_PARSERS, NEGOTIATED_RENDERERS, FastJSONRenderer, MessagePackRenderer
+)
+from apps.schedule.streaming import StreamingListMixin, wants_stream
+from apps.schedule.services import (
+    ParticipantInvitationService, PermutationService, ScheduleCloneService, ScheduleGridService,
+    ScheduleHeatmapService, ScheduleMaterializationService, ScheduleSolverService,
+    ScheduleValidationService, SwapCycleService
+)
 from apps.notification.services import NotificationService
 
 class SchedulePagination(PageNumberPagination):
@@ -18,7 +43,7 @@ class SchedulePagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+class ScheduleViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint for Schedule operations
     """
@@ -31,40 +56,46 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         """
         Returns schedules where the user is either owner or participant
         """
-        user = self.request.user
-        return Schedule.objects.filter(
-            Q(owner=user) | Q(participants__user=user)
-        ).distinct()
+        queryset = Schedule.objects.filter(pk__in=ScheduleMembership.schedule_ids(self.request.user))
+        return ScheduleSerializer.setup_eager_loading(queryset)
     
+    def get_permissions(self):
+        """
+        Members read the schedule, roles that can edit it update it and
+        only the owner deletes it
+        """
+        if self.action in ('update', 'partial_update'):
+            return [permissions.IsAuthenticated(), CanEditSchedule()]
+        if self.action == 'destroy':
+            return [permissions.IsAuthenticated(), IsScheduleOwner()]
+        return super().get_permissions()
+    
+    @transaction.atomic
     def perform_create(self, serializer):
         """
         Set the owner to the current authenticated user when creating a schedule
+        and generate its days and time slots
+        """
+        schedule = serializer.save(owner=self.request.user)
+        ScheduleMaterializationService.materialize(schedule)
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        """
+        Add the missing days when the duration of a schedule is extended
         """
-        serializer.save(owner=self.request.user)
+        previous_duration = serializer.instance.duration
+        schedule = serializer.save()
+        if schedule.duration > previous_duration:
+            ScheduleMaterializationService.materialize(schedule, incremental=True)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, CanInviteUsers])
     def add_participants(self, request, pk=None):
         """
         Add participants to the schedule
         """
         schedule = self.get_object()
         
-        if schedule.owner != request.user:
-            # Check if user has permission to invite users
-            try:
-                participant = Participant.objects.get(schedule=schedule, user=request.user)
-                role = participant.role
-                if not role.can_invate_users:
-                    return Response(
-                        {"detail": "You don't have permission to add participants"},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except Participant.DoesNotExist:
-                return Response(
-                    {"detail": "You don't have permission to add participants"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        
         # Process participants
         users_data = request.data.get('participants', [])
         role_id = request.data.get('role_id')
@@ -77,126 +108,422 @@ class ScheduleViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        created_participants = []
-        errors = []
-        
-        for user_data in users_data:
-            email = user_data.get('email')
-            username = user_data.get('username')
-            
-            try:
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                
-                if email:
-                    user = User.objects.get(email=email)
-                elif username:
-                    user = User.objects.get(username=username)
-                else:
-                    errors.append({"detail": "Either email or username is required"})
-                    continue
-                
-                # Check if participant already exists
-                if Participant.objects.filter(schedule=schedule, user=user).exists():
-                    errors.append({
-                        "detail": f"User {user.username} is already a participant"
-                    })
-                    continue
-                
-                # Create participant
-                participant = Participant.objects.create(
-                    schedule=schedule,
-                    user=user,
-                    role=role
-                )
-                
-                # Send notification to user
-                NotificationService.send_schedule_invitation(
-                    user, schedule, request.user, role
-                )
-                
-                created_participants.append(ParticipantSerializer(participant).data)
-                
-            except User.DoesNotExist:
-                errors.append({
-                    "detail": f"User with {'email ' + email if email else 'username ' + username} not found"
-                })
-            except Exception as e:
-                errors.append({"detail": str(e)})
+        created_participants, errors = ParticipantInvitationService.invite(
+            schedule, request.user, role, users_data
+        )
         
         return Response({
-            "created": created_participants,
+            "created": ParticipantSerializer(created_participants, many=True).data,
             "errors": errors
         })
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, CanEditSchedule])
     def mark_complete(self, request, pk=None):
         """
-        Mark schedule as complete when all participants have set their availability
+        Mark schedule as complete when all participants have selected their
+        minimum number of days
         """
         schedule = self.get_object()
-        schedule.is_complete = True
-        schedule.save(update_fields=['is_complete'])
+        is_valid, unmet = ScheduleValidationService.validate(schedule)
+        if not is_valid:
+            return Response(
+                {"detail": "Some participants have not selected their minimum days", "unmet": unmet},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # The aggregate is authoritative, resync the counters if they drifted
+        if not schedule.is_complete:
+            ScheduleValidationService.refresh(schedule_id=schedule.id)
         return Response({"detail": "Schedule marked as complete"})
 
-class RoleViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, CanEditSchedule])
+    def auto_assign(self, request, pk=None):
+        """
+        Automatically assign participants to the schedule's time slots
+        
+        Expected payload (all optional):
+        {
+            "time_budget": 5.0,
+            "slot_capacity": 1,
+            "replace": false
+        }
+        
+        time_budget is capped at ScheduleSolverService.MAX_TIME_BUDGET seconds.
+        """
+        schedule = self.get_object()
+        
+        try:
+            time_budget = float(request.data.get('time_budget', ScheduleSolverService.DEFAULT_TIME_BUDGET))
+            slot_capacity = int(request.data.get('slot_capacity', 1))
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "time_budget and slot_capacity must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            replace = serializers.BooleanField().to_internal_value(request.data.get('replace', False))
+        except serializers.ValidationError:
+            return Response({"detail": "replace must be a boolean"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # float() accepts "nan" and "inf"
+        if not math.isfinite(time_budget) or time_budget <= 0 or slot_capacity < 1:
+            return Response(
+                {"detail": "time_budget must be a positive number and slot_capacity at least 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        time_budget = min(time_budget, ScheduleSolverService.MAX_TIME_BUDGET)
+        
+        try:
+            result = ScheduleSolverService.auto_assign(
+                schedule,
+                slot_capacity=slot_capacity,
+                time_budget=time_budget,
+                replace=replace
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsScheduleOwner])
+    def materialize(self, request, pk=None):
+        """
+        Generate the schedule's days and time slots from duration and available_days
+        
+        Expected payload (all optional):
+        {
+            "start_date": "2025-01-01",
+            "incremental": true
+        }
+        """
+        schedule = self.get_object()
+        
+        start_date = request.data.get('start_date')
+        if start_date:
+            try:
+                # Well formed but impossible dates such as 2025-02-30 raise
+                start_date = parse_date(str(start_date))
+            except (TypeError, ValueError):
+                start_date = None
+            if start_date is None:
+                return Response(
+                    {"detail": "start_date must be formatted as YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        try:
+            incremental = serializers.BooleanField().to_internal_value(request.data.get('incremental', True))
+        except serializers.ValidationError:
+            return Response({"detail": "incremental must be a boolean"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = ScheduleMaterializationService.materialize(
+                schedule,
+                start_date=start_date or None,
+                incremental=incremental
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, CanEditSchedule])
+    def clone(self, request, pk=None):
+        """
+        Copy the schedule into a new one owned by the current user
+        
+        Expected payload (all optional):
+        {
+            "name": "March roster",
+            "date_offset": 28,
+            "start_date": "2025-03-01",
+            "include_participants": true,
+            "include_assignments": false
+        }
+        start_date, when given, sets the offset from the first day of the schedule.
+        """
+        schedule = self.get_object()
+        
+        try:
+            date_offset = int(request.data.get('date_offset', 0))
+        except (TypeError, ValueError):
+            return Response({"detail": "date_offset must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        start_date = request.data.get('start_date')
+        if start_date:
+            try:
+                start_date = parse_date(str(start_date))
+            except (TypeError, ValueError):
+                start_date = None
+            if start_date is None:
+                return Response(
+                    {"detail": "start_date must be formatted as YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            first_date = schedule.days.order_by('date').values_list('date', flat=True).first()
+            date_offset = (start_date - first_date).days if first_date else 0
+        
+        flags = {}
+        for flag, default in (('include_participants', True), ('include_assignments', False)):
+            try:
+                flags[flag] = serializers.BooleanField().to_internal_value(request.data.get(flag, default))
+            except serializers.ValidationError:
+                return Response({"detail": f"{flag} must be a boolean"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = ScheduleCloneService.clone(
+                schedule, request.user,
+                name=request.data.get('name'),
+                date_offset=date_offset,
+                **flags
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except OverflowError:
+            return Response(
+                {"detail": "date_offset moves the days out of the supported date range"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(result, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'], renderer_classes=[FastJSONRenderer, MessagePackRenderer])
+    def grid(self, request, pk=None):
+        """
+        Compact grid of the schedule: day and time window indexes, a
+        participant dictionary and per-participant assignment bitsets.
+        Send "Accept: application/msgpack" or ?format=msgpack for MessagePack.
+        """
+        schedule = self.get_object()
+        binary = request.accepted_renderer.format == MessagePackRenderer.format
+        grid = ScheduleCache.get_or_build(
+            schedule.id, schedule.version, f"grid:{request.accepted_renderer.format}",
+            lambda: ScheduleGridService.build(schedule, binary=binary)
+        )
+        return Response(grid)
+
+    @action(detail=True, methods=['get'])
+    def heatmap(self, request, pk=None):
+        """
+        Coverage of the schedule: participants per slot as a day x time
+        window matrix, load of each participant and totals per weekday
+        """
+        schedule = self.get_object()
+        heatmap = ScheduleCache.get_or_build(
+            schedule.id, schedule.version, "heatmap",
+            lambda: ScheduleHeatmapService.build(schedule)
+        )
+        return Response(heatmap)
+    
+    @action(detail=True, methods=['get'])
+    def swap_cycles(self, request, pk=None):
+        """
+        Disjoint k-way swaps formed by the schedule's pending permutation requests
+        
+        Query parameters (optional):
+            max_length: Longest cycle to look for (2 to 10, default 6)
+        """
+        schedule = self.get_object()
+        
+        try:
+            max_length = int(request.query_params.get('max_length', SwapCycleService.MAX_CYCLE_LENGTH))
+        except ValueError:
+            return Response({"detail": "max_length must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 2 <= max_length <= 10:
+            return Response(
+                {"detail": "max_length must be between 2 and 10"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(SwapCycleService.find(schedule, max_length=max_length))
+    
+    @action(detail=True, methods=['post'], url_path='swap_cycles/accept')
+    def accept_swap_cycle(self, request, pk=None):
+        """
+        Apply a swap cycle returned by swap_cycles
+        
+        Expected payload:
+        {
+            "requests": ["permutation_request_id", ...]
+        }
+        
+        Allowed for the owner, roles that can edit the schedule and the
+        participants moved by the cycle.
+        """
+        schedule = self.get_object()
+        try:
+            request_ids = [uuid.UUID(str(request_id)) for request_id in request.data.get('requests')]
+        except (TypeError, ValueError):
+            request_ids = None
+        if not request_ids:
+            return Response(
+                {"detail": "requests must be a list of permutation request ids"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        access = ScheduleAccess.get(request, schedule)
+        if not access.can_edit:
+            allowed = access.is_participant and PermutationRequest.objects.filter(
+                id__in=request_ids, requester_id=access.participant_id
+            ).exists()
+            if not allowed:
+                return Response(
+                    {"detail": "You don't have permission to accept this swap cycle"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        cycle, error = SwapCycleService.accept(schedule, request_ids)
+        if error:
+            return Response({"detail": error}, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            "detail": "Swap cycle accepted",
+            "permutations": PermutationRequestSerializer(cycle, many=True).data
+        })
+
+class RoleViewSet(StreamingListMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint for Role operations
     """
     serializer_class = RoleSerializer
-    # Fix: Change from class to list
-    permission_classes = [permissions.IsAuthenticated]
+    # Roles are read by members and managed by roles that can edit the schedule
+    permission_classes = [permissions.IsAuthenticated, CanEditScheduleOrReadOnly]
     
     def get_queryset(self):
         schedule_id = self.request.query_params.get('schedule_id')
         if schedule_id:
-            return Role.objects.filter(schedule_id=schedule_id)
-        return Role.objects.filter(schedule__owner=self.request.user)
+            queryset = Role.objects.filter(
+                schedule_id=schedule_id, schedule_id__in=ScheduleMembership.schedule_ids(self.request.user)
+            )
+        else:
+            queryset = Role.objects.filter(schedule__owner=self.request.user)
+        return queryset.select_related('schedule')
     
     def perform_create(self, serializer):
-        schedule_id = self.request.data.get('schedule_id')
-        schedule = get_object_or_404(Schedule, id=schedule_id, owner=self.request.user)
+        schedule = get_object_or_404(Schedule, id=self.request.data.get('schedule_id'))
+        self.check_object_permissions(self.request, schedule)
         serializer.save(schedule=schedule)
 
-class ScheduleDayViewSet(viewsets.ModelViewSet):
+class ScheduleDayViewSet(StreamingListMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint for ScheduleDay operations
     """
     serializer_class = ScheduleDaySerializer
-    # Fix: Change from class to list
-    permission_classes = [permissions.IsAuthenticated]
+    # Days are read by members and managed by roles that can edit the schedule
+    permission_classes = [permissions.IsAuthenticated, CanEditScheduleOrReadOnly]
+    pagination_class = ScheduleDayPagination
+    renderer_classes = NEGOTIATED_RENDERERS
+    parser_classes = NEGOTIATED_PARSERS
     
     def get_queryset(self):
+        queryset = ScheduleDay.objects.filter(schedule_id__in=ScheduleMembership.schedule_ids(self.request.user))
         schedule_id = self.request.query_params.get('schedule_id')
         if schedule_id:
-            return ScheduleDay.objects.filter(schedule_id=schedule_id)
-        return ScheduleDay.objects.filter(
-            schedule__participants__user=self.request.user
-        ).distinct()
+            queryset = queryset.filter(schedule_id=schedule_id)
+        if self.detail:
+            queryset = queryset.select_related('schedule')
+        return ScheduleDaySerializer.setup_eager_loading(queryset)
+    
+    def perform_create(self, serializer):
+        schedule = get_object_or_404(Schedule, id=self.request.data.get('schedule_id'))
+        self.check_object_permissions(self.request, schedule)
+        serializer.save(schedule=schedule)
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Unpaginated days of a single schedule are served from the versioned
+        read cache, unless streamed
+        """
+        schedule_id = request.query_params.get('schedule_id')
+        version = None
+        if schedule_id:
+            version = Schedule.objects.filter(
+                pk=schedule_id, pk__in=ScheduleMembership.schedule_ids(request.user)
+            ).values_list('version', flat=True).first()
+        if version is None or self.paginator.is_requested(request) or wants_stream(request):
+            return super().list(request, *args, **kwargs)
+        
+        # Sparse responses are cached apart from the full one
+        sparse = [
+            f"{param}={','.join(sorted(parse_names(request.query_params.get(param))))}"
+            for param in ('fields', 'expand') if request.query_params.get(param)
+        ]
+        data = ScheduleCache.get_or_build(
+            schedule_id, version, ':'.join(['days', *sparse]),
+            lambda: super(ScheduleDayViewSet, self).list(request, *args, **kwargs).data
+        )
+        return Response(data)
 
-class TimeSlotViewSet(viewsets.ModelViewSet):
+class TimeSlotViewSet(StreamingListMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint for TimeSlot operations
+    
+    Listings paginated with cursor or page_size come ordered by day date,
+    start time and id.
     """
     serializer_class = TimeSlotSerializer
-    # Fix: Change from class to list
-    permission_classes = [permissions.IsAuthenticated]
+    # Slots are read by members and managed by roles that can edit the schedule
+    permission_classes = [permissions.IsAuthenticated, CanEditScheduleOrReadOnly]
+    pagination_class = TimeSlotPagination
+    renderer_classes = NEGOTIATED_RENDERERS
+    parser_classes = NEGOTIATED_PARSERS
     
     def get_queryset(self):
+        queryset = TimeSlot.objects.filter(
+            schedule_day__schedule_id__in=ScheduleMembership.schedule_ids(self.request.user)
+        )
         schedule_day_id = self.request.query_params.get('schedule_day_id')
         if schedule_day_id:
-            return TimeSlot.objects.filter(schedule_day_id=schedule_day_id)
-        return TimeSlot.objects.filter(
-            schedule_day__schedule__participants__user=self.request.user
-        ).distinct()
+            queryset = queryset.filter(schedule_day_id=schedule_day_id)
+        if self.detail:
+            queryset = queryset.select_related('schedule_day__schedule')
+        return TimeSlotSerializer.setup_eager_loading(queryset)
+    
+    def perform_create(self, serializer):
+        schedule_day = get_object_or_404(
+            ScheduleDay.objects.select_related('schedule'), id=self.request.data.get('schedule_day_id')
+        )
+        self.check_object_permissions(self.request, schedule_day)
+        serializer.save(schedule_day=schedule_day)
     
     def perform_update(self, serializer):
         """Add sync status for offline data handling"""
         serializer.save(sync_status='modified')
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['get'])
+    def suggest_swaps(self, request, pk=None):
+        """
+        Ranked slots of the same schedule the current user could swap this
+        time slot for, with the participant holding each of them
+        
+        Query parameters (optional):
+            limit: Number of suggestions (1 to 100, default 20)
+        """
+        time_slot = self.get_object()
+        schedule = time_slot.schedule_day.schedule
+        
+        participant_id = Participant.objects.filter(
+            schedule=schedule, user=request.user, time_slots=time_slot
+        ).values_list('id', flat=True).first()
+        if participant_id is None:
+            return Response(
+                {"detail": "You are not assigned to this time slot"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({"detail": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= 100:
+            return Response({"detail": "limit must be between 1 and 100"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(ScheduleOccupancy.suggest(schedule, time_slot.id, participant_id, limit=limit))
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsScheduleMember])
     def set_alarm(self, request, pk=None):
-        """Set alarm for a time slot"""
+        """Set alarm for a time slot, allowed to every member of its schedule"""
         time_slot = self.get_object()
         alarm_times = request.data.get('alarm_times', [])
         
@@ -239,19 +566,23 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
             "created_alarms": created_alarms
         })
 
-class PermutationRequestViewSet(viewsets.ModelViewSet):
+class PermutationRequestViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint for handling permutation requests
     """
     serializer_class = PermutationRequestSerializer
     # Fix: Change from class to list
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PermutationRequestPagination
     
     def get_queryset(self):
         user = self.request.user
-        return PermutationRequest.objects.filter(
+        queryset = PermutationRequest.objects.filter(
             Q(requester__user=user) | Q(recipient__user=user)
         )
+        if self.detail:
+            queryset = queryset.select_related('recipient__schedule')
+        return PermutationRequestSerializer.setup_eager_loading(queryset)
     
     def create(self, request, *args, **kwargs):
         requester_slot_id = request.data.get('requester_slot_id')
@@ -259,111 +590,73 @@ class PermutationRequestViewSet(viewsets.ModelViewSet):
         message = request.data.get('message', '')
         
         # Get time slots
-        requester_slot = get_object_or_404(TimeSlot, id=requester_slot_id)
+        requester_slot = get_object_or_404(
+            TimeSlot.objects.select_related('schedule_day__schedule'), id=requester_slot_id
+        )
         recipient_slot = get_object_or_404(TimeSlot, id=recipient_slot_id)
         
-        # Get participants
-        try:
-            requester = Participant.objects.get(
-                schedule=requester_slot.schedule_day.schedule,
-                user=request.user
-            )
-            
-            # Find recipient based on the participants in the recipient slot
-            recipient = recipient_slot.participants.first()
-            
-            if not recipient:
-                return Response(
-                    {"detail": "Recipient time slot has no assigned participants"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-            # Check if requester role allows permutation requests
-            if not requester.role.can_request_permutations:
-                return Response(
-                    {"detail": "Your role does not allow permutation requests"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Create permutation request
-            permutation = PermutationRequest.objects.create(
-                requester=requester,
-                recipient=recipient,
-                requester_slot=requester_slot,
-                recipient_slot=recipient_slot,
-                message=message,
-                status='Pending'
-            )
-            
-            # Send notification to recipient
-            NotificationService.send_permutation_request(
-                recipient.user, permutation
-            )
-            
-            return Response(
-                PermutationRequestSerializer(permutation).data,
-                status=status.HTTP_201_CREATED
-            )
-            
-        except Participant.DoesNotExist:
+        access = ScheduleAccess.get(request, requester_slot.schedule_day.schedule)
+        if not access.is_participant:
             return Response(
                 {"detail": "You must be a participant in this schedule"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-    
-    @action(detail=True, methods=['post'])
-    def accept(self, request, pk=None):
-        """Accept a permutation request"""
-        permutation = self.get_object()
         
-        # Verify that the current user is the recipient
-        if permutation.recipient.user != request.user:
+        # Find recipient based on the participants in the recipient slot
+        recipient = recipient_slot.participants.select_related('user').first()
+        
+        if not recipient:
+            return Response(
+                {"detail": "Recipient time slot has no assigned participants"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+            
+        # Check if requester role allows permutation requests
+        if not access.can_request:
             return Response(
-                {"detail": "Only the recipient can accept the permutation"},
+                {"detail": "Your role does not allow permutation requests"},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Update status
-        permutation.status = 'Accepted'
-        permutation.save(update_fields=['status'])
-        
-        # Swap participants in time slots
-        requester_participants = list(permutation.requester_slot.participants.all())
-        recipient_participants = list(permutation.recipient_slot.participants.all())
-        
-        # Clear participants
-        permutation.requester_slot.participants.clear()
-        permutation.recipient_slot.participants.clear()
-        
-        # Swap participants
-        for participant in requester_participants:
-            permutation.recipient_slot.participants.add(participant)
+        # Create permutation request
+        permutation = PermutationRequest.objects.create(
+            requester_id=access.participant_id,
+            recipient=recipient,
+            requester_slot=requester_slot,
+            recipient_slot=recipient_slot,
+            message=message,
+            status='Pending'
+        )
         
-        for participant in recipient_participants:
-            permutation.requester_slot.participants.add(participant)
+        # Send notification to recipient
+        NotificationService.send_permutation_request(
+            recipient.user, permutation
+        )
         
-        # Send notification to requester
-        NotificationService.send_permutation_response(
-            permutation.requester.user, permutation, accepted=True
+        return Response(
+            PermutationRequestSerializer(permutation).data,
+            status=status.HTTP_201_CREATED
         )
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsPermutationRecipient])
+    def accept(self, request, pk=None):
+        """Accept a permutation request"""
+        permutation = self.get_object()
+        
+        permutation, error = PermutationService.accept(permutation)
+        if error:
+            return Response({"detail": error}, status=status.HTTP_409_CONFLICT)
         
         return Response({
             "detail": "Permutation accepted successfully",
             "permutation": PermutationRequestSerializer(permutation).data
         })
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsPermutationRecipient])
     def reject(self, request, pk=None):
         """Reject a permutation request"""
         permutation = self.get_object()
         
-        # Verify that the current user is the recipient
-        if permutation.recipient.user != request.user:
-            return Response(
-                {"detail": "Only the recipient can reject the permutation"},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         # Update status
         permutation.status = 'Rejected'
         permutation.save(update_fields=['status'])
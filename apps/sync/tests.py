@@ -1,3 +1,502 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.schedule.enums import ChangeKinds
+from apps.schedule.models import Participant, Role, Schedule, ScheduleChange, ScheduleDay, TimeSlot
+from apps.users.models import SyncDevice
+from apps.users.services import SyncService
+
+User = get_user_model()
+
+def create_user(username):
+    return User.objects.create(username=username, email=f"{username}@example.com")
+
+class SyncTestCase(TestCase):
+    """
+    A schedule of 3 days with 2 time slots each, a member whose role can
+    edit it and an outsider
+    """
+    
+    def setUp(self):
+        self.owner = create_user('owner')
+        self.member = create_user('member')
+        self.outsider = create_user('outsider')
+        self.schedule = Schedule.objects.create(name='Roster', owner=self.owner, duration=3, min_days_selection=1)
+        self.role = Role.objects.create(schedule=self.schedule, name='Member', can_edit_schedule=True)
+        self.participant = Participant.objects.create(schedule=self.schedule, user=self.member, role=self.role)
+        self.slots = [
+            TimeSlot.objects.create(
+                schedule_day=day, start_time=datetime.time(8 + 4 * i), end_time=datetime.time(12 + 4 * i)
+            )
+            for day in [
+                ScheduleDay.objects.create(schedule=self.schedule, date=datetime.date(2025, 1, 6 + i))
+                for i in range(3)
+            ]
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+    
+    def edit(self, slot, **values):
+        return {"id": str(slot.id), "last_modified": timezone.now().isoformat(), **values}
+
+class SyncServiceTests(SyncTestCase):
+    def test_edits_are_applied_in_bulk(self):
+        self.schedule.refresh_from_db()
+        version = self.schedule.version
+        edits = [self.edit(slot, has_alarm=True, alarm_times=['07:30']) for slot in self.slots]
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(6):
+                # savepoint, load, bulk update, version bump, change log, release
+                result = SyncService.sync_time_slots(self.member, edits)
+        
+        self.assertEqual(result, {"updated": [str(slot.id) for slot in self.slots], "errors": []})
+        for slot in TimeSlot.objects.filter(pk__in=[slot.id for slot in self.slots]):
+            self.assertTrue(slot.has_alarm)
+            self.assertEqual(slot.alarm_times, ['07:30'])
+            self.assertEqual(slot.sync_status, 'synced')
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.version, version + 1)
+        self.assertEqual(
+            set(ScheduleChange.objects.filter(kind=ChangeKinds.TIME_SLOT).values_list('object_id', flat=True)),
+            {slot.id for slot in self.slots}
+        )
+    
+    def test_query_count_does_not_grow_with_the_upload(self):
+        with self.assertNumQueries(6):
+            SyncService.sync_time_slots(self.member, [self.edit(self.slots[0], is_available=False)])
+        with self.assertNumQueries(6):
+            SyncService.sync_time_slots(self.member, [self.edit(slot, is_available=False) for slot in self.slots])
+    
+    def test_repeated_values_are_written_with_one_update(self):
+        edits = [self.edit(slot, is_available=False) for slot in self.slots[:4]]
+        edits += [self.edit(slot, has_alarm=True, alarm_times=[f'0{i}:00']) for i, slot in enumerate(self.slots[4:])]
+        
+        with mock.patch.object(SyncService, 'GROUP_MIN', 3):
+            with self.assertNumQueries(7):
+                # savepoint, load, update of the group, bulk update of the rest, version bump, change log, release
+                result = SyncService.sync_time_slots(self.member, edits)
+        
+        self.assertEqual(len(result['updated']), len(self.slots))
+        self.assertEqual(TimeSlot.objects.filter(is_available=False, sync_status='synced').count(), 4)
+        self.assertEqual(
+            sorted(TimeSlot.objects.filter(has_alarm=True).values_list('alarm_times', flat=True)), [['00:00'], ['01:00']]
+        )
+    
+    def test_newer_server_rows_win(self):
+        stale = (timezone.now() - datetime.timedelta(hours=1)).isoformat()
+        self.slots[0].has_alarm = True
+        self.slots[0].save()
+        
+        result = SyncService.sync_time_slots(self.member, [
+            {"id": str(self.slots[0].id), "has_alarm": False, "last_modified": stale},
+            self.edit(self.slots[1], has_alarm=True),
+        ])
+        
+        self.assertEqual(result['updated'], [str(self.slots[1].id)])
+        self.assertEqual(result['errors'][0]['id'], str(self.slots[0].id))
+        self.slots[0].refresh_from_db()
+        self.assertTrue(self.slots[0].has_alarm)
+    
+    def test_invalid_and_foreign_edits_are_reported(self):
+        other = Schedule.objects.create(name='Other', owner=self.outsider)
+        foreign = TimeSlot.objects.create(
+            schedule_day=ScheduleDay.objects.create(schedule=other, date=datetime.date(2025, 1, 6)),
+            start_time=datetime.time(8), end_time=datetime.time(12)
+        )
+        
+        result = SyncService.sync_time_slots(self.member, [
+            {"id": "not-a-uuid"},
+            {"id": str(self.slots[0].id), "is_available": "maybe", "last_modified": timezone.now().isoformat()},
+            {"id": str(self.slots[1].id)},
+            self.edit(self.slots[2], is_available=False),
+            self.edit(self.slots[2], is_available=True),
+            self.edit(foreign, is_available=False),
+        ])
+        
+        self.assertEqual(result['updated'], [str(self.slots[2].id)])
+        errors = {error['id']: error['detail'] for error in result['errors']}
+        self.assertEqual(errors['not-a-uuid'], "Invalid time slot id")
+        self.assertEqual(set(errors[str(self.slots[0].id)]), {'is_available'})
+        self.assertEqual(set(errors[str(self.slots[1].id)]), {'last_modified'})
+        self.assertEqual(errors[str(self.slots[2].id)], "Time slot listed more than once")
+        self.assertEqual(errors[str(foreign.id)], "Time slot not found")
+        foreign.refresh_from_db()
+        self.assertTrue(foreign.is_available)
+
+    def test_members_without_edit_rights_only_edit_their_slots(self):
+        self.role.can_edit_schedule = False
+        self.role.save()
+        self.slots[0].participants.add(self.participant)
+        
+        edits = [self.edit(slot, is_available=False) for slot in self.slots]
+        with self.assertNumQueries(6):
+            result = SyncService.sync_time_slots(self.member, edits)
+        
+        self.assertEqual(result['updated'], [str(self.slots[0].id)])
+        self.assertEqual(
+            {error['id']: error['detail'] for error in result['errors']},
+            {str(slot.id): "You don't have permission to edit this time slot" for slot in self.slots[1:]}
+        )
+        self.assertEqual(list(TimeSlot.objects.filter(is_available=False)), [self.slots[0]])
+        
+        result = SyncService.sync_time_slots(self.owner, [self.edit(self.slots[1], is_available=False)])
+        self.assertEqual(result['updated'], [str(self.slots[1].id)])
+
+class SyncTimeSlotViewTests(SyncTestCase):
+    def test_upload(self):
+        response = self.client.post(
+            reverse('sync-time-slots'), {"time_slots": [self.edit(self.slots[0], is_available=False)]}, format='json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['updated_count'], response.data['error_count']), (1, 0))
+        self.member.refresh_from_db()
+        self.assertIsNotNone(self.member.last_synced_at)
+        
+        response = self.client.post(reverse('sync-time-slots'), {"time_slots": []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_full_sync_then_changes_after_its_sequence(self):
+        full = self.client.get(reverse('sync-time-slots'))
+        self.assertEqual(len(full.data['time_slots']), len(self.slots))
+        self.assertEqual(full.data['schedules'], [self.schedule.id])
+        
+        deleted_id = self.slots[1].id
+        with self.captureOnCommitCallbacks(execute=True):
+            SyncService.sync_time_slots(self.owner, [self.edit(self.slots[0], is_available=False)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[1].delete()
+        
+        delta = self.client.get(reverse('sync-time-slots'), {'since': full.data['seq']})
+        self.assertEqual([slot['id'] for slot in delta.data['time_slots']], [str(self.slots[0].id)])
+        self.assertFalse(delta.data['time_slots'][0]['is_available'])
+        self.assertEqual(delta.data['deleted'][ChangeKinds.TIME_SLOT], [deleted_id])
+        self.assertFalse(delta.data['has_more'])
+        
+        caught_up = self.client.get(reverse('sync-time-slots'), {'since': delta.data['seq']})
+        self.assertEqual(caught_up.data['time_slots'], [])
+        
+        response = self.client.get(reverse('sync-time-slots'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_full_sync_formats(self):
+        buffered = json.loads(self.client.get(reverse('sync-time-slots')).content)
+        
+        streamed = self.client.get(reverse('sync-time-slots'), {'stream': '1'})
+        self.assertEqual(json.loads(b''.join(streamed.streaming_content)), buffered)
+
+        packed = self.client.get(reverse('sync-time-slots'), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(packed.content), buffered)
+
+@override_settings(SYNC_CHUNK_SIZE=2)
+class InitialSyncTests(SyncTestCase):
+    def get(self, **params):
+        response = self.client.get(reverse('sync-time-slots'), {'chunked': '1', **params}, HTTP_X_DEVICE_ID='phone')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+    
+    def apply(self, state, response):
+        """Apply a sync response to the client's copy of the slots"""
+        for slot in response.data['time_slots']:
+            state[slot['id']] = slot['is_available']
+        for slot_id in response.data.get('deleted', {}).get(ChangeKinds.TIME_SLOT, []):
+            state.pop(str(slot_id), None)
+    
+    def test_chunks_cover_every_slot_once(self):
+        response = self.get()
+        received = []
+        tokens = []
+        while True:
+            self.assertLessEqual(len(response.data['time_slots']), 2)
+            received += [slot['id'] for slot in response.data['time_slots']]
+            self.assertEqual(SyncDevice.objects.exists(), response.data['continuation'] is None)
+            if response.data['continuation'] is None:
+                break
+            tokens.append(response.data['continuation'])
+            response = self.get(continuation=tokens[-1])
+        
+        self.assertEqual(len(tokens), 2)
+        self.assertEqual(sorted(received), sorted(str(slot.id) for slot in self.slots))
+        self.assertEqual(len(set(received)), len(received))
+    
+    def test_resume_after_an_interruption_at_every_chunk_boundary(self):
+        for boundary in range(1, 3):
+            with self.subTest(boundary=boundary), transaction.atomic():
+                state = {}
+                response = self.get(full='1')
+                for _ in range(boundary - 1):
+                    self.apply(state, response)
+                    response = self.get(continuation=response.data['continuation'])
+                # The client keeps this chunk's token but loses the next response
+                self.apply(state, response)
+                token = response.data['continuation']
+                self.get(continuation=token)
+                
+                # Rows already sent, not sent yet and new ones change meanwhile
+                slots = TimeSlot.objects.filter(schedule_day__schedule=self.schedule).order_by('schedule_day_id', 'id')
+                sent = [slot for slot in slots if str(slot.id) in state]
+                pending = [slot for slot in slots if str(slot.id) not in state]
+                with self.captureOnCommitCallbacks(execute=True):
+                    SyncService.sync_time_slots(self.owner, [self.edit(sent[0], is_available=False)])
+                with self.captureOnCommitCallbacks(execute=True):
+                    pending[-1].delete()
+                with self.captureOnCommitCallbacks(execute=True):
+                    TimeSlot.objects.create(
+                        schedule_day=sent[0].schedule_day, start_time=datetime.time(20), end_time=datetime.time(22)
+                    )
+                
+                received = []
+                response = self.get(continuation=token)
+                while True:
+                    received += [slot['id'] for slot in response.data['time_slots']]
+                    self.apply(state, response)
+                    if response.data['continuation'] is None:
+                        break
+                    response = self.get(continuation=response.data['continuation'])
+                self.assertEqual(len(set(received)), len(received))
+                self.assertFalse(set(received) & {str(slot.id) for slot in sent})
+                
+                self.apply(state, self.get(since=response.data['seq']))
+                
+                server = dict(
+                    (str(pk), is_available) for pk, is_available in
+                    TimeSlot.objects.filter(schedule_day__schedule=self.schedule).values_list('id', 'is_available')
+                )
+                self.assertEqual(state, server)
+                transaction.set_rollback(True)
+    
+    def test_clients_not_opting_in_get_every_slot_with_a_count(self):
+        response = self.client.get(reverse('sync-time-slots'))
+        
+        self.assertEqual(len(response.data['time_slots']), len(self.slots))
+        self.assertEqual(response.data['count'], len(self.slots))
+        self.assertNotIn('continuation', response.data)
+    
+    def test_invalid_and_stale_tokens(self):
+        token = self.get().data['continuation']
+        
+        response = self.client.get(reverse('sync-time-slots'), {'continuation': token[:-2] + 'xx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # A schedule left during the sync is not sent anymore
+        self.participant.delete()
+        response = self.get(continuation=token)
+        self.assertEqual((response.data['time_slots'], response.data['schedules']), ([], []))
+
+class SyncDeviceTests(SyncTestCase):
+    def sync(self, device, **params):
+        return self.client.get(reverse('sync-time-slots'), params, HTTP_X_DEVICE_ID=device)
+    
+    def change(self, slot, **values):
+        with self.captureOnCommitCallbacks(execute=True):
+            SyncService.sync_time_slots(self.owner, [self.edit(slot, **values)])
+    
+    def test_devices_catch_up_independently(self):
+        self.assertEqual(len(self.sync('phone').data['time_slots']), len(self.slots))
+        self.assertEqual(len(self.sync('tablet').data['time_slots']), len(self.slots))
+        
+        self.change(self.slots[0], is_available=False)
+        phone = self.sync('phone')
+        self.assertIn('changed', phone.data)
+        self.assertEqual([slot['id'] for slot in phone.data['time_slots']], [str(self.slots[0].id)])
+        
+        self.change(self.slots[1], has_alarm=True)
+        self.assertEqual([slot['id'] for slot in self.sync('phone').data['time_slots']], [str(self.slots[1].id)])
+        tablet = self.sync('tablet')
+        self.assertEqual(
+            {slot['id'] for slot in tablet.data['time_slots']}, {str(self.slots[0].id), str(self.slots[1].id)}
+        )
+        self.assertEqual(self.sync('tablet').data['time_slots'], [])
+        
+        full = self.sync('tablet', full='1')
+        self.assertEqual(len(full.data['time_slots']), len(self.slots))
+    
+    def test_joined_schedules_are_sent_in_full(self):
+        self.sync('phone')
+        other = Schedule.objects.create(name='Other', owner=self.outsider)
+        slot = TimeSlot.objects.create(
+            schedule_day=ScheduleDay.objects.create(schedule=other, date=datetime.date(2025, 1, 6)),
+            start_time=datetime.time(8), end_time=datetime.time(12)
+        )
+        Participant.objects.create(schedule=other, user=self.member, role=Role.objects.create(schedule=other, name='Member'))
+        
+        response = self.sync('phone')
+        
+        self.assertEqual(response.data['added_schedules'], [other.id])
+        self.assertIn(str(slot.id), [time_slot['id'] for time_slot in response.data['time_slots']])
+        self.assertEqual(self.sync('phone').data['added_schedules'], [])
+    
+    def test_uploads_keep_the_cursor(self):
+        self.sync('phone')
+        seq = SyncDevice.objects.get(device_id='phone').seq
+        
+        response = self.client.post(
+            reverse('sync-time-slots'), {"time_slots": [self.edit(self.slots[0], is_available=False)]},
+            format='json', HTTP_X_DEVICE_ID='phone'
+        )
+        
+        self.assertEqual(response.data['updated_count'], 1)
+        device = SyncDevice.objects.get(device_id='phone')
+        self.assertEqual(device.seq, seq)
+        self.assertIsNotNone(device.last_synced_at)
+    
+    def test_overlong_device_ids_are_rejected_before_any_write(self):
+        self.assertEqual(
+            self.client.get(reverse('sync-time-slots'), {'device': 'x' * 256}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        
+        response = self.client.post(
+            reverse('sync-time-slots'), {"time_slots": [self.edit(self.slots[0], is_available=False)]},
+            format='json', HTTP_X_DEVICE_ID='x' * 256
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"detail": "Device id is too long"})
+        self.slots[0].refresh_from_db()
+        self.assertTrue(self.slots[0].is_available)
+        self.assertFalse(SyncDevice.objects.exists())
+    
+    def test_prune_unseen_devices(self):
+        self.sync('phone')
+        self.sync('tablet')
+        SyncDevice.objects.filter(device_id='tablet').update(last_seen_at=timezone.now() - datetime.timedelta(days=40))
+        out = StringIO()
+        
+        call_command('prune_sync_devices', '--days', '30', stdout=out)
+        
+        self.assertIn('Pruned 1 sync device(s)', out.getvalue())
+        self.assertEqual(list(SyncDevice.objects.values_list('device_id', flat=True)), ['phone'])
+        self.assertEqual(len(self.sync('tablet').data['time_slots']), len(self.slots))
+
+def digest(payload):
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def combine(children):
+    children = {key: value for key, value in children.items() if value is not None}
+    return digest("\n".join(f"{key}:{children[key]}" for key in sorted(children))) if children else None
+
+def slot_hash(slot):
+    """A client's hash of a slot representation, as documented in apps/schedule/reconciliation.py"""
+    return digest(json.dumps([
+        slot['id'], slot['start_time'], slot['end_time'], slot['is_available'], slot['has_alarm'], slot['alarm_times'],
+        sorted(participant['id'] for participant in slot['participants'])
+    ], separators=(',', ':')))
+
+class ReconcileTests(SyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.slots[0].participants.add(self.participant)
+        self.slots[3].alarm_times = ['07:30']
+        self.slots[3].save()
+    
+    def get(self, **params):
+        return self.client.get(reverse('sync-reconcile'), params)
+    
+    def download(self):
+        """A client's copy of the slots, by schedule and date"""
+        return {
+            str(self.schedule.id): {
+                date: self.get(schedule=self.schedule.id, date=date).data['time_slots']
+                for date in ('2025-01-06', '2025-01-07', '2025-01-08')
+            }
+        }
+    
+    def local_hashes(self, copy):
+        """(root, {schedule: {month: {date: hash}}}) of a client's copy"""
+        tree = {}
+        for schedule_id, dates in copy.items():
+            for date, slots in dates.items():
+                if slots:
+                    tree.setdefault(schedule_id, {}).setdefault(date[:7], {})[date] = combine(
+                        {slot['id']: slot_hash(slot) for slot in slots}
+                    )
+        schedules = {
+            schedule_id: combine({month: combine(days) for month, days in months.items()})
+            for schedule_id, months in tree.items()
+        }
+        return combine(schedules), tree
+    
+    def test_a_client_in_sync_computes_the_same_hashes(self):
+        copy = self.download()
+        root, tree = self.local_hashes(copy)
+        
+        response = self.get()
+        
+        self.assertEqual(response.data['hash'], root)
+        schedule = self.get(schedule=self.schedule.id)
+        self.assertEqual(schedule.data['months'], {'2025-01': combine(tree[str(self.schedule.id)]['2025-01'])})
+        month = self.get(schedule=self.schedule.id, month='2025-01')
+        self.assertEqual(month.data['days'], tree[str(self.schedule.id)]['2025-01'])
+    
+    def test_walking_down_to_the_drifted_day(self):
+        copy = self.download()
+        with self.captureOnCommitCallbacks(execute=True):
+            SyncService.sync_time_slots(self.owner, [self.edit(self.slots[2], is_available=False)])
+        root, tree = self.local_hashes(copy)
+        schedule_id = str(self.schedule.id)
+        
+        self.assertNotEqual(self.get().data['hash'], root)
+        self.assertNotEqual(
+            self.get().data['schedules'][schedule_id], combine({'2025-01': combine(tree[schedule_id]['2025-01'])})
+        )
+        days = self.get(schedule=schedule_id, month='2025-01').data['days']
+        drifted = [date for date, hash in days.items() if tree[schedule_id]['2025-01'].get(date) != hash]
+        self.assertEqual(drifted, ['2025-01-07'])
+        
+        day = self.get(schedule=schedule_id, date='2025-01-07')
+        copy[schedule_id]['2025-01-07'] = day.data['time_slots']
+        self.assertEqual(self.local_hashes(copy)[0], self.get().data['hash'])
+        self.assertEqual(day.data['hash'], self.local_hashes(copy)[1][schedule_id]['2025-01']['2025-01-07'])
+    
+    def test_schedules_without_slots_have_a_null_hash(self):
+        root = self.get().data['hash']
+        empty = Schedule.objects.create(name='Empty', owner=self.owner)
+        role = Role.objects.create(schedule=empty, name='Member')
+        Participant.objects.create(schedule=empty, user=self.member, role=role)
+        
+        response = self.get()
+        
+        self.assertIsNone(response.data['schedules'][str(empty.id)])
+        self.assertEqual(response.data['hash'], root)
+        self.assertEqual(self.get(schedule=empty.id).data, {"hash": None, "months": {}})
+        
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.get().data, {"hash": None, "schedules": {}})
+    
+    def test_hashes_are_cached_per_schedule_version(self):
+        with CaptureQueriesContext(connection) as first:
+            root = self.get().data['hash']
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.get().data['hash'], root)
+        self.assertEqual(len(second), 1)
+        self.assertGreater(len(first), len(second))
+        
+        self.slots[5].participants.add(self.participant)
+        self.assertNotEqual(self.get().data['hash'], root)
+    
+    def test_invalid_requests(self):
+        other = Schedule.objects.create(name='Other', owner=self.outsider)
+        
+        self.assertEqual(self.get(schedule=other.id).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get(schedule='other').status_code, status.HTTP_400_BAD_REQUEST)
+        for params in ({'month': 'January'}, {'date': '2025-02-30'}):
+            response = self.get(schedule=self.schedule.id, **params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        empty = self.get(schedule=self.schedule.id, date='2025-02-01')
+        self.assertEqual((empty.data['hash'], empty.data['time_slots']), (None, []))
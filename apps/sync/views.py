@@ -1,17 +1,56 @@
 # apps/schedule/sync_views.py
+import datetime
+import uuid
+
 from rest_framework import views, permissions, status
 from rest_framework.response import Response
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
 from django.utils import timezone
 
+from apps.schedule.changelog import ChangeLog
+from apps.schedule.enums import ChangeKinds
+from apps.schedule.membership import ScheduleMembership
 from apps.schedule.models import Schedule, TimeSlot
+from apps.schedule.reconciliation import ScheduleDigest
+from apps.schedule.renderers import NEGOTIATED_PARSERS, NEGOTIATED_RENDERERS
 from apps.schedule.serializers import TimeSlotSerializer
-from apps.users.services import SyncService
+from apps.schedule.streaming import stream_representations, streaming_json_response, wants_stream
+from apps.users.services import SyncDeviceService, SyncService
+
+CONTINUATION_SALT = 'sync.initial'
+
+def encode_continuation(seq, schedules, after):
+    """Opaque token resuming an initial sync after a (day id, slot id) pair"""
+    return signing.dumps(
+        {
+            "seq": seq,
+            "schedules": [schedule_id.hex for schedule_id in schedules],
+            "after": [pk.hex for pk in after],
+        },
+        salt=CONTINUATION_SALT, compress=True
+    )
+
+def decode_continuation(token):
+    """
+    (seq, schedule ids, (day id, slot id)) of a continuation token, raises
+    signing.BadSignature for a token this server did not issue
+    """
+    data = signing.loads(token, salt=CONTINUATION_SALT)
+    return (
+        data['seq'],
+        [uuid.UUID(schedule_id) for schedule_id in data['schedules']],
+        tuple(uuid.UUID(pk) for pk in data['after'])
+    )
 
 class SyncTimeSlotView(views.APIView):
     """
     API endpoint for synchronizing time slots between client and server
     """
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = NEGOTIATED_RENDERERS
+    parser_classes = NEGOTIATED_PARSERS
     
     def post(self, request):
         """
@@ -33,6 +72,7 @@ class SyncTimeSlotView(views.APIView):
         }
         """
         time_slots_data = request.data.get('time_slots', [])
+        device_id = SyncDeviceService.device_id(request)
         
         if not time_slots_data:
             return Response(
@@ -46,6 +86,8 @@ class SyncTimeSlotView(views.APIView):
         # Update user's last synced timestamp
         request.user.last_synced_at = timezone.now()
         request.user.save(update_fields=['last_synced_at'])
+        if device_id:
+            SyncDeviceService.touch(request.user, device_id)
         
         # Return sync results
         return Response({
@@ -58,29 +100,213 @@ class SyncTimeSlotView(views.APIView):
     
     def get(self, request):
         """
-        Get all time slots that need to be synchronized to the client
+        Get the time slots that need to be synchronized to the client
+        
+        Without ?since= this is an initial sync: every time slot of the
+        user's schedules in one response, with their "count" and "seq", the
+        change log position read when the sync started. Send ?stream=1 to
+        have it streamed.
+        
+        Clients opting in with ?chunked=1 get the slots SYNC_CHUNK_SIZE at a
+        time in (day, id) order instead, without "count". Each chunk carries
+        the same "seq" and a "continuation" token to pass as ?continuation=
+        for the next chunk, null on the last one. A client interrupted
+        between chunks resumes with the last token it received; once done
+        it asks for ?since=<seq>, which brings the rows changed while it
+        was syncing up to date. Responses without ?chunked=1 keep the shape
+        they had before chunking, so existing clients are unaffected.
         
-        This endpoint returns all time slots that have been modified since
-        the user's last sync time.
+        With ?since=<seq> only the slots changed after it are returned, along
+        with the ids of the other changed rows and of the deleted ones, at
+        most SYNC_CHANGE_LIMIT changes at a time. A schedule missing from
+        "schedules" was left or deleted.
+        
+        A device naming itself with the X-Device-ID header or ?device= has
+        its own cursor: without ?since= it gets the changes after what it
+        was last sent, and every slot of a schedule it did not hold yet.
+        Only a new device, or one asking for ?full=1, syncs everything, its
+        cursor moves once the last chunk is sent.
         """
-        last_synced_at = request.user.last_synced_at
+        schedules = list(
+            ScheduleMembership.participant_schedule_ids(request.user).values_list('schedule_id', flat=True)
+        )
+        device_id = SyncDeviceService.device_id(request)
+        device = SyncDeviceService.get(request.user, device_id) if device_id else None
+        last_synced_at = device.last_synced_at if device else request.user.last_synced_at
         
-        if not last_synced_at:
-            # If this is the first sync, return all time slots
-            schedules = Schedule.objects.filter(participants__user=request.user)
-            time_slots = TimeSlot.objects.filter(schedule_day__schedule__in=schedules)
-        else:
-            # Otherwise, return only time slots modified since last sync
-            schedules = Schedule.objects.filter(participants__user=request.user)
-            time_slots = TimeSlot.objects.filter(
-                schedule_day__schedule__in=schedules,
-                last_modified__gt=last_synced_at
+        token = request.query_params.get('continuation')
+        since = request.query_params.get('since')
+        if token is not None:
+            try:
+                seq, snapshot, after = decode_continuation(token)
+            except signing.BadSignature:
+                return Response({"detail": "Invalid continuation token"}, status=status.HTTP_400_BAD_REQUEST)
+            # Schedules left since the sync started are not sent anymore
+            current = set(schedules)
+            schedules = [schedule_id for schedule_id in snapshot if schedule_id in current]
+            response = self.get_chunk(schedules, seq, after, last_synced_at)
+            done = response.data['continuation'] is None
+        elif since is not None:
+            if not since.isdigit():
+                return Response(
+                    {"detail": "since must be a change sequence number"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            response = self.get_changes(schedules, int(since), [], last_synced_at)
+            seq, done = response.data['seq'], True
+        elif device is not None and request.query_params.get('full') not in ('1', 'true', 'yes'):
+            held = set(device.schedule_ids)
+            response = self.get_changes(
+                schedules, device.seq, [schedule_id for schedule_id in schedules if str(schedule_id) not in held],
+                last_synced_at
             )
+            seq, done = response.data['seq'], True
+        else:
+            # Read the sequence first, changes logged meanwhile are sent again next time
+            seq = ChangeLog.last_seq()
+            if request.query_params.get('chunked') in ('1', 'true', 'yes') and not wants_stream(request):
+                response = self.get_chunk(schedules, seq, None, last_synced_at)
+                done = response.data['continuation'] is None
+            else:
+                response, done = self.get_all(request, schedules, seq, last_synced_at), True
         
-        serializer = TimeSlotSerializer(time_slots, many=True)
+        if device_id and done:
+            SyncDeviceService.advance(request.user, device_id, seq, schedules)
+        return response
+    
+    def get_chunk(self, schedules, seq, after, last_synced_at):
+        """
+        Next SYNC_CHUNK_SIZE slots of an initial sync after the (day id, slot
+        id) pair after, which no update of a slot changes
+        """
+        size = getattr(settings, 'SYNC_CHUNK_SIZE', 500)
+        keys = TimeSlot.objects.filter(schedule_day__schedule_id__in=schedules).order_by('schedule_day_id', 'id')
+        if after is not None:
+            day_id, slot_id = after
+            keys = keys.filter(Q(schedule_day_id__gt=day_id) | Q(schedule_day_id=day_id, pk__gt=slot_id))
+        # One row more tells whether another chunk follows
+        keys = list(keys.values_list('schedule_day_id', 'id')[:size + 1])
+        continuation = None
+        if len(keys) > size:
+            keys = keys[:size]
+            continuation = encode_continuation(seq, schedules, keys[-1])
+        time_slots = TimeSlotSerializer.setup_eager_loading(
+            TimeSlot.objects.filter(pk__in=[pk for _, pk in keys]).order_by('schedule_day_id', 'id')
+        )
         
         return Response({
-            "time_slots": serializer.data,
+            "time_slots": [
+                slot for chunk in stream_representations(TimeSlotSerializer(), time_slots, size) for slot in chunk
+            ],
+            "seq": seq,
+            "schedules": schedules,
+            "continuation": continuation,
+            "last_synced_at": last_synced_at
+        })
+    
+    def get_all(self, request, schedules, seq, last_synced_at):
+        """Every time slot of the user's schedules in one response"""
+        time_slots = TimeSlotSerializer.setup_eager_loading(
+            TimeSlot.objects.filter(schedule_day__schedule_id__in=schedules).order_by('schedule_day_id', 'id')
+        )
+        envelope = {
             "count": time_slots.count(),
-            "last_synced_at": request.user.last_synced_at
-        })
\ No newline at end of file
+            "seq": seq,
+            "schedules": schedules,
+            "last_synced_at": last_synced_at
+        }
+        if wants_stream(request):
+            # A first sync reads every slot, write them out chunk by chunk
+            return streaming_json_response(
+                request, stream_representations(TimeSlotSerializer(), time_slots), key="time_slots", envelope=envelope
+            )
+        serializer = TimeSlotSerializer(time_slots, many=True)
+        
+        return Response({"time_slots": serializer.data, **envelope})
+    
+    def get_changes(self, schedules, since, added, last_synced_at):
+        """
+        Rows of the user's schedules changed after a sequence number, and
+        every slot of the added schedules
+        """
+        delta = ChangeLog.delta(schedules, since, getattr(settings, 'SYNC_CHANGE_LIMIT', 1000))
+        changed = delta['changed']
+        time_slots = TimeSlotSerializer.setup_eager_loading(
+            TimeSlot.objects.filter(Q(pk__in=changed.pop(ChangeKinds.TIME_SLOT)) | Q(schedule_day__schedule_id__in=added))
+        )
+        
+        return Response({
+            "time_slots": TimeSlotSerializer(time_slots, many=True).data,
+            "changed": changed,
+            "deleted": delta['deleted'],
+            "schedules": schedules,
+            "added_schedules": added,
+            "seq": delta['seq'],
+            "has_more": delta['has_more'],
+            "last_synced_at": last_synced_at
+        })
+
+class SyncReconcileView(views.APIView):
+    """
+    API endpoint comparing a client's copy of its time slots with the
+    server's through hierarchical hashes, see apps/schedule/reconciliation.py
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = NEGOTIATED_RENDERERS
+    
+    def get(self, request):
+        """
+        Hashes of the user's time slots, one level at a time:
+        
+        - without parameters: {"hash", "schedules": {schedule id: hash}}
+        - ?schedule=<id>: {"hash", "months": {"YYYY-MM": hash}}
+        - ?schedule=<id>&month=YYYY-MM: {"hash", "days": {"YYYY-MM-DD": hash}}
+        - ?schedule=<id>&date=YYYY-MM-DD: {"hash", "time_slots": [...]},
+          the slots of that day to replace the client's with
+        
+        A node without slots, an empty schedule included, has a null hash
+        and is left out of its parent's hash.
+        """
+        schedules = ScheduleMembership.participant_schedule_ids(request.user).values_list('schedule_id', flat=True)
+        schedule_id = request.query_params.get('schedule')
+        if schedule_id is None:
+            roots = ScheduleDigest.roots(schedules)
+            return Response({"hash": ScheduleDigest.combine(roots), "schedules": roots})
+        
+        try:
+            schedule_id = uuid.UUID(schedule_id)
+        except ValueError:
+            return Response({"detail": "Invalid schedule id"}, status=status.HTTP_400_BAD_REQUEST)
+        version = Schedule.objects.filter(pk=schedule_id, pk__in=schedules).values_list('version', flat=True).first()
+        if version is None:
+            return Response({"detail": "Schedule not found"}, status=status.HTTP_404_NOT_FOUND)
+        tree = ScheduleDigest.tree(schedule_id, version)
+        
+        date = request.query_params.get('date')
+        month = request.query_params.get('month')
+        if date is not None:
+            try:
+                date = datetime.date.fromisoformat(date)
+            except ValueError:
+                return Response({"detail": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+            node = tree["months"].get(date.strftime('%Y-%m'), {"days": {}})
+            time_slots = TimeSlotSerializer.setup_eager_loading(
+                TimeSlot.objects.filter(schedule_day__schedule_id=schedule_id, schedule_day__date=date)
+                .order_by('start_time', 'id')
+            )
+            return Response({
+                "hash": node["days"].get(date.isoformat()),
+                "time_slots": TimeSlotSerializer(time_slots, many=True).data,
+            })
+        if month is not None:
+            try:
+                datetime.datetime.strptime(month, '%Y-%m')
+            except ValueError:
+                return Response({"detail": "month must be YYYY-MM"}, status=status.HTTP_400_BAD_REQUEST)
+            node = tree["months"].get(month, {"hash": None, "days": {}})
+            return Response({"hash": node["hash"], "days": node["days"]})
+        
+        return Response({
+            "hash": tree["hash"],
+            "months": {month: node["hash"] for month, node in tree["months"].items()},
+        })
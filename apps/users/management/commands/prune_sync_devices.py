@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.services import SyncDeviceService
+
+class Command(BaseCommand):
+    help = 'Delete the sync cursors of devices unseen for a number of days, meant to run periodically'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'SYNC_DEVICE_TTL_DAYS', 90),
+            help='Days since a device was last seen, SYNC_DEVICE_TTL_DAYS by default'
+        )
+    
+    def handle(self, *args, **options):
+        deleted = SyncDeviceService.prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} sync device(s)"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-17 13:15
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_is_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncDevice',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('device_id', models.CharField(max_length=255)),
+                ('seq', models.BigIntegerField(default=0)),
+                ('schedule_ids', models.JSONField(blank=True, default=list)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_seen_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_devices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'device_id'), name='unique_sync_device')],
+            },
+        ),
+    ]
@@ -50,4 +50,30 @@ class PasswordResetToken(models.Model):
         return timezone.now() < self.expires_at
         
     def __str__(self):
-        return f"Password reset token for {self.user.email}"
\ No newline at end of file
+        return f"Password reset token for {self.user.email}"
+
+
+class SyncDevice(models.Model):
+    """
+    Offline sync state of one device of a user, keyed by one of the user's
+    device tokens or an id the client picks, so that each device catches up
+    from its own change log position.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_devices')
+    device_id = models.CharField(max_length=255)
+    # Change log position the device synced up to
+    seq = models.BigIntegerField(default=0)
+    # Schedules the device holds, one it gains is sent in full
+    schedule_ids = models.JSONField(default=list, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_seen_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'device_id'], name='unique_sync_device'),
+        ]
+    
+    def __str__(self):
+        return f"Sync device {self.device_id} of {self.user}"
@@ -1,10 +1,20 @@
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
 from django.utils import timezone
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
 import datetime
+import uuid
 
-from apps.users.models import EmailVerificationToken, PasswordResetToken
+from apps.schedule.changelog import ChangeLog
+from apps.schedule.enums import ChangeKinds
+from apps.schedule.membership import ScheduleMembership
+from apps.schedule.models import Schedule, TimeSlot
+from apps.schedule.serializers import TimeSlotSerializer
+from apps.users.models import EmailVerificationToken, PasswordResetToken, SyncDevice
 from config import settings
 
 class EmailVerificationService:
@@ -132,4 +142,188 @@ class PasswordResetService:
         
         # Remove token
         token.delete()
-        return True, "Password reset successfully"
\ No newline at end of file
+        return True, "Password reset successfully"
+
+class SyncService:
+    # Time slot fields a client may change offline
+    SYNC_FIELDS = ('is_available', 'has_alarm', 'alarm_times')
+    BATCH_SIZE = 1000
+    # Edits sharing their values with this many others get a plain UPDATE
+    GROUP_MIN = 10
+    
+    @staticmethod
+    def sync_time_slots(user, time_slots_data):
+        """
+        Apply offline time slot edits of a client in one transaction, with
+        one IN query loading the referenced slots of the user's schedules,
+        bulk updates and one version bump for the touched schedules.
+        
+        Slots are editable by the owner and roles that can edit the
+        schedule, other members only edit the slots they are assigned to.
+        Both are decided in the same query.
+        
+        An edit older than the server row (by last_modified) is a conflict
+        and is left out, the server version wins and the client refetches it.
+        
+        Returns:
+            dict: {"updated": [slot ids], "errors": [{"id", "detail"}]}
+        """
+        fields = TimeSlotSerializer().fields
+        timestamp = serializers.DateTimeField()
+        updated = []
+        errors = []
+        edits = {}
+        
+        for item in time_slots_data:
+            slot_id = item.get('id') if isinstance(item, dict) else None
+            try:
+                slot_id = str(uuid.UUID(str(slot_id)))
+            except ValueError:
+                errors.append({"id": slot_id, "detail": "Invalid time slot id"})
+                continue
+            
+            values = {}
+            invalid = {}
+            for name in SyncService.SYNC_FIELDS:
+                if name in item:
+                    try:
+                        values[name] = fields[name].run_validation(item[name])
+                    except serializers.ValidationError as exc:
+                        invalid[name] = exc.detail
+            try:
+                client_modified = timestamp.run_validation(item.get('last_modified'))
+            except serializers.ValidationError as exc:
+                invalid['last_modified'] = exc.detail
+            if invalid:
+                errors.append({"id": slot_id, "detail": invalid})
+                continue
+            if slot_id in edits:
+                errors.append({"id": slot_id, "detail": "Time slot listed more than once"})
+                continue
+            edits[slot_id] = (values, client_modified)
+        
+        if not edits:
+            return {"updated": updated, "errors": errors}
+        
+        now = timezone.now()
+        assigned = TimeSlot.participants.through.objects.filter(timeslot_id=OuterRef('pk'), participant__user=user)
+        editable = Q(schedule_day__schedule_id__in=ScheduleMembership.editable_schedule_ids(user)) | Exists(assigned)
+        with transaction.atomic():
+            # Slots outside the user's schedules are filtered out with the same query
+            slots = {
+                str(slot.pk): slot for slot in TimeSlot.objects.select_for_update(of=('self',))
+                .filter(pk__in=list(edits), schedule_day__schedule_id__in=ScheduleMembership.schedule_ids(user))
+                .annotate(
+                    schedule_id=F('schedule_day__schedule_id'),
+                    editable=Case(When(editable, then=Value(True)), default=Value(False))
+                )
+                .only('id', 'last_modified', *SyncService.SYNC_FIELDS)
+            }
+            
+            changed = {}
+            for slot_id, (values, client_modified) in edits.items():
+                slot = slots.get(slot_id)
+                if slot is None:
+                    errors.append({"id": slot_id, "detail": "Time slot not found"})
+                elif not slot.editable:
+                    errors.append({"id": slot_id, "detail": "You don't have permission to edit this time slot"})
+                elif slot.last_modified > client_modified:
+                    errors.append({
+                        "id": slot_id,
+                        "detail": "Time slot was modified on the server after this change",
+                        "last_modified": timestamp.to_representation(slot.last_modified)
+                    })
+                else:
+                    # Offline edits mostly repeat a few combinations of values
+                    key = tuple(sorted((name, repr(value)) for name, value in values.items()))
+                    changed.setdefault(key, (values, []))[1].append(slot)
+                    updated.append(slot_id)
+            
+            SyncService.write_edits(changed.values(), now)
+            # Updates skip post_save, invalidate and log the touched schedules here
+            by_schedule = {}
+            for _, group in changed.values():
+                for slot in group:
+                    by_schedule.setdefault(slot.schedule_id, []).append(slot.pk)
+            if by_schedule:
+                Schedule.objects.filter(pk__in=by_schedule).update(version=F('version') + 1)
+            for schedule_id, slot_ids in by_schedule.items():
+                ChangeLog.record(ChangeKinds.TIME_SLOT, slot_ids, schedule_id=schedule_id)
+        
+        return {"updated": updated, "errors": errors}
+    
+    @staticmethod
+    def write_edits(groups, now):
+        """
+        Write groups of (values, slots) edits. A large group is one UPDATE per
+        batch of ids, the rest is a bulk_update, whose CASE per row and field
+        costs more to build than to run.
+        """
+        rest = []
+        for values, slots in groups:
+            if len(slots) < SyncService.GROUP_MIN:
+                for slot in slots:
+                    for name, value in values.items():
+                        setattr(slot, name, value)
+                    # bulk_update does not touch auto_now fields
+                    slot.last_modified = now
+                    slot.sync_status = 'synced'
+                rest.extend(slots)
+                continue
+            for start in range(0, len(slots), SyncService.BATCH_SIZE):
+                batch = [slot.pk for slot in slots[start:start + SyncService.BATCH_SIZE]]
+                TimeSlot.objects.filter(pk__in=batch).update(**values, last_modified=now, sync_status='synced')
+        
+        TimeSlot.objects.bulk_update(
+            rest, [*SyncService.SYNC_FIELDS, 'last_modified', 'sync_status'], batch_size=SyncService.BATCH_SIZE
+        )
+
+class SyncDeviceService:
+    """
+    Per-device sync cursors. A device is named by the X-Device-ID header or
+    the device parameter, one of the user's device tokens or any id the
+    client keeps, and catches up from where it last synced.
+    """
+    
+    @staticmethod
+    def device_id(request):
+        """
+        Device a sync request comes from, None when it does not say. An id
+        longer than the column answers 400 before anything is written.
+        """
+        device_id = request.META.get('HTTP_X_DEVICE_ID') or request.query_params.get('device') or None
+        if device_id and len(device_id) > SyncDevice._meta.get_field('device_id').max_length:
+            raise ParseError("Device id is too long")
+        return device_id
+    
+    @staticmethod
+    def get(user, device_id):
+        """Sync state of a device, None for a device that never synced"""
+        return SyncDevice.objects.filter(user=user, device_id=device_id).first()
+    
+    @staticmethod
+    def advance(user, device_id, seq, schedule_ids):
+        """Record that a device was sent the changes up to seq of these schedules"""
+        now = timezone.now()
+        SyncDevice.objects.update_or_create(
+            user=user, device_id=device_id,
+            defaults={
+                "seq": seq,
+                "schedule_ids": [str(schedule_id) for schedule_id in schedule_ids],
+                "last_synced_at": now,
+                "last_seen_at": now,
+            }
+        )
+    
+    @staticmethod
+    def touch(user, device_id):
+        """Mark a known device as synced after an upload, its cursor stays put"""
+        now = timezone.now()
+        SyncDevice.objects.filter(user=user, device_id=device_id).update(last_synced_at=now, last_seen_at=now)
+    
+    @staticmethod
+    def prune(days):
+        """Forget devices unseen for days, they fully resync if they come back"""
+        cutoff = timezone.now() - datetime.timedelta(days=days)
+        deleted, _ = SyncDevice.objects.filter(last_seen_at__lt=cutoff).delete()
+        return deleted
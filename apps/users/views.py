@@ -6,6 +6,7 @@ from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from apps.schedule.intervals import UserIntervals
 from apps.users.serializers import UserSerializer, UserRegistrationSerializer
 from apps.users.services import EmailVerificationService, PasswordResetService
 
@@ -92,6 +93,31 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='me/conflicts', url_name='me-conflicts')
+    def me_conflicts(self, request):
+        """
+        Overlapping time slot assignments of the current user across all of
+        their schedules, grouped by date
+        """
+        index = UserIntervals.get(request.user.id)
+        conflicts = {}
+        for *keys, date in index.conflicts():
+            conflicts.setdefault(date, {}).update(dict.fromkeys(keys))
+        
+        def describe(slot_id):
+            _, start_time, end_time, schedule_id = index.intervals[slot_id]
+            return {
+                "slot": str(slot_id),
+                "schedule": str(schedule_id),
+                "start_time": start_time.strftime('%H:%M'),
+                "end_time": end_time.strftime('%H:%M')
+            }
+        
+        return Response([
+            {"date": date.isoformat(), "slots": [describe(slot_id) for slot_id in slot_ids]}
+            for date, slot_ids in conflicts.items()
+        ])
+    
     @action(detail=False, methods=['put'])
     def update_profile(self, request):
         """Update user profile"""
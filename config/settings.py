@@ -124,12 +124,50 @@ CHANNEL_LAYERS = {
     },
 }
 
-# CACHES = {
-#     "default": {
-#         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-#         "LOCATION": os.getenv('REDIS_URL'),
-#     }
-# }
+# Caches - Redis when REDIS_URL is set (configure it with an LRU
+# maxmemory-policy), local memory otherwise. The "schedules" alias holds the
+# versioned schedule read cache, see apps/schedule/cache.py.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv('REDIS_URL'),
+        },
+        "schedules": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv('REDIS_URL'),
+            "KEY_PREFIX": "schedules",
+            "TIMEOUT": int(os.getenv('SCHEDULE_CACHE_TIMEOUT', 24 * 60 * 60)),
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "schedules": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "schedules",
+            "TIMEOUT": int(os.getenv('SCHEDULE_CACHE_TIMEOUT', 24 * 60 * 60)),
+            "OPTIONS": {
+                # Least recently used entries are culled past this size
+                "MAX_ENTRIES": int(os.getenv('SCHEDULE_CACHE_MAX_ENTRIES', 1000)),
+            },
+        },
+    }
+
+# Schedules whose occupancy index each process keeps for swap suggestions,
+# see apps/schedule/occupancy.py
+SCHEDULE_OCCUPANCY_MAX_INDEXES = int(os.getenv('SCHEDULE_OCCUPANCY_MAX_INDEXES', 32))
+# Per-user interval indexes of assignments kept in memory by each process
+USER_INTERVAL_MAX_INDEXES = int(os.getenv('USER_INTERVAL_MAX_INDEXES', 1000))
+# Days after which prune_sync_devices forgets the sync cursor of an unseen device
+SYNC_DEVICE_TTL_DAYS = int(os.getenv('SYNC_DEVICE_TTL_DAYS', 90))
+# Time slots per response of a resumable initial sync
+SYNC_CHUNK_SIZE = int(os.getenv('SYNC_CHUNK_SIZE', 500))
+# Seconds after which change log entries still pending are published by the
+# next delta read or publish_change_log, see apps/schedule/changelog.py
+CHANGE_LOG_REPAIR_SECONDS = int(os.getenv('CHANGE_LOG_REPAIR_SECONDS', 60))
 
 
 REST_FRAMEWORK = {
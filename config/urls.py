@@ -13,6 +13,7 @@ from apps.schedule.views import (
 )
 from apps.notification.views import NotificationViewSet
 from apps.export.views import ExportScheduleView
+from apps.sync.views import SyncReconcileView, SyncTimeSlotView
 
 # Create a router for our viewsets
 router = DefaultRouter()
@@ -41,6 +42,10 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
+    # Offline sync
+    path('api/sync/time-slots/', SyncTimeSlotView.as_view(), name='sync-time-slots'),
+    path('api/sync/reconcile/', SyncReconcileView.as_view(), name='sync-reconcile'),
+    
     # Export endpoint
     path('api/export/schedule/<uuid:schedule_id>/', ExportScheduleView.as_view(), name='export-schedule'),
     